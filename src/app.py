@@ -2,42 +2,131 @@
 
 import gradio as gr
 import os
-from rag_pipeline import get_rag_chain
+import time
+import asyncio
+import threading
+from dotenv import load_dotenv
+from metrics import start_metrics_server
+from llm_client import CircuitOpenError
+
+load_dotenv()
+
+# --- Configuration ---
+# Maximum number of chat requests streamed concurrently, and how many more may wait in the queue.
+CHAT_CONCURRENCY_LIMIT = int(os.getenv("CHAT_CONCURRENCY_LIMIT", "64"))
+CHAT_QUEUE_SIZE = int(os.getenv("CHAT_QUEUE_SIZE", "256"))
+# How long a chat request waits for the RAG chain to finish warming up, and the retry backoff.
+CHAT_READY_TIMEOUT = float(os.getenv("CHAT_READY_TIMEOUT", "120"))
+INIT_RETRY_BASE = float(os.getenv("INIT_RETRY_BASE", "2"))
+INIT_RETRY_MAX = float(os.getenv("INIT_RETRY_MAX", "60"))
 
 # --- 1. Initialize the RAG Chain ---
-# This is done once when the application starts.
-print("Initializing the RAG chain...")
-try:
-    rag_chain = get_rag_chain()
-    print("RAG chain initialized successfully.")
-except Exception as e:
-    print(f"Error initializing RAG chain: {e}")
-    # If the chain fails to load, we'll display an error in the UI.
-    rag_chain = None
+# The heavy components (langchain, Chroma, the embedding model) are loaded on a background
+# thread so the UI can bind its port immediately. Failed attempts are retried with backoff.
+rag_chain = None
+init_error = None
+rag_chain_ready = threading.Event()
+
+def initialize_rag_chain():
+    """Builds and warms the RAG chain, retrying until it succeeds, then starts the folder watcher."""
+    global rag_chain, init_error
+    delay = INIT_RETRY_BASE
+    while rag_chain is None:
+        print("Initializing the RAG chain...")
+        start = time.perf_counter()
+        try:
+            from embeddings import get_embeddings
+            from rag_pipeline import get_rag_chain
+            from embedding_service import EMBEDDING_SERVICE_ADDRESS
+            # Workers of a shared retrieval service never load the embedding model themselves.
+            embeddings = None if EMBEDDING_SERVICE_ADDRESS else get_embeddings()
+            rag_chain = get_rag_chain(warm_up=True, embeddings=embeddings)
+            init_error = None
+            rag_chain_ready.set()
+            print(f"RAG chain initialized successfully in {time.perf_counter() - start:.1f}s.")
+        except Exception as e:
+            init_error = e
+            print(f"Error initializing RAG chain: {e}. Retrying in {delay:.0f}s...")
+            time.sleep(delay)
+            delay = min(delay * 2, INIT_RETRY_MAX)
+    start_index_watcher(embeddings)
+
+def start_index_watcher(embeddings):
+    """
+    Ingests new, changed and deleted CVs while the app runs and swaps in a chain over the
+    updated index. Rebinding `rag_chain` is atomic: requests already streaming keep the chain
+    they started with. The watcher shares the app's embedding model instead of loading another.
+    With a shared retrieval service, the service ingests and this process only follows the
+    index version to reload its structured profiles.
+    """
+    from index_watcher import IndexWatcher, INDEX_WATCH, VECTOR_STORE_PATH
+    from index_manifest import manifest_path
+    from sharding import SHARD_ADDRESSES
+    from embedding_service import EMBEDDING_SERVICE_ADDRESS
+    if not INDEX_WATCH:
+        return
+    if SHARD_ADDRESSES:
+        print("Live ingestion is disabled with remote shards: the shard servers own their indexes.")
+        return
+
+    def swap_rag_chain():
+        global rag_chain
+        from rag_pipeline import get_rag_chain
+        rag_chain = get_rag_chain(embeddings=embeddings)
+
+    if EMBEDDING_SERVICE_ADDRESS:
+        IndexWatcher(swap_rag_chain, patterns=[manifest_path(VECTOR_STORE_PATH)], ingest=False).start()
+        return
+    IndexWatcher(swap_rag_chain, embeddings).start()
+
+threading.Thread(target=initialize_rag_chain, name="rag-chain-init", daemon=True).start()
+
+# Per-stage latency histograms, token counts and prompt sizes in Prometheus format,
+# plus /ready, which returns 200 once the RAG chain is warm.
+metrics_server = start_metrics_server(readiness=rag_chain_ready.is_set)
 
 # --- 2. Define the Chatbot's Response Logic ---
-def chat_response(message, history):
+def format_sources(sources):
+    """Formats the unique source documents for display below the answer."""
+    unique_sources = sorted(set(sources or []))
+    if not unique_sources:
+        return ""
+    return "\n\n*Sources:* " + ", ".join(unique_sources)
+
+async def chat_response(message, history):
     """
-    Handles the chat interaction. Invokes the RAG pipeline and formats the response.
+    Handles the chat interaction. Streams the answer from the RAG pipeline token by token
+    and appends the list of source CVs once the answer is complete.
     """
-    if rag_chain is None:
-        return "Error: The RAG chain could not be initialized. Please check the vector store and API keys."
+    if not rag_chain_ready.is_set():
+        yield "The CV screener is still starting up, your question will be answered in a moment..."
+        await asyncio.get_running_loop().run_in_executor(None, rag_chain_ready.wait, CHAT_READY_TIMEOUT)
+        if not rag_chain_ready.is_set():
+            yield (f"Error: The RAG chain could not be initialized ({init_error or 'still loading'}). "
+                   "Please check the vector store and API keys.")
+            return
 
     print(f"Received message: {message}")
-    
-    # Invoke the RAG chain with the user's message
-    response_dict = rag_chain.invoke(message)
-    answer = response_dict.get('answer', "Sorry, I couldn't generate an answer.")
-    
-    # Process and format the source documents for display
-    sources = sorted(list(set(response_dict.get('sources',)))) # Get unique sources
-    
-    if sources:
-        # Create a formatted string for the sources
-        source_str = "\n\n*Sources:* " + ", ".join(sources)
-        return answer + source_str
-    else:
-        return answer
+
+    # Stream the RAG chain's output; each chunk carries either answer tokens or the sources.
+    answer = ""
+    sources = []
+    try:
+        async for chunk in rag_chain.astream(message):
+            if chunk.get('answer'):
+                answer += chunk['answer']
+                yield answer
+            if 'sources' in chunk:
+                sources = chunk['sources']
+    except CircuitOpenError as e:
+        # The LLM provider is failing; answer right away instead of queueing more doomed calls.
+        print(f"Answer not generated: {e}")
+        yield "Sorry, the language model is temporarily unavailable. Please try again in a moment."
+        return
+
+    if not answer:
+        answer = "Sorry, I couldn't generate an answer."
+    yield answer + format_sources(sources)
 
 # --- 3. Instantiate the Gradio UI ---
 # The 'gradio' command will automatically find and launch this interface.
@@ -46,8 +135,11 @@ iface = gr.ChatInterface(
     title="AI-Powered CV Screener",
     description="Ask questions about the candidate CVs. The system will retrieve relevant information and generate an answer.",
     examples=["Who has experience with Python?", "Which candidate graduated from UPC?", "Summarize the profile of Jane Doe."],
-    cache_examples=False # Caching can be problematic with dynamic backends
+    cache_examples=False, # Caching can be problematic with dynamic backends
+    concurrency_limit=CHAT_CONCURRENCY_LIMIT
 )
+# Bound the number of requests waiting for a slot so overload fails fast instead of piling up.
+iface.queue(max_size=CHAT_QUEUE_SIZE)
 
 # The if __name__ == "__main__": block is no longer needed for launching,
 # but can be kept if you ever want to run the script directly with python.
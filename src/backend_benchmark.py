@@ -0,0 +1,159 @@
+# src/backend_benchmark.py
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from benchmark import percentile, directory_size
+
+# Compares the Chroma store with the compact memory-mapped store (float16 and int8)
+# on startup time, memory, size on disk, top-k query latency and recall@k against
+# an exact float32 search. Each backend is opened in a fresh subprocess so startup
+# and memory are measured cold. Vectors come from an existing Chroma store or are
+# generated synthetically; the compact stores are exported from the same Chroma store.
+
+# Constants
+DEFAULT_QUERIES = 200
+DEFAULT_K = 10
+DEFAULT_SEED = 42
+SYNTHETIC_DIM = 384
+BACKENDS = ("chroma", "float16", "int8")
+
+def memory_mb():
+    """Anonymous (private) and file-backed (shareable page cache) resident memory of this process in MB."""
+    fields = {}
+    with open("/proc/self/status", 'r') as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0]) / 1024.0
+    return fields.get("RssAnon", 0.0), fields.get("RssFile", 0.0)
+
+def write_synthetic_store(path, count, seed=DEFAULT_SEED, dim=SYNTHETIC_DIM):
+    """Fills a Chroma store with clustered random unit vectors, 20 chunks per fake candidate."""
+    from langchain_chroma import Chroma
+    rng = np.random.default_rng(seed)
+    collection = Chroma(persist_directory=path)._collection
+    centers = rng.standard_normal((max(1, count // 20), dim)).astype(np.float32)
+    for start in range(0, count, 5000):
+        ids = list(range(start, min(start + 5000, count)))
+        vectors = centers[[i // 20 for i in ids]] + 0.5 * rng.standard_normal((len(ids), dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        collection.add(ids=[f"chunk-{i}" for i in ids], embeddings=vectors.tolist(),
+                       documents=[f"chunk {i}" for i in ids],
+                       metadatas=[{"source": f"cvs_generated/candidate_{i // 20}.pdf"} for i in ids])
+
+def load_chroma_vectors(path):
+    """Returns (ids, float32 matrix) of every vector in a Chroma store."""
+    from langchain_chroma import Chroma
+    collection = Chroma(persist_directory=path)._collection
+    ids, vectors = [], []
+    for offset in range(0, collection.count(), 5000):
+        batch = collection.get(limit=5000, offset=offset, include=["embeddings"])
+        ids.extend(batch["ids"])
+        vectors.append(np.asarray(batch["embeddings"], dtype=np.float32))
+    return ids, np.concatenate(vectors)
+
+def prepare(store_path, workdir, num_queries, k, seed=DEFAULT_SEED):
+    """Exports the compact stores and writes the query set with its exact top-k ground truth."""
+    from compact_store import export_from_chroma
+    for dtype in ("float16", "int8"):
+        export_from_chroma(store_path, os.path.join(workdir, dtype), dtype)
+    ids, vectors = load_chroma_vectors(store_path)
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), num_queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = [[ids[i] for i in np.argsort(-(vectors @ query))[:k]] for query in queries]
+    np.save(os.path.join(workdir, "queries.npy"), queries)
+    with open(os.path.join(workdir, "truth.json"), 'w') as f:
+        json.dump(truth, f)
+    return len(ids)
+
+def run_backend(backend, store_path, workdir, k):
+    """Opens one backend cold and runs the query set against it."""
+    queries = np.load(os.path.join(workdir, "queries.npy"))
+    with open(os.path.join(workdir, "truth.json"), 'r') as f:
+        truth = json.load(f)
+    anon_before, _ = memory_mb()
+
+    start = time.perf_counter()
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+        store = Chroma(persist_directory=store_path)
+        disk_path = store_path
+    else:
+        from compact_store import CompactStore
+        disk_path = os.path.join(workdir, backend)
+        store = CompactStore(disk_path)
+    open_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    store.similarity_search_by_vector(queries[0].tolist(), k=k)
+    first_query_ms = (time.perf_counter() - start) * 1000
+
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        docs = store.similarity_search_by_vector(query.tolist(), k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({doc.id for doc in docs} & set(expected)) / len(expected))
+    anon_after, file_after = memory_mb()
+    return {
+        "backend": backend, "open_ms": open_ms, "first_query_ms": first_query_ms,
+        "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95),
+        "recall": sum(recalls) / len(recalls), "anon_mb": anon_after - anon_before, "file_mb": file_after,
+        "disk_mb": directory_size(disk_path) / 1e6,
+    }
+
+def print_table(results, k):
+    print(f"| backend | open ms | first query ms | p50 ms | p95 ms | recall@{k} | private MB | page cache MB | disk MB |")
+    print("|---|---|---|---|---|---|---|---|---|")
+    for r in results:
+        print(f"| {r['backend']} | {r['open_ms']:.1f} | {r['first_query_ms']:.1f} | {r['p50_ms']:.2f} | {r['p95_ms']:.2f} | "
+              f"{r['recall']:.3f} | {r['anon_mb']:.0f} | {r['file_mb']:.0f} | {r['disk_mb']:.1f} |")
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the Chroma and compact vector backends.")
+    parser.add_argument("--store", default="vector_store", help="Chroma store to benchmark (ignored with --synthetic).")
+    parser.add_argument("--synthetic", type=int, help="Benchmark N synthetic vectors instead of an existing store.")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--single-backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_backend:
+        # Child mode: benchmark one backend and report the result as JSON.
+        print("RESULT " + json.dumps(run_backend(args.single_backend, args.store, args.workdir, args.k)))
+        sys.exit(0)
+
+    workdir = tempfile.mkdtemp(prefix="cv_backend_bench_")
+    store_path = os.path.abspath(args.store)
+    if args.synthetic:
+        store_path = os.path.join(workdir, "chroma")
+        print(f"Writing {args.synthetic} synthetic vectors...")
+        write_synthetic_store(store_path, args.synthetic)
+    count = prepare(store_path, workdir, args.queries, args.k)
+    print(f"Benchmarking {count} vectors with {args.queries} queries...")
+
+    results = []
+    for backend in BACKENDS:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single-backend", backend, "--store", store_path,
+             "--workdir", workdir, "--k", str(args.k)],
+            capture_output=True, text=True,
+        )
+        lines = [line for line in completed.stdout.splitlines() if line.startswith("RESULT ")]
+        if completed.returncode != 0 or not lines:
+            print(f"Benchmark for '{backend}' failed:\n{completed.stderr[-2000:]}")
+        else:
+            results.append(json.loads(lines[-1][len("RESULT "):]))
+    shutil.rmtree(workdir, ignore_errors=True)
+    if results:
+        print_table(results, args.k)
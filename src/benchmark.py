@@ -0,0 +1,202 @@
+# src/benchmark.py
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+# Offline load and scaling benchmark for ingestion and querying.
+# Each corpus size runs in its own subprocess and working directory, so peak RSS and
+# on-disk sizes are measured per size. No LLM or image API is called: profiles are
+# generated deterministically, headshots are placeholders and the chat model is the
+# local stub from stub_apis.py.
+
+# Constants
+DEFAULT_SIZES = "100,1000,10000,100000"
+DEFAULT_QUERIES = 200
+DEFAULT_SEED = 42
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+def directory_size(path):
+    """Total size in bytes of all files below a directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def render_candidate(index, seed=DEFAULT_SEED):
+    """Writes the JSON profile, placeholder headshot and PDF CV of one fake candidate."""
+    from generate_cvs import OUTPUT_JSON_DIR, OUTPUT_IMAGE_DIR, create_cv_pdf, save_profile
+    from stub_apis import fake_profile, placeholder_png
+    profile = fake_profile(seed * 1_000_003 + index)
+    with contextlib.redirect_stdout(io.StringIO()):
+        save_profile(profile, index)
+        with open(os.path.join(OUTPUT_IMAGE_DIR, f"candidate_{index:02d}.png"), 'wb') as f:
+            f.write(placeholder_png(seed=index))
+        create_cv_pdf(profile, index)
+    return profile
+
+def generate_corpus(size, workers, seed=DEFAULT_SEED):
+    """Renders `size` deterministic fake CVs into the current directory. Returns the profiles."""
+    os.makedirs("data", exist_ok=True)
+    os.makedirs("cvs_generated", exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(render_candidate, range(size), [seed] * size, chunksize=64))
+
+def build_queries(profiles, count, seed=DEFAULT_SEED):
+    """Builds a deterministic query workload mixing skill, employer, university and name questions."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        profile = rng.choice(profiles)
+        kind = rng.randrange(4)
+        if kind == 0:
+            skill = rng.choice(profile["skills"]["programming_languages"] + profile["skills"]["tools_and_technologies"])
+            queries.append(f"Who has experience with {skill} and {rng.choice(profile['skills']['soft_skills']).lower()}?")
+        elif kind == 1:
+            queries.append(f"Which candidates worked at {profile['work_experience'][0]['company']} as {profile['job_title']}?")
+        elif kind == 2:
+            queries.append(f"Who studied {profile['education'][0]['degree']} at {profile['education'][0]['university']}?")
+        else:
+            queries.append(f"Summarize the profile of {profile['full_name']}.")
+    return queries
+
+def run_size(size, num_queries, workers, seed=DEFAULT_SEED):
+    """Generates, ingests and queries a corpus of `size` CVs in the current directory."""
+    # Measure the RAG path itself: no answer or retrieval caching, no structured fast path.
+    os.environ.setdefault("ANSWER_CACHE_SIZE", "0")
+    os.environ.setdefault("RETRIEVAL_CACHE_SIZE", "0")
+    os.environ.setdefault("QUERY_EMBEDDING_CACHE_SIZE", "0")
+    os.environ.setdefault("STRUCTURED_FAST_PATH", "false")
+
+    result = {"size": size}
+    start = time.perf_counter()
+    profiles = generate_corpus(size, workers, seed)
+    result["generate_s"] = time.perf_counter() - start
+
+    from ingest_data import create_vector_store, VECTOR_STORE_PATH, INGEST_SOURCE
+    # PDF parsing is measured on its own. The configured source (JSON profiles by default)
+    # is measured separately and builds the index that the queries run against.
+    result["ingest_source"] = INGEST_SOURCE
+    for source in dict.fromkeys(["pdf", INGEST_SOURCE]):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_vector_store(rebuild=True, workers=workers, source=source)
+        result[f"ingest_{source}_s"] = time.perf_counter() - start
+        result[f"ingest_{source}_cvs_per_s"] = size / result[f"ingest_{source}_s"]
+    result["index_mb"] = directory_size(VECTOR_STORE_PATH) / 1e6
+
+    from langchain_openai import ChatOpenAI
+    from stub_apis import start_stub_server, stub_base_url
+    import rag_pipeline
+    server = start_stub_server(port=0)
+    llm = ChatOpenAI(model="stub", base_url=stub_base_url(server), api_key="stub")
+    with contextlib.redirect_stdout(io.StringIO()):
+        chain = rag_pipeline.get_rag_chain(llm=llm)
+        # The retriever the chain uses, so the timing covers the configured backend,
+        # sharding, retrieval mode and metadata pre-filter.
+        retrieve = rag_pipeline.get_retriever()
+
+    queries = build_queries(profiles, num_queries, seed)
+    # Warm up the embedding model and connections before timing.
+    chain.invoke(queries[0])
+    retrieve(queries[0])
+
+    retrieval, end_to_end = [], []
+    for query in queries:
+        start = time.perf_counter()
+        retrieve(query)
+        retrieval.append((time.perf_counter() - start) * 1000)
+    for query in queries:
+        start = time.perf_counter()
+        chain.invoke(query)
+        end_to_end.append((time.perf_counter() - start) * 1000)
+    server.shutdown()
+
+    for name, samples in (("retrieval", retrieval), ("e2e", end_to_end)):
+        for pct in (50, 95, 99):
+            result[f"{name}_p{pct}_ms"] = percentile(samples, pct)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def print_table(results):
+    """Prints the benchmark results as a Markdown table."""
+    # One ingest column for PDF parsing and one for the configured INGEST_SOURCE, unless that is pdf too.
+    sources = dict.fromkeys(["pdf"] + [result.get("ingest_source", "pdf") for result in results])
+    columns = [("size", "CVs", "{:d}")]
+    columns += [(f"ingest_{source}_cvs_per_s", f"ingest {source} CV/s", "{:.1f}") for source in sources]
+    columns += [("peak_rss_mb", "peak RSS MB", "{:.0f}"), ("index_mb", "index MB", "{:.1f}"),
+                ("retrieval_p50_ms", "retr p50", "{:.1f}"), ("retrieval_p95_ms", "retr p95", "{:.1f}"),
+                ("retrieval_p99_ms", "retr p99", "{:.1f}"), ("e2e_p50_ms", "e2e p50", "{:.1f}"),
+                ("e2e_p95_ms", "e2e p95", "{:.1f}"), ("e2e_p99_ms", "e2e p99", "{:.1f}")]
+    print("| " + " | ".join(label for _, label, _ in columns) + " |")
+    print("|" + "|".join("---" for _ in columns) + "|")
+    for result in results:
+        print("| " + " | ".join(fmt.format(result[key]) if key in result else "-" for key, _, fmt in columns) + " |")
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline ingest and query scaling benchmark.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated corpus sizes.")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="Queries per corpus size.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for rendering and parsing.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", help="Optional path to write the results as JSON.")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated working directories.")
+    parser.add_argument("--single-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_size:
+        # Child mode: run one size in the current directory and report the result as JSON.
+        result = run_size(args.single_size, args.queries, args.workers, args.seed)
+        print("RESULT " + json.dumps(result))
+        sys.exit(0)
+
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        workdir = tempfile.mkdtemp(prefix=f"cv_bench_{size}_")
+        print(f"--- Benchmarking {size} CVs in '{workdir}' ---")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [src_dir, os.environ.get("PYTHONPATH")])))
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single-size", str(size), "--queries", str(args.queries),
+             "--workers", str(args.workers), "--seed", str(args.seed)],
+            cwd=workdir, env=env, capture_output=True, text=True,
+        )
+        lines = [line for line in completed.stdout.splitlines() if line.startswith("RESULT ")]
+        if completed.returncode != 0 or not lines:
+            print(f"Benchmark for {size} CVs failed:\n{completed.stderr[-2000:]}")
+        else:
+            result = json.loads(lines[-1][len("RESULT "):])
+            results.append(result)
+            print(f"  -> ingest {result['ingest_pdf_cvs_per_s']:.1f} CVs/s from PDFs, retrieval p95 {result['retrieval_p95_ms']:.1f} ms, "
+                  f"e2e p95 {result['e2e_p95_ms']:.1f} ms")
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if results:
+        print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
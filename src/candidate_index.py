@@ -0,0 +1,211 @@
+# src/candidate_index.py
+
+import os
+import re
+import glob
+import unicodedata
+from collections import defaultdict
+from profiles import PROFILE_DIRECTORY, CV_DIRECTORY, load_profiles, pdf_file_name
+
+# Words ignored when building acronyms such as "UPC" for "Universitat Politècnica de Catalunya".
+ACRONYM_STOPWORDS = {"of", "de", "del", "la", "el", "the", "and", "y", "i", "d", "for", "in", "at"}
+
+# Longest phrase (in words) matched when scanning a question for known terms.
+MAX_TERM_WORDS = 6
+
+# Profile fields matched against the terms of a question, besides candidate names.
+TERM_FIELDS = ("skill", "university", "company", "degree")
+
+# Enumeration questions that can be answered from the structured profiles alone.
+# Each pattern maps to the indexed field it queries and the phrase used in the answer.
+QUESTION_PATTERNS = [
+    (re.compile(r"^(?:who|which candidates?)\s+(?:has|have|had)\s+(?:any\s+)?(?:experience|skills?|knowledge)\s+(?:with|in|of)\s+(?P<term>.+)$"),
+     "skill", "have experience with"),
+    (re.compile(r"^(?:who|which candidates?)\s+(?:knows?|uses?|can use)\s+(?P<term>.+)$"),
+     "skill", "have experience with"),
+    (re.compile(r"^(?:who|which candidates?)\s+(?:graduated|studied|got (?:a|their) degree)\s+(?:from|at|in)\s+(?P<term>.+)$"),
+     "university", "graduated from"),
+    (re.compile(r"^(?:who|which candidates?)\s+(?:has\s+|have\s+)?(?:worked|works|work|is working)\s+(?:at|for)\s+(?P<term>.+)$"),
+     "company", "worked at"),
+]
+
+def is_distinctive(term):
+    """True for normalized terms of several words or with digits or symbols, which rarely occur by chance."""
+    return " " in term or not term.isalpha()
+
+def normalize_term(text):
+    """Lowercases, strips accents and collapses punctuation so terms compare reliably."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"[^a-z0-9+#.]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip().rstrip(".")
+
+def acronym(text):
+    """Builds an acronym from the significant words of a name, e.g. 'upc'."""
+    words = [w for w in normalize_term(text).split() if w not in ACRONYM_STOPWORDS]
+    return "".join(w[0] for w in words) if len(words) > 1 else ""
+
+class CandidateIndex:
+    """
+    In-memory inverted index over the structured candidate profiles in data/.
+    Maps normalized skills, universities, degrees, employers, job titles and names
+    to the candidates that list them, so enumeration questions can be answered
+    without an LLM call and vector searches can be restricted to matching CVs.
+    `external` holds the PDF file names of CVs without a structured profile, which
+    the index knows nothing about.
+    """
+
+    def __init__(self, profiles, external=()):
+        self.candidates = {}
+        self.index = defaultdict(lambda: defaultdict(set))
+        self.aliases = defaultdict(dict)
+        self.labels = {}
+        for position, profile_data in profiles:
+            self.add_profile(position, profile_data)
+        self.external = set(external) - self.candidates.keys()
+
+    @classmethod
+    def from_directory(cls, profile_directory=PROFILE_DIRECTORY, cv_directory=CV_DIRECTORY):
+        """
+        Builds the index from the candidate_XX.json files in a directory. Like ingestion,
+        it only includes candidates whose PDF is in `cv_directory`, so deleting a CV removes
+        the candidate from the answers too. The other PDFs in `cv_directory` are external.
+        """
+        # Searched recursively like ingestion; external CVs are kept relative to `cv_directory`.
+        pdfs = {os.path.relpath(path, cv_directory)
+                for path in glob.glob(os.path.join(cv_directory, "**", "*.pdf"), recursive=True)}
+        return cls([(index, profile_data) for index, profile_data in load_profiles(profile_directory)
+                    if pdf_file_name(profile_data, index) in pdfs], external=pdfs)
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def _add(self, field, value, candidate_id, with_acronym=False):
+        term = normalize_term(value)
+        if not term:
+            return
+        self.index[field][term].add(candidate_id)
+        self.labels.setdefault(term, str(value).strip())
+        short = acronym(value) if with_acronym else ""
+        if short and short not in self.index[field]:
+            self.aliases[field][short] = term
+            self.labels.setdefault(short, short.upper())
+
+    def add_profile(self, position, profile_data):
+        """Indexes the fields of a single profile."""
+        candidate_id = pdf_file_name(profile_data, position)
+        self.candidates[candidate_id] = {
+            "name": profile_data.get('full_name', '') or candidate_id,
+            "job_title": profile_data.get('job_title', ''),
+        }
+        self._add("name", profile_data.get('full_name', ''), candidate_id)
+        self._add("job_title", profile_data.get('job_title', ''), candidate_id)
+        for skills in ((profile_data.get('skills', {}) or {}).values()):
+            for skill in (skills or []):
+                self._add("skill", skill, candidate_id)
+        for job in (profile_data.get('work_experience', []) or []):
+            self._add("company", job.get('company', ''), candidate_id)
+            self._add("job_title", job.get('title', ''), candidate_id)
+        for edu in (profile_data.get('education', []) or []):
+            self._add("university", edu.get('university', ''), candidate_id, with_acronym=True)
+            self._add("degree", edu.get('degree', ''), candidate_id)
+
+    def lookup(self, field, value):
+        """
+        Returns the set of candidate IDs (PDF file names) whose `field` matches `value`.
+        Exact matches win; otherwise acronyms and whole-word partial matches are accepted.
+        """
+        terms = self.index.get(field, {})
+        term = normalize_term(value)
+        if not term:
+            return set()
+        if term in terms:
+            return set(terms[term])
+        if term in self.aliases.get(field, {}):
+            return set(terms[self.aliases[field][term]])
+        pattern = re.compile(rf"(?:^|\s){re.escape(term)}(?:\s|$)")
+        matches = set()
+        for key, candidate_ids in terms.items():
+            if pattern.search(key):
+                matches |= candidate_ids
+        return matches
+
+    def answer(self, question):
+        """
+        Answers enumeration questions such as "Who has experience with Python?" directly
+        from the index. Returns {"answer", "sources"} or None if the question is not
+        one the index can answer, in which case the RAG chain should handle it. That
+        includes every question while there are external CVs, which only the RAG chain
+        can search.
+        """
+        if self.external:
+            return None
+        text = normalize_term(question)
+        for pattern, field, phrase in QUESTION_PATTERNS:
+            match = pattern.match(text)
+            if not match:
+                continue
+            term = match.group("term")
+            candidate_ids = self.lookup(field, term)
+            if not candidate_ids:
+                # Let the RAG chain try the question on the CV texts.
+                return None
+            sources = sorted(candidate_ids)
+            names = [self._describe(cid) for cid in sources]
+            subject = "candidate" if len(names) == 1 else f"{len(names)} candidates"
+            label = self.labels.get(term, term)
+            return {
+                "answer": f"The following {subject} {phrase} {label}: " + ", ".join(names) + ".",
+                "sources": sources,
+            }
+        return None
+
+    def _describe(self, candidate_id):
+        candidate = self.candidates[candidate_id]
+        if candidate["job_title"]:
+            return f"{candidate['name']} ({candidate['job_title']})"
+        return candidate["name"]
+
+    def _phrases(self, question):
+        words = normalize_term(question).split()
+        return {
+            " ".join(words[i:i + n])
+            for n in range(1, MAX_TERM_WORDS + 1)
+            for i in range(len(words) - n + 1)
+        }
+
+    def _match(self, phrases, fields, aliases=False):
+        matched = set()
+        for field in fields:
+            terms = self.index.get(field, {})
+            for phrase in phrases & terms.keys():
+                matched |= terms[phrase]
+            if aliases:
+                for phrase in phrases & self.aliases.get(field, {}).keys():
+                    matched |= terms[self.aliases[field][phrase]]
+        return matched
+
+    def candidate_filter(self, question):
+        """
+        Returns the set of candidate IDs a question can only be about, or None if it
+        does not pin them down. Candidate names take precedence; otherwise skills,
+        employers, universities and degrees restrict the search only when they are
+        distinctive: several words ("machine learning") or a word with digits or
+        symbols ("c++", "node.js"). Plain single words such as "go" or "excel" are
+        often ordinary English, so they are only a ranking hint (see candidate_hint).
+        """
+        phrases = self._phrases(question)
+        named = self._match(phrases, ("name",))
+        if named:
+            return named
+        distinctive = {phrase for phrase in phrases if is_distinctive(phrase)}
+        return self._match(distinctive, TERM_FIELDS) or None
+
+    def candidate_hint(self, question):
+        """
+        Returns the candidate IDs whose skills, employers, universities, degrees or
+        university acronyms appear in the question as plain single words, or None.
+        Their chunks are ranked first, but no other CV is excluded from the search.
+        """
+        phrases = {phrase for phrase in self._phrases(question) if not is_distinctive(phrase)}
+        return self._match(phrases, TERM_FIELDS, aliases=True) or None
@@ -0,0 +1,94 @@
+# src/candidate_retrieval.py
+
+import hashlib
+import numpy as np
+from langchain_chroma import Chroma
+from metrics import span
+
+# Constants
+# One summary vector per source PDF, stored next to the chunk collection.
+SUMMARY_COLLECTION_NAME = "candidate_summaries"
+
+def summary_id(source, content_hash):
+    """Builds the ID of a file's summary vector from its path and content hash."""
+    return hashlib.sha1(f"{source}:{content_hash}:summary".encode("utf-8")).hexdigest()
+
+def summary_vector(vectors):
+    """
+    Combines a candidate's chunk embeddings into one unit-length summary vector.
+    The normalized mean keeps cosine and L2 rankings consistent with the chunk vectors.
+    """
+    mean = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm > 0 else mean).tolist()
+
+def open_summary_store(embeddings, persist_directory):
+    """Opens the collection holding the per-candidate summary vectors."""
+    return Chroma(
+        collection_name=SUMMARY_COLLECTION_NAME,
+        persist_directory=persist_directory,
+        embedding_function=embeddings
+    )
+
+def add_summaries(summary_store, files, chunks, vectors):
+    """
+    Writes one summary vector per file. `files` maps each path to its manifest entry,
+    `chunks` and `vectors` are the file chunks and their embeddings in matching order.
+    """
+    by_source = {}
+    for chunk, vector in zip(chunks, vectors):
+        by_source.setdefault(chunk.metadata.get("source"), []).append((chunk, vector))
+    ids, embeddings, documents, metadatas = [], [], [], []
+    for path, entry in files.items():
+        items = by_source.get(path)
+        if not items:
+            continue
+        ids.append(summary_id(path, entry["sha256"]))
+        embeddings.append(summary_vector([vector for _, vector in items]))
+        # The first chunk holds the candidate's name and headline, which is enough for display.
+        documents.append(items[0][0].page_content)
+        metadatas.append({"source": path, "chunks": len(items)})
+    if ids:
+        summary_store._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+class HierarchicalRetriever:
+    """
+    Two-stage retrieval: a coarse search over the per-candidate summary vectors picks
+    the top candidates, then a fine search runs only over those candidates' chunks.
+    The fine search touches a few dozen chunks whatever the corpus size, and returns
+    up to `chunks_per_candidate` chunks for each selected candidate, so answers can
+    cite several CVs.
+    """
+
+    def __init__(self, vector_store, summary_store, top_candidates=5, chunks_per_candidate=1, fetch_k=20):
+        self.vector_store = vector_store
+        self.summary_store = summary_store
+        self.top_candidates = top_candidates
+        self.chunks_per_candidate = chunks_per_candidate
+        self.fetch_k = fetch_k
+
+    def is_available(self):
+        """True once ingestion has written summary vectors."""
+        return self.summary_store._collection.count() > 0
+
+    def search(self, query_embedding, filter=None):
+        """Returns the best chunks of the best matching candidates, ordered by candidate rank."""
+        with span("candidate_search"):
+            summaries = self.summary_store.similarity_search_by_vector(
+                query_embedding, k=self.top_candidates, filter=filter
+            )
+        sources = [doc.metadata["source"] for doc in summaries]
+        if not sources:
+            return []
+        with span("chunk_search"):
+            chunks = self.vector_store.similarity_search_by_vector(
+                query_embedding,
+                k=max(self.fetch_k, len(sources) * self.chunks_per_candidate),
+                filter={"source": {"$in": sources}},
+            )
+        selected = {source: [] for source in sources}
+        for doc in chunks:
+            bucket = selected.get(doc.metadata.get("source"))
+            if bucket is not None and len(bucket) < self.chunks_per_candidate:
+                bucket.append(doc)
+        return [doc for source in sources for doc in selected[source]]
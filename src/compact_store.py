@@ -0,0 +1,572 @@
+# src/compact_store.py
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from dotenv import load_dotenv
+from mmr import mmr_select
+
+# --- Configuration ---
+load_dotenv()
+
+# Read-mostly alternative to Chroma: the chunk embeddings are stored as contiguous
+# float16 or int8 matrices (one per segment) that are memory-mapped at query time, plus
+# SQLite sidecar tables with the chunk texts and metadata. Every process that opens the
+# store shares the same page-cached copy of the matrices.
+COMPACT_STORE_PATH = os.getenv("COMPACT_STORE_PATH", os.path.join("vector_store", "compact"))
+COMPACT_STORE_DTYPE = os.getenv("COMPACT_STORE_DTYPE", "int8").lower()
+# Rows scored per block during brute-force search; bounds the float32 working copy.
+COMPACT_SEARCH_BLOCK_ROWS = int(os.getenv("COMPACT_SEARCH_BLOCK_ROWS", "8192"))
+# An incremental commit appends its rows as a new segment and marks the rows it replaces as
+# deleted; the store is compacted into one segment once either of these limits is exceeded.
+COMPACT_MAX_SEGMENTS = int(os.getenv("COMPACT_MAX_SEGMENTS", "8"))
+COMPACT_MAX_DELETED_FRACTION = float(os.getenv("COMPACT_MAX_DELETED_FRACTION", "0.25"))
+CURRENT_FILE_NAME = "CURRENT"
+SUPPORTED_DTYPES = ("float16", "int8")
+
+def quantize(vectors, dtype):
+    """
+    Converts float32 rows to the storage dtype. int8 rows are scaled symmetrically per row,
+    so each row needs one float32 scale; float16 rows need none.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+def dequantize(rows, scales=None):
+    """Converts stored rows back to float32."""
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows * scales[:, None] if scales is not None else rows
+
+def _current_generation(path):
+    try:
+        with open(os.path.join(path, CURRENT_FILE_NAME), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _generation_files(path, name):
+    """The generation file and segment directories a generation consists of."""
+    if not name.endswith(".json"):
+        # A store written before segments existed: the generation is a single segment.
+        return [name]
+    with open(os.path.join(path, name), 'r') as f:
+        return [name, *json.load(f)["segments"]]
+
+class CompactSegment:
+    """
+    One immutable part of the compact store: the memory-mapped matrix, its per-row scales
+    (int8 only), the source of every row and the sidecar table. Segments are written once,
+    by a commit, and shared by every generation that lists them.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.name = os.path.basename(directory)
+        with open(os.path.join(directory, "info.json"), 'r') as f:
+            self.info = json.load(f)
+        self.vectors = self.scales = self.source_codes = None
+        if self.info["count"]:
+            self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+            self.source_codes = np.load(os.path.join(directory, "source_codes.npy"), mmap_mode="r")
+            if self.info["dtype"] == "int8":
+                self.scales = np.load(os.path.join(directory, "scales.npy"), mmap_mode="r")
+        self.sources = self.info["sources"]
+        self.source_index = {source: i for i, source in enumerate(self.sources)}
+        self._db = sqlite3.connect(os.path.join(directory, "metadata.sqlite"), check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def count(self):
+        return self.info["count"]
+
+    def rows(self, indices):
+        """Returns the given rows as a float32 matrix."""
+        indices = np.asarray(indices, dtype=np.int64)
+        scales = np.asarray(self.scales[indices]) if self.scales is not None else None
+        return dequantize(self.vectors[indices], scales)
+
+    def scores(self, query, start, end):
+        """Dot products of rows start..end with a float32 query."""
+        scores = np.asarray(self.vectors[start:end], dtype=np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales[start:end]
+        return scores
+
+    def source_mask(self, values):
+        """Boolean mask of the rows whose source is one of `values`."""
+        if not self.count():
+            return np.zeros(0, dtype=bool)
+        codes = [self.source_index[value] for value in values if value in self.source_index]
+        return np.isin(self.source_codes, codes)
+
+    def all_ids(self):
+        """Returns the chunk IDs in row order."""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT id FROM chunks ORDER BY row")]
+
+    def locate(self, chunk_ids, batch_size=500):
+        """Returns the rows holding any of the given chunk IDs."""
+        chunk_ids = list(chunk_ids)
+        found = []
+        with self._lock:
+            for i in range(0, len(chunk_ids), batch_size):
+                batch = chunk_ids[i:i + batch_size]
+                placeholders = ",".join("?" * len(batch))
+                found.extend(row for row, in self._db.execute(
+                    f"SELECT row FROM chunks WHERE id IN ({placeholders})", batch))
+        return found
+
+    def records(self, indices):
+        """Returns (id, text, metadata) for the given rows, in the order requested."""
+        indices = [int(i) for i in indices]
+        if not indices:
+            return []
+        placeholders = ",".join("?" * len(indices))
+        with self._lock:
+            fetched = {row: (chunk_id, document, json.loads(metadata)) for row, chunk_id, document, metadata in
+                       self._db.execute(f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({placeholders})",
+                                        indices)}
+        return [fetched[i] for i in indices]
+
+def write_segment(directory, dtype, count, dim, batches):
+    """
+    Writes a segment of `count` rows. `batches` yields (ids, documents, metadatas,
+    float32 vectors, stored rows, stored scales); rows that are already stored in `dtype`
+    are passed as stored rows and copied without re-quantizing, the others as float32.
+    """
+    os.makedirs(directory)
+    vectors = np.lib.format.open_memmap(os.path.join(directory, "vectors.npy"), mode="w+",
+                                        dtype=np.float16 if dtype == "float16" else np.int8,
+                                        shape=(count, dim))
+    scales = np.zeros(count, dtype=np.float32)
+    sources, source_index = [], {}
+    source_codes = np.zeros(count, dtype=np.int32)
+    db = sqlite3.connect(os.path.join(directory, "metadata.sqlite"))
+    db.execute("CREATE TABLE chunks (row INTEGER PRIMARY KEY, id TEXT UNIQUE, document TEXT, metadata TEXT)")
+
+    offset = 0
+    for ids, documents, metadatas, float_vectors, raw, raw_scales in batches:
+        if raw is None:
+            raw, raw_scales = quantize(float_vectors, dtype)
+        vectors[offset:offset + len(ids)] = raw
+        if raw_scales is not None:
+            scales[offset:offset + len(ids)] = raw_scales
+        for i, metadata in enumerate(metadatas):
+            source = metadata.get("source", "")
+            if source not in source_index:
+                source_index[source] = len(sources)
+                sources.append(source)
+            source_codes[offset + i] = source_index[source]
+        db.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)",
+                       [(offset + i, chunk_id, document, json.dumps(metadata))
+                        for i, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas))])
+        offset += len(ids)
+
+    vectors.flush()
+    del vectors
+    np.save(os.path.join(directory, "source_codes.npy"), source_codes)
+    if dtype == "int8":
+        np.save(os.path.join(directory, "scales.npy"), scales)
+    db.commit()
+    db.close()
+    with open(os.path.join(directory, "info.json"), 'w') as f:
+        json.dump({"dtype": dtype, "count": count, "dim": dim, "sources": sources}, f)
+    return count
+
+class CompactGeneration:
+    """
+    One published version of the compact store: a list of segments and the rows of each
+    segment that were deleted or replaced since it was written. Rows are numbered across
+    all segments in order. Never modified after it is opened, so a query keeps a consistent
+    view while ingestion publishes the next generation.
+    """
+
+    def __init__(self, path, name, block_rows=COMPACT_SEARCH_BLOCK_ROWS):
+        self.name = name
+        self.block_rows = block_rows
+        if name.endswith(".json"):
+            with open(os.path.join(path, name), 'r') as f:
+                info = json.load(f)
+        else:
+            # A store written before segments existed: the generation is a single segment.
+            info = {"segments": [name], "deleted": {}}
+        self.segments = [CompactSegment(os.path.join(path, segment)) for segment in info["segments"]]
+        first = self.segments[0].info if self.segments else {}
+        self.dtype = info.get("dtype", first.get("dtype"))
+        self.dim = info.get("dim", first.get("dim", 0))
+        self.deleted = {segment: np.asarray(rows, dtype=np.int64) for segment, rows in info["deleted"].items()}
+        counts = [segment.count() for segment in self.segments]
+        self.offsets = np.cumsum([0] + counts)[:-1].astype(np.int64)
+        self.total = int(sum(counts))
+        self.live = None
+        if any(len(rows) for rows in self.deleted.values()):
+            self.live = np.ones(self.total, dtype=bool)
+            for offset, segment in zip(self.offsets, self.segments):
+                self.live[offset + self.deleted.get(segment.name, np.empty(0, dtype=np.int64))] = False
+
+    def count(self):
+        """Rows that were not deleted."""
+        return self.total - (int((~self.live).sum()) if self.live is not None else 0)
+
+    def _split(self, indices):
+        """Groups row numbers by segment: yields (segment number, positions in `indices`, segment rows)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        owners = np.searchsorted(self.offsets, indices, side="right") - 1
+        for owner in np.unique(owners):
+            positions = np.flatnonzero(owners == owner)
+            yield int(owner), positions, indices[positions] - self.offsets[owner]
+
+    def rows(self, indices):
+        """Returns the given rows as a float32 matrix."""
+        result = np.empty((len(indices), self.dim), dtype=np.float32)
+        for owner, positions, rows in self._split(indices):
+            result[positions] = self.segments[owner].rows(rows)
+        return result
+
+    def records(self, indices):
+        """Returns (id, text, metadata) for the given rows, in the order requested."""
+        result = [None] * len(indices)
+        for owner, positions, rows in self._split(indices):
+            for position, record in zip(positions, self.segments[owner].records(rows)):
+                result[position] = record
+        return result
+
+    def documents(self, indices):
+        return [Document(page_content=text, metadata=metadata, id=chunk_id)
+                for chunk_id, text, metadata in self.records(indices)]
+
+    def deleted_rows(self, chunk_ids):
+        """
+        Returns {segment name: deleted rows} with the rows holding `chunk_ids` added to the
+        rows already deleted. Looks the IDs up in the sidecar tables, so it costs time in
+        the number of IDs, not in the size of the store.
+        """
+        deleted = {}
+        for segment in self.segments:
+            rows = set(self.deleted.get(segment.name, np.empty(0, dtype=np.int64)).tolist())
+            rows.update(segment.locate(chunk_ids) if chunk_ids else [])
+            if rows:
+                deleted[segment.name] = rows
+        return deleted
+
+    def blocks(self, block_rows=None):
+        """Yields (row numbers, float32 vectors, sources) of the rows that were not deleted, block by block."""
+        block_rows = block_rows or self.block_rows
+        for offset, segment in zip(self.offsets, self.segments):
+            for start in range(0, segment.count(), block_rows):
+                end = min(start + block_rows, segment.count())
+                rows = np.arange(start, end)
+                if self.live is not None:
+                    rows = rows[self.live[offset + start:offset + end]]
+                if len(rows):
+                    yield ((rows + offset).tolist(), segment.rows(rows),
+                           [segment.sources[code] for code in segment.source_codes[rows]])
+
+    def filter_mask(self, filter):
+        """
+        Translates a Chroma-style filter on `source` ({"source": path}, {"source": {"$in": [...]}}
+        or {"source": {"$nin": [...]}}) into a boolean row mask. Returns None for no filter.
+        """
+        if not filter:
+            return None
+        if set(filter) != {"source"}:
+            raise ValueError(f"The compact store only supports filters on 'source', got: {filter}")
+        condition = filter["source"]
+        negate = False
+        if isinstance(condition, dict):
+            if "$in" in condition:
+                values = condition["$in"]
+            elif "$nin" in condition:
+                values, negate = condition["$nin"], True
+            else:
+                raise ValueError(f"Unsupported filter operator: {condition}")
+        else:
+            values = [condition]
+        mask = np.concatenate([segment.source_mask(values) for segment in self.segments] or [np.zeros(0, dtype=bool)])
+        return ~mask if negate else mask
+
+    def top_k(self, query_embedding, n, mask=None):
+        """Exact top-n rows by dot product, scored block by block. Returns (indices, scores)."""
+        if self.count() == 0 or n <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        best_indices = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for offset, segment in zip(self.offsets, self.segments):
+            for start in range(0, segment.count(), self.block_rows):
+                end = min(start + self.block_rows, segment.count())
+                first, last = offset + start, offset + end
+                scores = segment.scores(query, start, end)
+                if self.live is not None:
+                    scores[~self.live[first:last]] = -np.inf
+                if mask is not None:
+                    scores[~mask[first:last]] = -np.inf
+                if len(scores) > n:
+                    top = np.argpartition(scores, -n)[-n:]
+                else:
+                    top = np.arange(len(scores))
+                best_indices = np.concatenate([best_indices, top + first])
+                best_scores = np.concatenate([best_scores, scores[top]])
+                if len(best_scores) > n:
+                    keep = np.argpartition(best_scores, -n)[-n:]
+                    best_indices, best_scores = best_indices[keep], best_scores[keep]
+        valid = np.isfinite(best_scores)
+        best_indices, best_scores = best_indices[valid], best_scores[valid]
+        order = np.argsort(-best_scores)
+        return best_indices[order], best_scores[order]
+
+class CompactStore:
+    """
+    Query side of the compact store. Rows are scored by blocked brute-force dot products
+    against the memory-mapped matrix, the top `fetch_k` are dequantized and re-ranked with
+    MMR. The store switches to a new generation as soon as ingestion publishes one.
+    """
+
+    def __init__(self, path=COMPACT_STORE_PATH, block_rows=COMPACT_SEARCH_BLOCK_ROWS):
+        self.path = path
+        self.block_rows = block_rows
+        self.current = None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """Returns the current generation (None if nothing was published), reopening it if it changed."""
+        try:
+            stamp = os.stat(os.path.join(self.path, CURRENT_FILE_NAME)).st_mtime_ns
+        except FileNotFoundError:
+            stamp = None
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self.current = self._open_current()
+                    self._stamp = stamp
+        return self.current
+
+    def _open_current(self, attempts=3):
+        # The writer removes a generation one publish after it was replaced, so the files of
+        # the generation CURRENT names can only vanish if two publishes happen while they are
+        # being opened; reading CURRENT again then finds the newer one.
+        for attempt in range(attempts):
+            generation = _current_generation(self.path)
+            if generation is None:
+                return None
+            try:
+                return CompactGeneration(self.path, generation, self.block_rows)
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+
+    def count(self):
+        generation = self.refresh()
+        return generation.count() if generation else 0
+
+    def similarity_search_by_vector(self, query_embedding, k=4, filter=None):
+        generation = self.refresh()
+        if generation is None:
+            return []
+        indices, _ = generation.top_k(query_embedding, k, generation.filter_mask(filter))
+        return generation.documents(indices)
+
+    def max_marginal_relevance_search_by_vector(self, query_embedding, k=4, fetch_k=20, lambda_mult=0.5,
+                                                filter=None, score_threshold=None):
+        """MMR search by vector; results are returned in MMR selection order."""
+        generation = self.refresh()
+        if generation is None:
+            return []
+        indices, _ = generation.top_k(query_embedding, fetch_k, generation.filter_mask(filter))
+        if len(indices) == 0:
+            return []
+        selected = mmr_select(query_embedding, generation.rows(indices), k, lambda_mult, score_threshold)
+        return generation.documents(indices[selected])
+
+class CompactStoreWriter:
+    """
+    Write side of the compact store. Changes are staged in memory and `commit()` publishes
+    them as a new generation and then switches the CURRENT pointer atomically, so readers
+    never see a half-written store. A commit only writes the added rows, as a new segment,
+    and records the rows they replace or that were deleted; the older segments are shared
+    with the previous generation. A rebuild, or a commit that would leave more than
+    COMPACT_MAX_SEGMENTS segments or more than COMPACT_MAX_DELETED_FRACTION deleted rows,
+    compacts the store into a single segment instead.
+    """
+
+    # Nothing is visible until commit(), so ingestion must not checkpoint its manifest per batch.
+    checkpoint_batches = False
+
+    def __init__(self, path=COMPACT_STORE_PATH, dtype=COMPACT_STORE_DTYPE):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"COMPACT_STORE_DTYPE must be one of {SUPPORTED_DTYPES}, got '{dtype}'")
+        self.path = path
+        self.dtype = dtype
+        self.base = CompactStore(path).current
+        self.deleted = set()
+        self.pending = []  # (ids, float32 vectors, documents, metadatas) per batch
+
+    def count(self):
+        """Rows in the current generation."""
+        return self.base.count() if self.base is not None else 0
+
+    def reset(self):
+        """Drops all existing rows."""
+        self.base = None
+        self.deleted.clear()
+
+    def delete(self, chunk_ids, files=None):
+        self.deleted.update(chunk_ids)
+
+    def add(self, ids, chunks, vectors, files=None):
+        self.pending.append((list(ids), np.asarray(vectors, dtype=np.float32),
+                             [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks]))
+
+    def _pending_batches(self):
+        for ids, float_vectors, documents, metadatas in self.pending:
+            yield ids, documents, metadatas, float_vectors, None, None
+
+    def commit(self, manifest=None, compact=False):
+        """
+        Publishes a new generation. A compaction with a manifest only keeps the rows whose
+        chunk IDs it tracks, which also drops rows left behind by an interrupted run.
+        Returns the number of rows written.
+        """
+        removed = self.deleted | {chunk_id for ids, _, _, _ in self.pending for chunk_id in ids}
+        added = sum(len(ids) for ids, _, _, _ in self.pending)
+        base = self.base
+        deleted = {}
+        if base is None or base.dtype != self.dtype or (self.pending and self.pending[0][1].shape[1] != base.dim):
+            compact = True
+        elif not compact:
+            deleted = base.deleted_rows(removed)
+            # Segments whose rows are all deleted are dropped rather than kept with a tombstone per row.
+            segments = [segment.name for segment in base.segments
+                        if len(deleted.get(segment.name, ())) < segment.count()]
+            deleted = {name: rows for name, rows in deleted.items() if name in segments}
+            rows = sum(segment.count() for segment in base.segments if segment.name in segments) + added
+            tombstones = sum(len(rows) for rows in deleted.values())
+            compact = (len(segments) + (1 if self.pending else 0) > COMPACT_MAX_SEGMENTS
+                       or tombstones > COMPACT_MAX_DELETED_FRACTION * rows)
+
+        if compact:
+            written = self._compact(removed, manifest)
+        else:
+            written = 0
+            if self.pending:
+                segment = f"seg-{time.time_ns()}"
+                written = write_segment(os.path.join(self.path, segment), self.dtype, added,
+                                        self.pending[0][1].shape[1], self._pending_batches())
+                segments.append(segment)
+            self._publish(segments, deleted, base.dim if not self.pending else self.pending[0][1].shape[1])
+
+        self.base = CompactStore(self.path).current
+        self.deleted.clear()
+        self.pending.clear()
+        return written
+
+    def _compact(self, removed, manifest):
+        """Writes every remaining row into one new segment and publishes it alone."""
+        valid_ids = None
+        if manifest is not None:
+            valid_ids = {cid for entry in manifest["files"].values() for cid in entry["chunk_ids"]}
+        kept = []  # (segment, rows) whose rows are copied
+        if self.base is not None:
+            for segment in self.base.segments:
+                dropped = set(self.base.deleted.get(segment.name, np.empty(0, dtype=np.int64)).tolist())
+                rows = [row for row, chunk_id in enumerate(segment.all_ids())
+                        if row not in dropped and chunk_id not in removed
+                        and (valid_ids is None or chunk_id in valid_ids)]
+                if rows:
+                    kept.append((segment, np.asarray(rows, dtype=np.int64)))
+        count = sum(len(rows) for _, rows in kept) + sum(len(ids) for ids, _, _, _ in self.pending)
+        dim = self.base.dim if self.base is not None and self.base.count() else 0
+        if self.pending:
+            dim = self.pending[0][1].shape[1]
+
+        def batches():
+            # Copy unchanged rows block by block; same-dtype rows are copied as stored.
+            for segment, rows in kept:
+                same_dtype = segment.info["dtype"] == self.dtype
+                for start in range(0, len(rows), COMPACT_SEARCH_BLOCK_ROWS):
+                    block = rows[start:start + COMPACT_SEARCH_BLOCK_ROWS]
+                    records = segment.records(block)
+                    raw = raw_scales = float_vectors = None
+                    if same_dtype:
+                        raw = segment.vectors[block]
+                        raw_scales = np.asarray(segment.scales[block]) if segment.scales is not None else None
+                    else:
+                        float_vectors = segment.rows(block)
+                    yield ([r[0] for r in records], [r[1] for r in records], [r[2] for r in records],
+                           float_vectors, raw, raw_scales)
+            yield from self._pending_batches()
+
+        segment = f"seg-{time.time_ns()}"
+        write_segment(os.path.join(self.path, segment), self.dtype, count, dim, batches())
+        self._publish([segment], {}, dim)
+        return count
+
+    def _publish(self, segments, deleted, dim):
+        """Writes the generation file, switches readers to it and removes what it no longer uses."""
+        generation = f"gen-{time.time_ns()}.json"
+        with open(os.path.join(self.path, generation), 'w') as f:
+            json.dump({"dtype": self.dtype, "dim": dim, "segments": segments,
+                       "deleted": {name: sorted(rows) for name, rows in deleted.items()}}, f)
+        # Switch readers to the new generation, then remove the files that neither it nor the
+        # previous generation uses. The previous one is kept until the next publish, so a reader
+        # that has just read the old CURRENT can still open it. Processes that already have an
+        # older generation mapped keep reading it until they refresh.
+        pointer = os.path.join(self.path, CURRENT_FILE_NAME)
+        previous = _current_generation(self.path)
+        with open(pointer + ".tmp", 'w') as f:
+            f.write(generation)
+        os.replace(pointer + ".tmp", pointer)
+        keep = {generation, *segments}
+        if previous is not None:
+            try:
+                keep.update(_generation_files(self.path, previous))
+            except FileNotFoundError:
+                pass
+        for name in os.listdir(self.path):
+            if name.startswith(("gen-", "seg-")) and name not in keep:
+                target = os.path.join(self.path, name)
+                if os.path.isdir(target):
+                    shutil.rmtree(target, ignore_errors=True)
+                else:
+                    os.remove(target)
+
+def export_from_chroma(persist_directory, path=COMPACT_STORE_PATH, dtype=COMPACT_STORE_DTYPE, batch_size=5000):
+    """Copies every chunk and its stored embedding from a Chroma store, without re-embedding."""
+    from langchain_chroma import Chroma
+    collection = Chroma(persist_directory=persist_directory)._collection
+    writer = CompactStoreWriter(path, dtype)
+    writer.reset()
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        batch = collection.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        chunks = [Document(page_content=text, metadata=metadata or {})
+                  for text, metadata in zip(batch["documents"], batch["metadatas"])]
+        writer.add(batch["ids"], chunks, batch["embeddings"])
+    return writer.commit()
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a compact memory-mapped store from the Chroma vector store.")
+    parser.add_argument("--from-chroma", default="vector_store", help="Chroma persist directory to export.")
+    parser.add_argument("--output", default=COMPACT_STORE_PATH)
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default=COMPACT_STORE_DTYPE)
+    parser.add_argument("--compact", action="store_true",
+                        help="Compact the existing store at --output into one segment instead of exporting.")
+    args = parser.parse_args()
+    if args.compact:
+        rows = CompactStoreWriter(args.output, args.dtype).commit(compact=True)
+        print(f"Compacted '{args.output}' into one segment of {rows} {args.dtype} rows.")
+    else:
+        rows = export_from_chroma(args.from_chroma, args.output, args.dtype)
+        print(f"Wrote {rows} {args.dtype} rows to '{args.output}'.")
@@ -0,0 +1,147 @@
+# src/context_builder.py
+
+import os
+import re
+from langchain_core.documents import Document
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+
+# Prompt-context assembly: merge overlapping chunks of the same CV, drop near-duplicate
+# passages and pack the rest into a token budget, most relevant first.
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+# Passages whose word shingles are at least this similar to a more relevant passage are dropped.
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+SHINGLE_SIZE = 5
+# Shared text searched for between chunks that lack a start_index: at most the splitter
+# overlap, and anything shorter than MIN_TEXT_OVERLAP is treated as coincidence.
+MAX_TEXT_OVERLAP = 400
+MIN_TEXT_OVERLAP = 20
+PASSAGE_SEPARATOR = "\n\n"
+
+_encoding = None
+
+def count_tokens(text):
+    """
+    Counts tokens with tiktoken's cl100k_base encoding when it is installed (it ships
+    with langchain-openai), otherwise estimates about four characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def _text_overlap(left, right, max_overlap=MAX_TEXT_OVERLAP):
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    for size in range(min(len(left), len(right), max_overlap), MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+def merge_adjacent(docs):
+    """
+    Merges chunks of the same source that overlap or touch into one passage, keeping
+    each passage at the relevance rank of its best chunk. Positions come from the
+    splitter's `start_index`; chunks indexed without it are merged on their shared text.
+    Returns (rank, Document) pairs.
+    """
+    groups = {}
+    for rank, doc in enumerate(docs):
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        groups.setdefault(key, []).append((rank, doc))
+
+    passages = []
+    for items in groups.values():
+        items.sort(key=lambda item: item[1].metadata.get("start_index", item[0]))
+        current_rank, current = items[0][0], items[0][1]
+        text = current.page_content
+        end = current.metadata.get("start_index")
+        end = end + len(text) if end is not None else None
+        for rank, doc in items[1:]:
+            start = doc.metadata.get("start_index")
+            if start is not None and end is not None and start <= end:
+                text += doc.page_content[end - start:]
+                end = max(end, start + len(doc.page_content))
+                current_rank = min(current_rank, rank)
+                continue
+            if start is None or end is None:
+                # Without positions the chunks are in relevance order, so try both sides.
+                overlap = _text_overlap(text, doc.page_content)
+                if overlap:
+                    text += doc.page_content[overlap:]
+                    current_rank = min(current_rank, rank)
+                    continue
+                overlap = _text_overlap(doc.page_content, text)
+                if overlap:
+                    text = doc.page_content + text[overlap:]
+                    current_rank = min(current_rank, rank)
+                    continue
+            passages.append((current_rank, Document(page_content=text, metadata=current.metadata)))
+            current_rank, current, text = rank, doc, doc.page_content
+            end = start + len(text) if start is not None else None
+        passages.append((current_rank, Document(page_content=text, metadata=current.metadata)))
+    passages.sort(key=lambda item: item[0])
+    return passages
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Set of word n-grams used to compare passages."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def drop_near_duplicates(passages, threshold=CONTEXT_DEDUP_THRESHOLD):
+    """
+    Drops passages that repeat a more relevant one, e.g. template boilerplate shared
+    across CVs. A passage is a duplicate when most of its shingles already appear in
+    a kept passage (containment, so a passage contained in a longer one is caught too).
+    """
+    kept, kept_shingles = [], []
+    for rank, doc in passages:
+        current = shingles(doc.page_content)
+        duplicate = any(current and len(current & other) / len(current) >= threshold for other in kept_shingles)
+        if not duplicate:
+            kept.append((rank, doc))
+            kept_shingles.append(current)
+    return kept
+
+def pack(passages, max_tokens=CONTEXT_MAX_TOKENS):
+    """
+    Keeps passages in relevance order while they fit the token budget. A passage that
+    does not fit is skipped so smaller, less relevant ones can still use the space;
+    the most relevant passage is truncated rather than dropped if it alone is too long.
+    Returns (documents, tokens used).
+    """
+    packed, used = [], 0
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR)
+    for rank, doc in passages:
+        tokens = count_tokens(doc.page_content) + (separator_tokens if packed else 0)
+        if used + tokens <= max_tokens:
+            packed.append(doc)
+            used += tokens
+        elif not packed:
+            text = doc.page_content[:max_tokens * 4]
+            while text and count_tokens(text) > max_tokens:
+                text = text[:int(len(text) * 0.9)]
+            packed.append(Document(page_content=text, metadata=doc.metadata))
+            used = count_tokens(text)
+    return packed, used
+
+def assemble_context(docs, max_tokens=CONTEXT_MAX_TOKENS, dedup_threshold=CONTEXT_DEDUP_THRESHOLD):
+    """
+    Turns retrieved chunks (most relevant first) into the passages sent to the LLM.
+    Returns (documents, stats) where stats counts chunks, passages and tokens.
+    """
+    merged = merge_adjacent(docs)
+    unique = drop_near_duplicates(merged, dedup_threshold)
+    packed, tokens = pack(unique, max_tokens)
+    stats = {"chunks": len(docs), "merged": len(docs) - len(merged), "duplicates": len(merged) - len(unique),
+             "over_budget": len(unique) - len(packed), "context_tokens": tokens}
+    return packed, stats
@@ -0,0 +1,206 @@
+# src/embedding_service.py
+
+import os
+import sys
+import time
+import queue
+import signal
+import argparse
+import threading
+from langchain_core.embeddings import Embeddings
+from dotenv import load_dotenv
+from rpc import RPCServer, RPCClient, RPCError, server_authkey
+
+# Shared retrieval service: one local process owns the embedding model and the index and
+# answers the retrieval requests of every app worker over rpc.py (a Unix socket or TCP).
+# Without it, each worker process loads its own copy of the model, opens its own index and
+# keeps its own caches. Query embeddings are micro-batched: the queries that arrive while
+# the model is busy are encoded together in one forward pass, which costs little more than
+# encoding one of them.
+# Start it with `python src/embedding_service.py` and point the workers at it with
+# EMBEDDING_SERVICE_ADDRESS. The service also runs the live ingestion of the CV folders.
+# Requests are authenticated like the shard servers' (see rpc.py): a TCP address other than
+# loopback is only served with an explicit RPC_AUTHKEY.
+
+# --- Configuration ---
+load_dotenv()
+
+# Unix socket path or "host:port" of the service; empty runs retrieval inside each app process.
+EMBEDDING_SERVICE_ADDRESS = os.getenv("EMBEDDING_SERVICE_ADDRESS", "").strip()
+DEFAULT_SERVICE_ADDRESS = "/tmp/cv-screener-embeddings.sock"
+# Most queries encoded in one forward pass.
+EMBEDDING_SERVICE_MAX_BATCH = int(os.getenv("EMBEDDING_SERVICE_MAX_BATCH", "32"))
+# Milliseconds a batch waits for more queries after the first one arrives (0 = only batch
+# the queries that queued up while the previous batch was encoded).
+EMBEDDING_SERVICE_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_SERVICE_BATCH_WINDOW_MS", "2"))
+
+class _Slot:
+    """One queued item and, once its batch ran, its result or error."""
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+class MicroBatcher:
+    """
+    Collects items submitted concurrently from many threads and processes them in batches
+    on one worker thread. `fn` maps a list of items to the list of their results. Under
+    light load every item runs on its own right away; under heavy load the items that
+    arrive while a batch runs form the next batch, up to `max_batch` of them.
+    """
+
+    def __init__(self, fn, max_batch=EMBEDDING_SERVICE_MAX_BATCH, window_ms=EMBEDDING_SERVICE_BATCH_WINDOW_MS):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.window = window_ms / 1000
+        self.queue = queue.Queue()
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        threading.Thread(target=self._run, name="micro-batcher", daemon=True).start()
+
+    def submit(self, item):
+        """Queues `item`, waits for its batch and returns its result."""
+        slot = _Slot(item)
+        self.queue.put(slot)
+        slot.done.wait()
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.fn([slot.item for slot in batch])
+                for slot, result in zip(batch, results):
+                    slot.result = result
+            except Exception as e:
+                for slot in batch:
+                    slot.error = e
+            self.requests += len(batch)
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for slot in batch:
+                slot.done.set()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+class BatchedQueryEmbeddings(Embeddings):
+    """Embeddings whose embed_query() calls from concurrent threads are encoded in micro-batches."""
+
+    def __init__(self, embeddings, max_batch=EMBEDDING_SERVICE_MAX_BATCH, window_ms=EMBEDDING_SERVICE_BATCH_WINDOW_MS):
+        self.embeddings = embeddings
+        self.batcher = MicroBatcher(embeddings.embed_queries, max_batch, window_ms)
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.batcher.submit(text)
+
+class RetrievalService:
+    """
+    The model, index and caches shared by all app workers. `retrieve` runs the same
+    retrieval as an app without the service (see rag_pipeline.get_retriever), so answers
+    do not change; reload() swaps in a retriever over the current index.
+    """
+
+    def __init__(self, embeddings=None, max_batch=EMBEDDING_SERVICE_MAX_BATCH,
+                 window_ms=EMBEDDING_SERVICE_BATCH_WINDOW_MS):
+        from embeddings import get_embeddings
+        self.embeddings = embeddings or get_embeddings()
+        self.batched = BatchedQueryEmbeddings(self.embeddings, max_batch, window_ms)
+        self.retriever = None
+        self.count = None
+
+    def reload(self, warm_up=False):
+        # Imported here: rag_pipeline imports this module for RemoteRetriever.
+        from rag_pipeline import get_retriever
+        retriever = get_retriever(self.batched, warm_up=warm_up)
+        self.retriever, self.count = retriever, retriever.count
+
+    def retrieve(self, question):
+        return self.retriever(question)
+
+    def stats(self):
+        return {"embeddings": self.embeddings.stats(), "batches": self.batched.batcher.stats()}
+
+    def handlers(self):
+        """The RPC methods of the service."""
+        return {
+            "retrieve": self.retrieve,
+            "embed_query": self.batched.embed_query,
+            "embed_documents": self.embeddings.embed_documents,
+            "count": lambda: self.count(),
+            "stats": self.stats,
+        }
+
+class RemoteRetriever:
+    """Drop-in replacement for the retrieve() function of rag_pipeline that calls the service."""
+
+    def __init__(self, address=EMBEDDING_SERVICE_ADDRESS):
+        self.address = address
+        self.client = RPCClient(address)
+
+    def __call__(self, question):
+        return self.client.call("retrieve", question)
+
+    def count(self):
+        return self.client.call("count")
+
+    def stats(self):
+        return self.client.call("stats")
+
+def serve(address, watch=True):
+    """Loads the model and the index, then serves retrieval requests until the process is stopped."""
+    from index_watcher import IndexWatcher, INDEX_WATCH
+    from sharding import SHARD_ADDRESSES
+    # Checked before the model loads: without RPC_AUTHKEY, only local addresses may be served.
+    authkey = server_authkey(address)
+    service = RetrievalService()
+    service.reload(warm_up=True)
+    server = RPCServer(address, service.handlers(), authkey=authkey)
+    print(f"Serving retrieval on {server.address} (batches of up to {service.batched.batcher.max_batch}). "
+          f"Point the app workers at it with EMBEDDING_SERVICE_ADDRESS={server.address}", flush=True)
+    if watch and INDEX_WATCH and not SHARD_ADDRESSES:
+        # The service ingests for all workers; they only reload their structured profiles.
+        IndexWatcher(service.reload, service.embeddings).start()
+    server.serve_forever()
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the embedding model and the index to all app workers.")
+    parser.add_argument("--address", default=EMBEDDING_SERVICE_ADDRESS or DEFAULT_SERVICE_ADDRESS,
+                        help="Unix socket path or host:port to listen on.")
+    parser.add_argument("--no-watch", action="store_true", help="Do not ingest new CVs while serving.")
+    args = parser.parse_args()
+
+    # SIGTERM (e.g. docker stop) exits cleanly like Ctrl+C.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        serve(args.address, watch=not args.no_watch)
+    except RPCError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,290 @@
+# src/embeddings.py
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from langchain_core.embeddings import Embeddings
+from dotenv import load_dotenv
+from query_cache import LRUCache, MISSING
+
+# --- Configuration ---
+load_dotenv()
+
+# Constants
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache/embeddings.sqlite")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))
+EMBEDDING_NORMALIZE = os.getenv("EMBEDDING_NORMALIZE", "true").lower() == "true"
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+# Optional pre-serialized (and optionally int8-quantized) model, built with --build-snapshot
+EMBEDDING_SNAPSHOT_PATH = os.getenv("EMBEDDING_SNAPSHOT_PATH", "")
+
+def text_hash(text):
+    """Hashes a chunk of text for use as an embedding cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    On-disk cache from (model name, text hash) to embedding vector, stored in SQLite.
+    Vectors are kept as packed float32 blobs, independent of any vector store backend.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes, chunk_size=500):
+        """Returns a dict of text hash -> vector for every hash found in the cache."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for i in range(0, len(unique), chunk_size):
+                batch = unique[i:i + chunk_size]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                )
+                for key, blob in rows:
+                    vector = array('f')
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+        return found
+
+    def put_many(self, model, items):
+        """Stores (text hash, vector) pairs."""
+        rows = [(model, key, array('f', vector).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+class SnapshotEmbeddings(Embeddings):
+    """
+    Embeddings served by a SentenceTransformer loaded from a torch snapshot.
+    Loading a snapshot skips the Hugging Face Hub lookup and model construction, and an
+    int8-quantized snapshot uses a fraction of the memory of the float32 weights.
+    """
+
+    def __init__(self, path, batch_size=EMBEDDING_BATCH_SIZE, normalize=EMBEDDING_NORMALIZE):
+        import torch
+        self.client = torch.load(path, map_location="cpu", weights_only=False)
+        self.client.eval()
+        self.batch_size = batch_size
+        self.normalize = normalize
+
+    def embed_documents(self, texts):
+        vectors = self.client.encode(list(texts), batch_size=self.batch_size,
+                                     normalize_embeddings=self.normalize, convert_to_numpy=True)
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def build_snapshot(path, model_name=EMBEDDING_MODEL_NAME, quantize=True):
+    """Serializes the sentence-transformers model, optionally with int8 dynamic quantization."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name, device="cpu")
+    model.eval()
+    if quantize:
+        # Dynamic quantization stores the Linear layers' weights as int8 and quantizes
+        # activations on the fly, which keeps quality close to float32 on CPU.
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    torch.save(model, path)
+    print(f"Saved {'quantized ' if quantize else ''}snapshot of '{model_name}' to '{path}' "
+          f"({os.path.getsize(path) / 1e6:.1f} MB).")
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embedding layer in front of the sentence-transformers model.
+    Document embeddings are looked up in the on-disk cache first and only the
+    texts that have never been seen are encoded, in batches of `batch_size`.
+    The model itself is loaded lazily, so a run with only cache hits never loads it.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, cache_path=EMBEDDING_CACHE_PATH,
+                 batch_size=EMBEDDING_BATCH_SIZE, device=EMBEDDING_DEVICE,
+                 num_threads=EMBEDDING_NUM_THREADS, normalize=EMBEDDING_NORMALIZE,
+                 query_cache_size=QUERY_EMBEDDING_CACHE_SIZE, snapshot_path=EMBEDDING_SNAPSHOT_PATH):
+        self.model_name = model_name
+        self.snapshot_path = snapshot_path
+        self.batch_size = batch_size
+        self.device = device
+        self.num_threads = num_threads
+        self.normalize = normalize
+        # Normalized and raw vectors differ, so they are cached under separate keys.
+        self.cache_key = f"{model_name}|normalized" if normalize else model_name
+        if snapshot_path:
+            # Falling back to the full model would store its vectors under the snapshot's cache key.
+            if not os.path.exists(snapshot_path):
+                raise FileNotFoundError(
+                    f"EMBEDDING_SNAPSHOT_PATH '{snapshot_path}' does not exist. Build it with "
+                    f"`python src/embeddings.py --build-snapshot {snapshot_path}` or unset EMBEDDING_SNAPSHOT_PATH.")
+            # A quantized snapshot produces slightly different vectors, so it gets its own cache entries.
+            # Its size and mtime are part of the key: rebuilding a snapshot at the same path (another
+            # model, or --no-quantize) must not reuse the vectors of the previous one. Hashing the
+            # file would also work but costs a full read at every startup.
+            stat = os.stat(snapshot_path)
+            self.cache_key += f"|snapshot:{os.path.basename(snapshot_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+        # Query vectors depend only on the model, so they stay valid across index versions.
+        self.query_cache = LRUCache(query_cache_size)
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+    @property
+    def model(self):
+        """The underlying HuggingFace embedding model, loaded on first use."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        from langchain_huggingface import HuggingFaceEmbeddings
+        if self.num_threads > 0:
+            import torch
+            torch.set_num_threads(self.num_threads)
+        if self.snapshot_path:
+            print(f"Loading embedding model snapshot: '{self.snapshot_path}'...")
+            return SnapshotEmbeddings(self.snapshot_path, batch_size=self.batch_size, normalize=self.normalize)
+        print(f"Loading embedding model: '{self.model_name}'...")
+        return HuggingFaceEmbeddings(
+            model_name=self.model_name,
+            model_kwargs={"device": self.device},
+            encode_kwargs={"batch_size": self.batch_size, "normalize_embeddings": self.normalize},
+        )
+
+    def _encode(self, texts):
+        start = time.perf_counter()
+        vectors = self.model.embed_documents(texts)
+        self.encode_seconds += time.perf_counter() - start
+        self.encoded += len(texts)
+        return vectors
+
+    def embed_documents(self, texts):
+        """Embeds a list of texts, encoding only those missing from the cache."""
+        if self.cache is None:
+            return self._encode(list(texts))
+
+        hashes = [text_hash(text) for text in texts]
+        cached = self.cache.get_many(self.cache_key, hashes)
+        # Deduplicate misses so boilerplate repeated across CVs is encoded once.
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        miss_count = sum(1 for key in hashes if key not in cached)
+        self.hits += len(hashes) - miss_count
+        self.misses += miss_count
+
+        missing_items = list(missing.items())
+        for i in range(0, len(missing_items), self.batch_size):
+            batch = missing_items[i:i + self.batch_size]
+            vectors = self._encode([text for _, text in batch])
+            new_items = [(key, vector) for (key, _), vector in zip(batch, vectors)]
+            self.cache.put_many(self.cache_key, new_items)
+            cached.update(new_items)
+        return [cached[key] for key in hashes]
+
+    def embed_query(self, text):
+        """
+        Embeds a search query. Recent queries are kept in an in-memory LRU
+        but are not written to the on-disk cache.
+        """
+        vector = self.query_cache.get(text)
+        if vector is not MISSING:
+            return vector
+        start = time.perf_counter()
+        vector = self.model.embed_query(text)
+        self.encode_seconds += time.perf_counter() - start
+        self.encoded += 1
+        self.query_cache.put(text, vector)
+        return vector
+
+    def embed_queries(self, texts):
+        """
+        Embeds several search queries with one call to the model, the batched form of
+        embed_query(). Used by the embedding service to encode concurrent queries together.
+        """
+        vectors = [self.query_cache.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is MISSING))
+        if missing:
+            start = time.perf_counter()
+            encoded = dict(zip(missing, self.model.embed_documents(missing)))
+            self.encode_seconds += time.perf_counter() - start
+            self.encoded += len(missing)
+            for text, vector in encoded.items():
+                self.query_cache.put(text, vector)
+            vectors = [encoded[text] if vector is MISSING else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def stats(self):
+        """Returns cache hit rate and encoding throughput counters."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "encoded": self.encoded,
+            "embeddings_per_sec": self.encoded / self.encode_seconds if self.encode_seconds else 0.0,
+        }
+
+    def report(self):
+        """Formats the cache statistics for console output."""
+        s = self.stats()
+        return (f"Embedding cache: {s['hits']}/{s['hits'] + s['misses']} hits ({s['hit_rate']:.1%} hit rate), "
+                f"{s['encoded']} texts encoded at {s['embeddings_per_sec']:.1f} embeddings/sec.")
+
+# --- Shared embedding layer ---
+# Created on first use; every get_embeddings() call of the process returns it, so the model is loaded once.
+_shared = None
+_shared_lock = threading.Lock()
+
+def get_embeddings(**kwargs):
+    """
+    Returns the shared, cache-backed embedding layer used for ingestion and querying.
+    Passing any keyword argument builds a separate instance with those settings instead.
+    """
+    global _shared
+    if kwargs:
+        return CachedEmbeddings(**kwargs)
+    with _shared_lock:
+        if _shared is None:
+            _shared = CachedEmbeddings()
+    return _shared
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Embedding layer utilities.")
+    parser.add_argument("--build-snapshot", metavar="PATH", required=True,
+                        help="Write a serialized model snapshot to PATH (set EMBEDDING_SNAPSHOT_PATH to use it).")
+    parser.add_argument("--no-quantize", action="store_true", help="Keep the float32 weights.")
+    args = parser.parse_args()
+    build_snapshot(args.build_snapshot, quantize=not args.no_quantize)
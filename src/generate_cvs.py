@@ -2,15 +2,17 @@
 
 import os
 import json
-import random
+import threading
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from fpdf import FPDF
+from fpdf.enums import XPos, YPos
 from dotenv import load_dotenv
 from io import BytesIO
 from openai import OpenAI
 from PIL import Image
+from profiles import pdf_file_name
 
 # --- Configuration ---
 # Load environment variables from.env file
@@ -20,13 +22,16 @@ load_dotenv()
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-if not OPENROUTER_API_KEY:
-    raise ValueError("OPENROUTER_API_KEY not found in.env file.")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in.env file.")
+# API endpoints (override to point the generator at local stand-ins)
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 
-# Configure the OpenAI client
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+def check_api_keys():
+    """Fails early if the API keys needed for generation are missing."""
+    if not OPENROUTER_API_KEY:
+        raise ValueError("OPENROUTER_API_KEY not found in.env file.")
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not found in.env file.")
 
 # Constants
 NUM_CVS_TO_GENERATE = 5
@@ -34,6 +39,12 @@ OUTPUT_JSON_DIR = "data"
 OUTPUT_IMAGE_DIR = "data"
 OUTPUT_PDF_DIR = "cvs_generated"
 
+# Headshots are embedded in PDFs as downscaled JPEG copies kept in a pdf_headshots
+# directory next to the originals. 0 pixels embeds the original image.
+PDF_HEADSHOT_CACHE_DIR_NAME = "pdf_headshots"
+PDF_HEADSHOT_PIXELS = int(os.getenv("PDF_HEADSHOT_PIXELS", "320"))
+PDF_HEADSHOT_QUALITY = int(os.getenv("PDF_HEADSHOT_QUALITY", "85"))
+
 # Define candidate personas to ensure variety in generated profiles
 PERSONAS = ["Software Engineer", 
     "Data Scientist",
@@ -63,12 +74,32 @@ PERSONAS = ["Software Engineer",
     "Reporter"]
 
 # --- LLM and Prompt Setup ---
-llm = ChatOpenAI(
-    model="mistralai/mistral-7b-instruct:free",
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY,
-    temperature=0.8,
-)
+# Clients are created on first use so that the PDF helpers can be imported without API keys.
+# Retries are handled by the generation pipeline, so the SDK's own retries are disabled.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_llm():
+    """Returns the shared OpenRouter chat model."""
+    with _clients_lock:
+        if "llm" not in _clients:
+            check_api_keys()
+            _clients["llm"] = ChatOpenAI(
+                model="mistralai/mistral-7b-instruct:free",
+                base_url=OPENROUTER_BASE_URL,
+                api_key=OPENROUTER_API_KEY,
+                temperature=0.8,
+                max_retries=0,
+            )
+    return _clients["llm"]
+
+def get_openai_client():
+    """Returns the shared OpenAI client used for image generation."""
+    with _clients_lock:
+        if "openai" not in _clients:
+            check_api_keys()
+            _clients["openai"] = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+    return _clients["openai"]
 
 prompt_template = """
 Generate a realistic, synthetic professional profile for a candidate in the tech industry,
@@ -117,260 +148,308 @@ The JSON schema should be:
 
 prompt = ChatPromptTemplate.from_template(prompt_template)
 output_parser = StrOutputParser()
-chain = prompt | llm | output_parser
+
+def get_profile_chain():
+    """Returns the profile generation chain."""
+    llm = get_llm()
+    with _clients_lock:
+        if "chain" not in _clients:
+            _clients["chain"] = prompt | llm | output_parser
+    return _clients["chain"]
 
 # --- Core Functions ---
 
+def clean_llm_output(raw_response):
+    """Normalizes an LLM response to a string and strips Markdown code fences."""
+    # Normalize to string in case we got an AIMessage
+    text = raw_response.content if hasattr(raw_response, "content") else str(raw_response)
+    return text.strip().replace("```json", "").replace("```", "").strip()
+
+def _request_profile_text(persona):
+    return clean_llm_output(get_profile_chain().invoke({"persona": persona}))
+
+def _repair_profile(text):
+    # Ask the LLM to repair to strict JSON (handles unescaped quotes, trailing commas, etc.)
+    repair_prompt = (
+        "Convert the following text into STRICT, valid JSON that matches the schema provided earlier. "
+        "Fix any issues such as unescaped quotes inside strings and remove any Markdown fences. "
+        "Only output the JSON object and nothing else.\n\n" + text
+    )
+    return json.loads(clean_llm_output(get_llm().invoke(repair_prompt)))
+
+def request_profile(persona, call=None):
+    """
+    Asks the LLM for a single candidate profile and parses it, with a second request
+    to repair the JSON if it does not parse. `call(fn, *args)` runs each request; the
+    generation pipeline passes ApiLimiter.call, so both are rate limited and retried
+    on their own. Raises on API or parsing errors so callers can decide whether to retry.
+    """
+    call = call or (lambda fn, *args: fn(*args))
+    cleaned_response = call(_request_profile_text, persona)
+
+    # First parse attempt
+    try:
+        return json.loads(cleaned_response)
+    except Exception:
+        return call(_repair_profile, cleaned_response)
+
+def save_profile(profile_data, index):
+    """Writes a profile to data/candidate_XX.json."""
+    file_path = os.path.join(OUTPUT_JSON_DIR, f"candidate_{index:02d}.json")
+    with open(file_path, 'w') as f:
+        json.dump(profile_data, f, indent=2)
+    print(f"  -> Successfully saved profile to {file_path}")
+    return file_path
+
 def generate_profile(persona, index):
     """Generates a single candidate profile in JSON format using the LLM."""
     print(f"Generating profile {index+1}/{NUM_CVS_TO_GENERATE} for persona: {persona}...")
-    response_str = "No response received from LLM." # Initialize for robust error handling
     try:
-        raw_response = chain.invoke({"persona": persona})
-
-        # Normalize to string in case we got an AIMessage
-        response_str = (
-            raw_response.content if hasattr(raw_response, "content") else str(raw_response)
-        )
-
-        cleaned_response = (
-            response_str
-            .strip()
-            .replace("```json", "")
-            .replace("```", "")
-            .strip()
-        )
-
-        # First parse attempt
-        try:
-            profile_data = json.loads(cleaned_response)
-        except Exception:
-            # Ask the LLM to repair to strict JSON (handles unescaped quotes, trailing commas, etc.)
-            repair_prompt = (
-                "Convert the following text into STRICT, valid JSON that matches the schema provided earlier. "
-                "Fix any issues such as unescaped quotes inside strings and remove any Markdown fences. "
-                "Only output the JSON object and nothing else.\n\n" + cleaned_response
-            )
-            repaired_raw = llm.invoke(repair_prompt)
-            repaired_text = (
-                repaired_raw.content if hasattr(repaired_raw, "content") else str(repaired_raw)
-            )
-            repaired_clean = (
-                repaired_text
-                .strip()
-                .replace("```json", "")
-                .replace("```", "")
-                .strip()
-            )
-            profile_data = json.loads(repaired_clean)
-
+        profile_data = request_profile(persona)
         print(f"Profile data: {profile_data}")
-        
-        file_path = os.path.join(OUTPUT_JSON_DIR, f"candidate_{index:02d}.json")
-        with open(file_path, 'w') as f:
-            json.dump(profile_data, f, indent=2)
-        print(f"  -> Successfully saved profile to {file_path}")
+        save_profile(profile_data, index)
         return profile_data
     except Exception as e:
         print(f"  -> Error generating or parsing profile {index}: {e}")
-        print("     LLM Response was:\n", response_str)
         return None
 
+def request_headshot(profile_data):
+    """
+    Generates a headshot with the OpenAI Images API and returns the image bytes.
+    Raises on API errors so callers can decide whether to retry.
+    """
+    prompt = (
+        f"Photorealistic professional headshot of a {profile_data.get('job_title', 'person')}. "
+        "Professional attire, neutral studio background, high-resolution, 4k."
+    )
+
+    # OpenAI Images API (v1): use 'gpt-image-1' for image generation
+    img = get_openai_client().images.generate(
+        model='gpt-image-1',
+        prompt=prompt,
+        size='1024x1024',
+        quality='high',
+        n=1,
+    )
+
+    if not img.data:
+        raise ValueError('No image data returned by OpenAI Images API.')
+
+    # Support both base64 and URL responses depending on SDK version
+    import base64, requests
+    if getattr(img.data[0], 'b64_json', None):
+        return base64.b64decode(img.data[0].b64_json)
+    elif getattr(img.data[0], 'url', None):
+        r = requests.get(img.data[0].url, timeout=30)
+        r.raise_for_status()
+        return r.content
+    raise ValueError('OpenAI Images API returned neither b64_json nor url.')
+
+def save_headshot(image_bytes, index):
+    """Writes a headshot to data/candidate_XX.png."""
+    image = Image.open(BytesIO(image_bytes))
+    file_path = os.path.join(OUTPUT_IMAGE_DIR, f"candidate_{index:02d}.png")
+    image.save(file_path, format='PNG')
+    print(f"  -> Successfully saved headshot to {file_path}")
+    return file_path
+
 def generate_headshot(profile_data, index):
     """Generates a headshot using the OpenAI Images API and saves it."""
     print(f"Generating headshot for candidate {index+1}...")
     try:
-        prompt = (
-            f"Photorealistic professional headshot of a {profile_data.get('job_title', 'person')}. "
-            "Professional attire, neutral studio background, high-resolution, 4k."
-        )
-
-        # OpenAI Images API (v1): use 'gpt-image-1' for image generation
-        img = openai_client.images.generate(
-            model='gpt-image-1',
-            prompt=prompt,
-            size='1024x1024',
-            quality='high',
-            n=1,
-        )
-
-        if not img.data:
-            raise ValueError('No image data returned by OpenAI Images API.')
-
-        # Support both base64 and URL responses depending on SDK version
-        image_bytes = None
-        import base64, requests
-        if getattr(img.data[0], 'b64_json', None):
-            image_bytes = base64.b64decode(img.data[0].b64_json)
-        elif getattr(img.data[0], 'url', None):
-            r = requests.get(img.data[0].url, timeout=30)
-            r.raise_for_status()
-            image_bytes = r.content
-        else:
-            raise ValueError('OpenAI Images API returned neither b64_json nor url.')
-        image = Image.open(BytesIO(image_bytes))
-
-        file_path = os.path.join(OUTPUT_IMAGE_DIR, f"candidate_{index:02d}.png")
-        image.save(file_path, format='PNG')
-        print(f"  -> Successfully saved headshot to {file_path}")
+        save_headshot(request_headshot(profile_data), index)
         return True
     except Exception as e:
         print(f"  -> Error generating headshot for candidate {index}: {e}")
         return False
 
+def pdf_headshot(image_path, pixels=PDF_HEADSHOT_PIXELS, quality=PDF_HEADSHOT_QUALITY):
+    """
+    Returns the headshot to embed in a PDF: a downscaled JPEG copy of `image_path`,
+    created on first use and rebuilt when the source image changes.
+    fpdf2 embeds JPEG data as-is, whereas a PNG is decoded and re-compressed for every
+    document, which made the 1024x1024 headshot most of the rendering time and file size.
+    """
+    if pixels <= 0:
+        return image_path
+    cache_dir = os.path.join(os.path.dirname(image_path), PDF_HEADSHOT_CACHE_DIR_NAME)
+    cached_path = os.path.join(cache_dir, os.path.splitext(os.path.basename(image_path))[0] + ".jpg")
+    if os.path.exists(cached_path) and os.path.getmtime(cached_path) >= os.path.getmtime(image_path):
+        return cached_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with Image.open(image_path) as image:
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+        image.thumbnail((pixels, pixels), Image.LANCZOS)
+        # Written under a temporary name so concurrent renderers never embed a partial file.
+        tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+        image.save(tmp_path, format="JPEG", quality=quality, optimize=True)
+    os.replace(tmp_path, cached_path)
+    return cached_path
+
+class CVTemplate:
+    """
+    The CV page layout: a grey sidebar with the headshot, contact details and skills,
+    and a main column with the name, summary, work experience and education.
+    Build it once and call `render` for each CV; the bulk renderer keeps one per worker process.
+    """
+
+    SIDEBAR_WIDTH, MAIN_CONTENT_WIDTH, MARGIN = 60, 130, 10
+    PAGE_HEIGHT = 297
+    SIDEBAR_FILL = (240, 240, 240)
+    FONT = "helvetica"  # The core font that "Arial" resolves to, named directly to skip the substitution.
+
+    def __init__(self):
+        self.sidebar_text_width = self.SIDEBAR_WIDTH - 2 * self.MARGIN
+        self.main_x = self.SIDEBAR_WIDTH + self.MARGIN
+
+    def new_document(self):
+        """Returns a document whose first page already has the static sidebar background."""
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.set_fill_color(*self.SIDEBAR_FILL)
+        pdf.rect(0, 0, self.SIDEBAR_WIDTH, self.PAGE_HEIGHT, 'F')
+        return pdf
+
+    def line(self, pdf, height, text, style="", size=10):
+        """Writes one line of text and moves to the start of the next line."""
+        pdf.set_font(self.FONT, style, size)
+        pdf.cell(0, height, text, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    def render(self, profile_data, headshot_path, pdf_path, index=0):
+        """Lays out one CV and writes it to `pdf_path`."""
+        # Safely extract fields with sensible defaults
+        full_name = profile_data.get('full_name', f"Candidate {index:02d}")
+        job_title = profile_data.get('job_title', '')
+        contact = profile_data.get('contact', {}) or {}
+        email = contact.get('email', '')
+        phone = contact.get('phone', '')
+        linkedin = contact.get('linkedin', '')
+        summary = profile_data.get('summary', '')
+        skills_section = profile_data.get('skills', {}) or {}
+        work_experiences = profile_data.get('work_experience', []) or []
+        education_list = profile_data.get('education', []) or []
+
+        MARGIN, MAIN_CONTENT_WIDTH = self.MARGIN, self.MAIN_CONTENT_WIDTH
+        pdf = self.new_document()
+        pdf.image(headshot_path, x=MARGIN, y=MARGIN, w=self.sidebar_text_width)
+
+        # Sidebar content (contact + skills)
+        pdf.set_xy(MARGIN, MARGIN + self.sidebar_text_width + 10)
+        self.line(pdf, 5, "Contact", "B")
+        pdf.set_font(self.FONT, "", 8)
+        if email:
+            pdf.multi_cell(self.sidebar_text_width, 5, f"Email: {email}")
+        if phone:
+            pdf.set_x(MARGIN)
+            pdf.multi_cell(self.sidebar_text_width, 5, f"Phone: {phone}")
+        if linkedin:
+            pdf.set_x(MARGIN)
+            pdf.multi_cell(self.sidebar_text_width, 5, f"LinkedIn: {linkedin}")
+
+        pdf.set_xy(MARGIN, pdf.get_y() + 10)
+        self.line(pdf, 5, "Skills", "B")
+
+        for skill_type, skills in skills_section.items():
+            pdf.set_x(MARGIN)
+            self.line(pdf, 5, skill_type.replace('_', ' ').title() + ":", "B", 8)
+            pdf.set_font(self.FONT, "", 8)
+            for skill in (skills or []):
+                pdf.set_x(MARGIN + 2)
+                pdf.cell(0, 5, f"- {skill}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+        # Switch to main content column on the right
+        pdf.set_left_margin(self.main_x)
+        pdf.set_right_margin(MARGIN)
+        pdf.set_xy(self.main_x, MARGIN)
+        self.line(pdf, 10, full_name, "B", 24)
+        self.line(pdf, 8, job_title, "I", 14)
+
+        pdf.set_y(pdf.get_y() + 5)
+        self.line(pdf, 8, "Professional Summary", "B", 12)
+        pdf.set_font(self.FONT, "", 10)
+        pdf.multi_cell(MAIN_CONTENT_WIDTH, 5, summary)
+        pdf.set_x(self.main_x)
+
+        pdf.set_y(pdf.get_y() + 5)
+        self.line(pdf, 8, "Work Experience", "B", 12)
+        for job in work_experiences:
+            title = job.get('title', '')
+            company = job.get('company', '')
+            self.line(pdf, 6, f"{title} | {company}".strip(' |'), "B", 10)
+            self.line(pdf, 5, job.get('dates', ''), "I", 9)
+            pdf.set_font(self.FONT, "", 10)
+            for desc_point in (job.get('description', []) or []):
+                pdf.multi_cell(MAIN_CONTENT_WIDTH, 5, f"- {desc_point}")
+                pdf.set_x(self.main_x)
+            pdf.ln(3)
+            pdf.set_x(self.main_x)
+
+        pdf.set_y(pdf.get_y() + 5)
+        self.line(pdf, 8, "Education", "B", 12)
+        for edu in education_list:
+            self.line(pdf, 6, f"{edu.get('degree', '')}", "B", 10)
+            uni = edu.get('university', '')
+            yr = edu.get('year', '')
+            self.line(pdf, 5, f"{uni} ({yr})" if uni or yr else "")
+
+        pdf.output(pdf_path)
+        return pdf_path
+
+_template = None
+
+def get_cv_template():
+    """Returns the CV template of this process."""
+    global _template
+    if _template is None:
+        _template = CVTemplate()
+    return _template
+
 def create_cv_pdf(profile_data, index):
     """Assembles a PDF CV from the profile data and a corresponding image."""
     image_path = os.path.join(OUTPUT_IMAGE_DIR, f"candidate_{index:02d}.png")
     if not os.path.exists(image_path):
         print(f"Warning: Image not found for candidate {index}. Skipping PDF generation.")
-        return
-
-    # Safely extract fields with sensible defaults
-    full_name = profile_data.get('full_name', f"Candidate {index:02d}")
-    job_title = profile_data.get('job_title', '')
-    contact = profile_data.get('contact', {}) or {}
-    email = contact.get('email', '')
-    phone = contact.get('phone', '')
-    linkedin = contact.get('linkedin', '')
-    summary = profile_data.get('summary', '')
-    skills_section = profile_data.get('skills', {}) or {}
-    work_experiences = profile_data.get('work_experience', []) or []
-    education_list = profile_data.get('education', []) or []
-
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    
-    SIDEBAR_WIDTH, MAIN_CONTENT_WIDTH, MARGIN = 60, 130, 10
-    
-    pdf.set_fill_color(240, 240, 240)
-    pdf.rect(0, 0, SIDEBAR_WIDTH, 297, 'F')
-    
-    pdf.image(image_path, x=MARGIN, y=MARGIN, w=SIDEBAR_WIDTH - 2 * MARGIN)
-    
-    # Sidebar content (contact + skills)
-    pdf.set_xy(MARGIN, MARGIN + (SIDEBAR_WIDTH - 2 * MARGIN) + 10)
-    pdf.set_font("Arial", "B", 10)
-    pdf.cell(0, 5, "Contact", ln=True)
-    pdf.set_font("Arial", "", 8)
-    if email:
-        pdf.multi_cell(SIDEBAR_WIDTH - 2 * MARGIN, 5, f"Email: {email}")
-    if phone:
-        pdf.set_x(MARGIN)
-        pdf.multi_cell(SIDEBAR_WIDTH - 2 * MARGIN, 5, f"Phone: {phone}")
-    if linkedin:
-        pdf.set_x(MARGIN)
-        pdf.multi_cell(SIDEBAR_WIDTH - 2 * MARGIN, 5, f"LinkedIn: {linkedin}")
-    
-    pdf.set_xy(MARGIN, pdf.get_y() + 10)
-    pdf.set_font("Arial", "B", 10)
-    pdf.cell(0, 5, "Skills", ln=True)
-    
-    for skill_type, skills in skills_section.items():
-        pdf.set_font("Arial", "B", 8)
-        pdf.set_x(MARGIN)
-        pdf.cell(0, 5, skill_type.replace('_', ' ').title() + ":", ln=True)
-        pdf.set_font("Arial", "", 8)
-        for skill in (skills or []):
-            pdf.set_x(MARGIN + 2)
-            pdf.cell(0, 5, f"- {skill}", ln=True)
-
-    # Switch to main content column on the right
-    pdf.set_left_margin(SIDEBAR_WIDTH + MARGIN)
-    pdf.set_right_margin(MARGIN)
-    pdf.set_xy(SIDEBAR_WIDTH + MARGIN, MARGIN)
-    pdf.set_font("Arial", "B", 24)
-    pdf.cell(0, 10, full_name, ln=True)
-    pdf.set_font("Arial", "I", 14)
-    pdf.cell(0, 8, job_title, ln=True)
-    
-    pdf.set_y(pdf.get_y() + 5)
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 8, "Professional Summary", ln=True)
-    pdf.set_font("Arial", "", 10)
-    pdf.multi_cell(MAIN_CONTENT_WIDTH, 5, summary)
-    pdf.set_x(SIDEBAR_WIDTH + MARGIN)
-    
-    pdf.set_y(pdf.get_y() + 5)
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 8, "Work Experience", ln=True)
-    for job in work_experiences:
-        pdf.set_font("Arial", "B", 10)
-        title = job.get('title', '')
-        company = job.get('company', '')
-        pdf.cell(0, 6, f"{title} | {company}".strip(' |'), ln=True)
-        pdf.set_font("Arial", "I", 9)
-        pdf.cell(0, 5, job.get('dates', ''), ln=True)
-        pdf.set_font("Arial", "", 10)
-        for desc_point in (job.get('description', []) or []):
-            pdf.multi_cell(MAIN_CONTENT_WIDTH, 5, f"- {desc_point}")
-            pdf.set_x(SIDEBAR_WIDTH + MARGIN)
-        pdf.ln(3)
-        pdf.set_x(SIDEBAR_WIDTH + MARGIN)
-
-    pdf.set_y(pdf.get_y() + 5)
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 8, "Education", ln=True)
-    for edu in education_list:
-        pdf.set_font("Arial", "B", 10)
-        pdf.cell(0, 6, f"{edu.get('degree', '')}", ln=True)
-        pdf.set_font("Arial", "", 10)
-        uni = edu.get('university', '')
-        yr = edu.get('year', '')
-        pdf.cell(0, 5, f"{uni} ({yr})" if uni or yr else "", ln=True)
-        
-    safe_name = (full_name or f"candidate_{index:02d}").replace(' ', '_')
-    pdf_file_name = f"{safe_name}_CV.pdf"
-    pdf_path = os.path.join(OUTPUT_PDF_DIR, pdf_file_name)
-    pdf.output(pdf_path)
+        return None
+
+    pdf_path = os.path.join(OUTPUT_PDF_DIR, pdf_file_name(profile_data, index))
+    get_cv_template().render(profile_data, pdf_headshot(image_path), pdf_path, index)
     print(f"  -> Successfully created PDF: {pdf_path}")
+    return pdf_path
 
 # --- Main Execution ---
 if __name__ == "__main__":
-    os.makedirs(OUTPUT_JSON_DIR, exist_ok=True)
-    os.makedirs(OUTPUT_PDF_DIR, exist_ok=True)
-
+    import argparse
+    from generation_pipeline import (
+        GenerationPipeline, GENERATION_LLM_CONCURRENCY, GENERATION_IMAGE_CONCURRENCY,
+        GENERATION_LLM_RATE_PER_MIN, GENERATION_IMAGE_RATE_PER_MIN, GENERATION_MAX_RETRIES,
+    )
+
+    parser = argparse.ArgumentParser(description="Generate synthetic candidate profiles, headshots and PDF CVs.")
+    parser.add_argument("--num", type=int, default=NUM_CVS_TO_GENERATE, help="Number of CVs to generate.")
+    parser.add_argument("--llm-concurrency", type=int, default=GENERATION_LLM_CONCURRENCY)
+    parser.add_argument("--image-concurrency", type=int, default=GENERATION_IMAGE_CONCURRENCY)
+    parser.add_argument("--llm-rate", type=float, default=GENERATION_LLM_RATE_PER_MIN, help="LLM requests per minute.")
+    parser.add_argument("--image-rate", type=float, default=GENERATION_IMAGE_RATE_PER_MIN, help="Image requests per minute.")
+    parser.add_argument("--max-retries", type=int, default=GENERATION_MAX_RETRIES)
+    args = parser.parse_args()
+
+    check_api_keys()
     print("--- Starting Fully Automated CV Generation Process ---")
-    
-    # Pre-scan existing artifacts
-    existing_json = sorted([f for f in os.listdir(OUTPUT_JSON_DIR) if f.startswith("candidate_") and f.endswith(".json")])
-    existing_images = sorted([f for f in os.listdir(OUTPUT_IMAGE_DIR) if f.startswith("candidate_") and f.endswith((".png", ".jpg", ".jpeg"))])
-    existing_pdfs = sorted([f for f in os.listdir(OUTPUT_PDF_DIR) if f.lower().endswith(".pdf")])
-
-    for i in range(NUM_CVS_TO_GENERATE):
-        persona = random.choice(PERSONAS)
-
-        # Decide filenames for this index
-        json_path = os.path.join(OUTPUT_JSON_DIR, f"candidate_{i:02d}.json")
-        img_path = os.path.join(OUTPUT_IMAGE_DIR, f"candidate_{i:02d}.png")
-
-        # 1) Generate profile only if needed
-        profile = None
-        if len(existing_json) >= NUM_CVS_TO_GENERATE or os.path.exists(json_path):
-            try:
-                with open(json_path, 'r') as f:
-                    profile = json.load(f)
-                print(f"Skipping profile generation for candidate {i+1}: JSON already exists.")
-            except Exception:
-                profile = None
-        else:
-            profile = generate_profile(persona, i)
-
-        # 2) Generate headshot only if profile is available and needed
-        if profile:
-            if len(existing_images) >= NUM_CVS_TO_GENERATE or os.path.exists(img_path):
-                print(f"Skipping headshot generation for candidate {i+1}: image already exists.")
-                headshot_generated = True
-            else:
-                headshot_generated = generate_headshot(profile, i)
-
-            # 3) Create PDF only if needed and headshot exists
-            if headshot_generated:
-                if len(existing_pdfs) >= NUM_CVS_TO_GENERATE:
-                    print(f"Skipping PDF creation for candidate {i+1}: enough PDFs already exist.")
-                else:
-                    create_cv_pdf(profile, i)
-            else:
-                print(f"Skipping PDF creation for profile {i+1} due to headshot generation failure.")
-            
-    print("\n--- CV Generation Process Finished ---")
\ No newline at end of file
+    # Existing JSON, images and PDFs are reused, so an interrupted run resumes where it stopped.
+    GenerationPipeline(
+        num_cvs=args.num,
+        llm_concurrency=args.llm_concurrency,
+        image_concurrency=args.image_concurrency,
+        llm_rate_per_min=args.llm_rate,
+        image_rate_per_min=args.image_rate,
+        max_retries=args.max_retries,
+    ).run()
+    print("\n--- CV Generation Process Finished ---")
@@ -0,0 +1,200 @@
+# src/generation_pipeline.py
+
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+import generate_cvs
+from llm_client import error_status, is_retryable, retry_after
+
+# --- Configuration ---
+load_dotenv()
+
+# Separate limits for the text LLM (OpenRouter) and the image API (OpenAI Images)
+GENERATION_LLM_CONCURRENCY = int(os.getenv("GENERATION_LLM_CONCURRENCY", "4"))
+GENERATION_IMAGE_CONCURRENCY = int(os.getenv("GENERATION_IMAGE_CONCURRENCY", "2"))
+GENERATION_LLM_RATE_PER_MIN = float(os.getenv("GENERATION_LLM_RATE_PER_MIN", "60"))
+GENERATION_IMAGE_RATE_PER_MIN = float(os.getenv("GENERATION_IMAGE_RATE_PER_MIN", "20"))
+GENERATION_MAX_RETRIES = int(os.getenv("GENERATION_MAX_RETRIES", "5"))
+GENERATION_BACKOFF_BASE = float(os.getenv("GENERATION_BACKOFF_BASE", "1.0"))
+GENERATION_BACKOFF_MAX = float(os.getenv("GENERATION_BACKOFF_MAX", "60"))
+JOURNAL_FILE_NAME = "generation_journal.jsonl"
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    Allows bursts of up to `capacity` calls and `rate_per_min` calls per minute on average.
+    """
+
+    def __init__(self, rate_per_min, capacity=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class ApiLimiter:
+    """Bounds the concurrency and rate of calls to one API and retries transient failures."""
+
+    def __init__(self, name, concurrency, rate_per_min, max_retries=GENERATION_MAX_RETRIES,
+                 backoff_base=GENERATION_BACKOFF_BASE, backoff_max=GENERATION_BACKOFF_MAX):
+        self.name = name
+        self.semaphore = threading.BoundedSemaphore(max(1, concurrency))
+        self.bucket = TokenBucket(rate_per_min)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.calls = 0
+        self.retries = 0
+
+    def call(self, fn, *args):
+        """Calls `fn(*args)` within the limits, with exponential backoff and jitter on retryable errors."""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                with self.semaphore:
+                    self.calls += 1
+                    return fn(*args)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                self.retries += 1
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                # A server's Retry-After is honoured up to backoff_max, like the backoff itself.
+                delay = min(self.backoff_max, max(delay, retry_after(e)))
+                print(f"  -> {self.name} call failed ({error_status(e) or type(e).__name__}), "
+                      f"retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+class JobJournal:
+    """
+    Append-only JSON Lines journal of generation progress.
+    Records the persona chosen for each candidate and every completed or failed stage,
+    so an interrupted run resumes with the same personas and skips finished work.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # A torn last line from an interrupted run
+                    self._apply(entry)
+
+    def _apply(self, entry):
+        job = self.jobs.setdefault(entry["index"], {"persona": None, "done": set()})
+        if entry.get("persona"):
+            job["persona"] = entry["persona"]
+        if entry.get("status") == "done":
+            job["done"].add(entry["stage"])
+
+    def record(self, index, stage, status, **fields):
+        entry = {"index": index, "stage": stage, "status": status, "time": time.time(), **fields}
+        with self.lock:
+            self._apply(entry)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def persona(self, index):
+        return self.jobs.get(index, {}).get("persona")
+
+    def is_done(self, index, stage):
+        return stage in self.jobs.get(index, {}).get("done", set())
+
+class GenerationPipeline:
+    """
+    Generates candidates concurrently: profile (LLM) -> headshot (image API) -> PDF.
+    Each candidate is one job on a thread pool; the LLM and image calls are bounded
+    by separate concurrency limits and token buckets, so jobs overlap across stages
+    without exceeding either provider's limits.
+    """
+
+    def __init__(self, num_cvs=generate_cvs.NUM_CVS_TO_GENERATE,
+                 llm_concurrency=GENERATION_LLM_CONCURRENCY, image_concurrency=GENERATION_IMAGE_CONCURRENCY,
+                 llm_rate_per_min=GENERATION_LLM_RATE_PER_MIN, image_rate_per_min=GENERATION_IMAGE_RATE_PER_MIN,
+                 max_retries=GENERATION_MAX_RETRIES):
+        self.num_cvs = num_cvs
+        self.llm = ApiLimiter("LLM", llm_concurrency, llm_rate_per_min, max_retries)
+        self.images = ApiLimiter("Image API", image_concurrency, image_rate_per_min, max_retries)
+        self.workers = max(1, llm_concurrency + image_concurrency)
+        self.journal = JobJournal(os.path.join(generate_cvs.OUTPUT_JSON_DIR, JOURNAL_FILE_NAME))
+
+    def run_job(self, index):
+        """Runs the remaining stages for one candidate. Returns True if its PDF exists at the end."""
+        json_path = os.path.join(generate_cvs.OUTPUT_JSON_DIR, f"candidate_{index:02d}.json")
+        img_path = os.path.join(generate_cvs.OUTPUT_IMAGE_DIR, f"candidate_{index:02d}.png")
+        persona = self.journal.persona(index) or random.choice(generate_cvs.PERSONAS)
+        stage = "profile"
+        try:
+            # 1) Profile
+            if os.path.exists(json_path):
+                with open(json_path, 'r') as f:
+                    profile = json.load(f)
+            else:
+                print(f"Generating profile {index+1}/{self.num_cvs} for persona: {persona}...")
+                self.journal.record(index, stage, "started", persona=persona)
+                profile = generate_cvs.request_profile(persona, self.llm.call)
+                generate_cvs.save_profile(profile, index)
+                self.journal.record(index, stage, "done", persona=persona)
+
+            # 2) Headshot
+            stage = "headshot"
+            if not os.path.exists(img_path):
+                print(f"Generating headshot for candidate {index+1}...")
+                image_bytes = self.images.call(generate_cvs.request_headshot, profile)
+                generate_cvs.save_headshot(image_bytes, index)
+                self.journal.record(index, stage, "done")
+
+            # 3) PDF
+            stage = "pdf"
+            pdf_path = os.path.join(generate_cvs.OUTPUT_PDF_DIR, generate_cvs.pdf_file_name(profile, index))
+            if not (self.journal.is_done(index, stage) and os.path.exists(pdf_path)):
+                generate_cvs.create_cv_pdf(profile, index)
+                self.journal.record(index, stage, "done", pdf=os.path.basename(pdf_path))
+            return True
+        except Exception as e:
+            print(f"  -> Error in {stage} stage for candidate {index}: {e}")
+            self.journal.record(index, stage, "failed", persona=persona, error=str(e))
+            return False
+
+    def run(self):
+        """Runs all jobs and prints a throughput summary. Returns the number of completed CVs."""
+        os.makedirs(generate_cvs.OUTPUT_JSON_DIR, exist_ok=True)
+        os.makedirs(generate_cvs.OUTPUT_IMAGE_DIR, exist_ok=True)
+        os.makedirs(generate_cvs.OUTPUT_PDF_DIR, exist_ok=True)
+        start = time.perf_counter()
+        completed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.run_job, i) for i in range(self.num_cvs)]
+            for future in as_completed(futures):
+                completed += 1 if future.result() else 0
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        print(f"Completed {completed}/{self.num_cvs} CVs in {elapsed:.1f}s ({completed / elapsed * 60:.1f} CVs/min); "
+              f"{self.llm.calls} LLM calls ({self.llm.retries} retries), "
+              f"{self.images.calls} image calls ({self.images.retries} retries).")
+        if completed < self.num_cvs:
+            print("Re-run the generator to resume the failed candidates.")
+        return completed
@@ -0,0 +1,97 @@
+# src/index_manifest.py
+
+import os
+import json
+import time
+import fcntl
+import hashlib
+from contextlib import contextmanager
+
+# Constants
+MANIFEST_FILE_NAME = "ingest_manifest.json"
+LOCK_FILE_NAME = ".ingest.lock"
+
+def manifest_path(vector_store_path):
+    """Returns the location of the ingestion manifest inside a vector store directory."""
+    return os.path.join(vector_store_path, MANIFEST_FILE_NAME)
+
+def file_sha256(path, block_size=1 << 20):
+    """Hashes a file's content so unchanged CVs can be recognised across runs."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(source, content_hash, position):
+    """Builds a stable chunk ID from the source file, its content hash and the chunk position."""
+    return hashlib.sha1(f"{source}:{content_hash}:{position}".encode("utf-8")).hexdigest()
+
+def load_manifest(vector_store_path):
+    """
+    Loads the manifest mapping each ingested file to its content hash and the
+    IDs of the chunks it produced. Returns None if no manifest exists yet.
+    """
+    path = manifest_path(vector_store_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    manifest.setdefault("files", {})
+    return manifest
+
+def new_manifest():
+    """Returns an empty manifest."""
+    return {"version": None, "files": {}}
+
+def mark_changed(manifest):
+    """
+    Assigns a new index version after the vector store content changed.
+    Versions are timestamps rather than counters so a rebuild never reuses an old one.
+    """
+    manifest["version"] = time.time_ns()
+
+# Last version read per manifest, keyed by path and refreshed only when the file changes.
+_version_cache = {}
+
+def read_index_version(vector_store_path):
+    """
+    Returns the current index version of a vector store, or None if it has no manifest.
+    Cheap enough to call on every query: the manifest is only re-read when its mtime changes.
+    """
+    path = manifest_path(vector_store_path)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _version_cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    manifest = load_manifest(vector_store_path) or {}
+    version = manifest.get("version")
+    _version_cache[path] = (signature, version)
+    return version
+
+def save_manifest(vector_store_path, manifest):
+    """Writes the manifest atomically so an interrupted run never leaves it half-written."""
+    os.makedirs(vector_store_path, exist_ok=True)
+    path = manifest_path(vector_store_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+@contextmanager
+def ingest_lock(vector_store_path):
+    """
+    Holds an exclusive lock on a vector store for the duration of an ingestion run.
+    The lock is tied to the open file, so the OS releases it if the process dies.
+    """
+    os.makedirs(vector_store_path, exist_ok=True)
+    with open(os.path.join(vector_store_path, LOCK_FILE_NAME), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,140 @@
+# src/index_watcher.py
+
+import os
+import glob
+import time
+import threading
+from dotenv import load_dotenv
+from index_manifest import read_index_version
+from metrics import INDEX_UPDATES
+
+# Live ingestion for the running app: a background thread polls the CV and profile folders,
+# runs the incremental ingestion of ingest_data.py when something was added, changed or
+# deleted, and then hands a freshly built RAG chain to the app. Requests already running
+# finish on the chain they started with; new requests see the new CVs.
+# Polling needs no extra dependency and also works on bind mounts, where inotify events
+# from the host are not delivered into the container.
+
+# --- Configuration ---
+load_dotenv()
+
+VECTOR_STORE_PATH = "vector_store"
+CV_DIRECTORY = "cvs_generated"
+PROFILE_DIRECTORY = "data"
+
+INDEX_WATCH = os.getenv("INDEX_WATCH", "true").lower() == "true"
+# Seconds between two scans of the folders. A change is ingested once two consecutive
+# scans agree, so a file still being copied is not picked up half-written.
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "2"))
+# Chunks embedded per batch; each batch is written and checkpointed on its own.
+INDEX_WATCH_BATCH_SIZE = int(os.getenv("INDEX_WATCH_BATCH_SIZE", "32"))
+# Longest wait in seconds between retries of a failed sync; the wait doubles from the interval.
+INDEX_WATCH_RETRY_MAX = float(os.getenv("INDEX_WATCH_RETRY_MAX", "300"))
+
+def folder_snapshot(patterns):
+    """Maps every file matching `patterns` to its (mtime, size), the cheap signature of its content."""
+    snapshot = {}
+    for pattern in patterns:
+        for path in glob.glob(pattern, recursive=True):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # Deleted between the listing and the stat
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+class IndexWatcher:
+    """
+    Polls the CV folders and keeps the vector store in sync with them.
+    After an ingestion run that changed the index, `on_update` is called on the watcher
+    thread to build and swap in a new chain. The first sync runs right after start, so
+    CVs added while the app was down are picked up as well.
+    With `ingest=False` the watcher only follows an index another process ingests into
+    (the retrieval service) and calls `on_update` whenever its version changes.
+    """
+
+    def __init__(self, on_update, embeddings=None, interval=INDEX_WATCH_INTERVAL, batch_size=INDEX_WATCH_BATCH_SIZE,
+                 patterns=None, ingest=True):
+        self.on_update = on_update
+        self.embeddings = embeddings
+        self.ingest = ingest
+        self.interval = interval
+        self.batch_size = batch_size
+        self.patterns = patterns or [os.path.join(CV_DIRECTORY, "**", "*.pdf"),
+                                     os.path.join(PROFILE_DIRECTORY, "candidate_*.json")]
+        self.stopped = threading.Event()
+        self.thread = None
+        self.version = None
+
+    def sync(self):
+        """
+        Runs one incremental ingestion and calls `on_update` if the index changed.
+        Returns True once the index reflects the folders, False if anything failed and the
+        sync must be retried. CVs ingested before a failure are swapped in all the same.
+        """
+        start = time.perf_counter()
+        complete = True
+        if self.ingest:
+            from ingest_data import create_vector_store
+            try:
+                # Never clears the index being served; a store without a manifest needs an offline rebuild.
+                failures = create_vector_store(workers=1, embeddings=self.embeddings, batch_size=self.batch_size,
+                                               allow_reset=False)
+            except Exception as e:
+                INDEX_UPDATES.inc(status="failed")
+                print(f"Live ingestion failed: {type(e).__name__}: {e}")
+                return False
+            if failures:
+                INDEX_UPDATES.inc(status="failed")
+                complete = False
+        version = read_index_version(VECTOR_STORE_PATH)
+        if version == self.version:
+            return complete
+        try:
+            self.on_update()
+        except Exception as e:
+            INDEX_UPDATES.inc(status="failed")
+            print(f"Index updated, but it could not be swapped in: {type(e).__name__}: {e}")
+            return False
+        self.version = version
+        INDEX_UPDATES.inc(status="ok")
+        print(f"Index updated and swapped in {time.perf_counter() - start:.1f}s.")
+        return complete
+
+    def run(self):
+        """
+        Polls until stop() is called. A failed sync is retried with exponential backoff
+        while the folders stay the same, and right away once they change again.
+        """
+        synced = failed = None
+        pending = folder_snapshot(self.patterns)
+        retry_at, backoff = 0.0, self.interval
+        while True:
+            current = folder_snapshot(self.patterns)
+            if failed is not None and current != failed:
+                # New files may fix what failed (e.g. a broken PDF replaced), so they skip the backoff.
+                failed, retry_at, backoff = None, 0.0, self.interval
+            if current == pending and current != synced and time.monotonic() >= retry_at:
+                if self.sync():
+                    synced, failed, retry_at, backoff = current, None, 0.0, self.interval
+                else:
+                    failed, retry_at = current, time.monotonic() + backoff
+                    print(f"Retrying the index sync in {backoff:g}s.")
+                    backoff = min(backoff * 2, INDEX_WATCH_RETRY_MAX)
+            pending = current
+            if self.stopped.wait(self.interval):
+                return
+
+    def start(self):
+        """Starts polling on a daemon thread and returns the watcher."""
+        self.version = read_index_version(VECTOR_STORE_PATH)
+        self.thread = threading.Thread(target=self.run, name="index-watcher", daemon=True)
+        self.thread.start()
+        if self.ingest:
+            print(f"Watching '{CV_DIRECTORY}' and '{PROFILE_DIRECTORY}' for new CVs every {self.interval:g}s.")
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
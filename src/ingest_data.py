@@ -1,11 +1,23 @@
 # src/ingest_data.py
 
 import os
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.documents import Document
 from langchain_chroma import Chroma
 from dotenv import load_dotenv
+from embeddings import get_embeddings
+from index_manifest import (load_manifest, new_manifest, save_manifest, mark_changed, file_sha256, chunk_id,
+                            ingest_lock)
+from candidate_retrieval import open_summary_store, add_summaries, summary_id
+from compact_store import CompactStoreWriter, COMPACT_STORE_DTYPE
+from profiles import PROFILE_DIRECTORY, PROFILE_SECTIONS_VERSION, profile_files, profile_sections, pdf_file_name
+from sharding import INDEX_SHARDS, shard_of, shard_paths, index_base_path
 
 # --- Configuration ---
 load_dotenv()
@@ -13,45 +25,348 @@ load_dotenv()
 # Constants for file paths
 CV_DIRECTORY = "cvs_generated"
 VECTOR_STORE_PATH = "vector_store"
-EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
 
-def create_vector_store():
+# Ingestion tuning
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+# "chroma" or "compact" (memory-mapped float16/int8 matrix, see compact_store.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+# "auto" ingests a CV from its structured profile (data/candidate_XX.json) when one exists
+# and parses the PDF only for external CVs; "pdf" always parses the PDFs.
+INGEST_SOURCE = os.getenv("INGEST_SOURCE", "auto").lower()
+
+def load_and_split(path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Loads a single PDF and splits it into chunks.
+    Runs inside the worker processes, so failures are returned instead of raised
+    to keep one broken PDF from aborting the whole run.
+    """
+    try:
+        # start_index lets the query side merge overlapping chunks back into one passage.
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                       add_start_index=True)
+        documents = PyPDFLoader(path).load()
+        return path, text_splitter.split_documents(documents), None
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}"
+
+def load_profile_sections(source, profile_path, index):
+    """
+    Builds one chunk per section of a structured profile, with the candidate name and the
+    section as metadata. `source` is the CV's PDF path, so sources and filters look the
+    same whichever way the CV was ingested.
+    """
+    try:
+        with open(profile_path, 'r') as f:
+            profile_data = json.load(f)
+        name = profile_data.get('full_name') or f"Candidate {index:02d}"
+        chunks = [Document(page_content=text, metadata={"source": source, "candidate": name, "section": section,
+                                                        "profile": profile_path})
+                  for section, text in profile_sections(profile_data, index)]
+        return source, chunks, None
+    except Exception as e:
+        return source, [], f"{type(e).__name__}: {e}"
+
+def discover_profiles(profile_directory=PROFILE_DIRECTORY):
+    """Maps the PDF path of every CV with a structured profile to (profile path, candidate index)."""
+    profiles = {}
+    for index, path in profile_files(profile_directory):
+        try:
+            with open(path, 'r') as f:
+                profile_data = json.load(f)
+        except Exception as e:
+            print(f"  -> Skipping unreadable profile '{path}': {e}")
+            continue
+        profiles[os.path.join(CV_DIRECTORY, pdf_file_name(profile_data, index))] = (path, index)
+    return profiles
+
+def iter_split_documents(paths, workers, profiles=None):
+    """
+    Yields (path, chunks, error) for each CV as soon as it has been split.
+    CVs with a structured profile are split by section straight from the JSON;
+    the remaining PDFs are parsed, on a process pool when there is more than one worker.
+    """
+    profiles = profiles or {}
+    for path in paths:
+        if path in profiles:
+            yield load_profile_sections(path, *profiles[path])
+    pdf_paths = [path for path in paths if path not in profiles]
+    if workers <= 1:
+        for path in pdf_paths:
+            yield load_and_split(path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(load_and_split, path) for path in pdf_paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+class ChromaWriter:
+    """Writes chunks and per-candidate summary vectors to the Chroma collections."""
+
+    # Chroma persists every write, so the manifest can be checkpointed after each batch.
+    checkpoint_batches = True
+
+    def __init__(self, embeddings, path=VECTOR_STORE_PATH):
+        self.vector_store = Chroma(
+            persist_directory=path,
+            embedding_function=embeddings
+        )
+        self.summary_store = open_summary_store(embeddings, path)
+
+    def count(self):
+        return self.vector_store._collection.count()
+
+    def reset(self):
+        self.vector_store.reset_collection()
+        self.summary_store.reset_collection()
+
+    def delete(self, chunk_ids, files):
+        self.vector_store.delete(ids=chunk_ids)
+        self.summary_store.delete(ids=[summary_id(path, entry["sha256"]) for path, entry in files.items()])
+
+    def add(self, ids, chunks, vectors, files):
+        # The vectors are written directly, so the summary vectors reuse them.
+        self.vector_store._collection.upsert(
+            ids=ids, embeddings=vectors, documents=[chunk.page_content for chunk in chunks],
+            metadatas=[chunk.metadata for chunk in chunks]
+        )
+        add_summaries(self.summary_store, files, chunks, vectors)
+
+    def commit(self, manifest):
+        pass
+
+class ShardedWriter:
+    """
+    Routes every CV to the writer of its shard (see sharding.shard_of), so all chunks and
+    the summary vector of a candidate land in the same shard. Only shards that received
+    changes are committed.
+    """
+
+    def __init__(self, writers):
+        self.writers = writers
+        self.checkpoint_batches = all(writer.checkpoint_batches for writer in writers)
+        self.touched = set()
+
+    def _shard(self, source):
+        shard = shard_of(source, len(self.writers))
+        self.touched.add(shard)
+        return shard
+
+    def count(self):
+        return sum(writer.count() for writer in self.writers)
+
+    def reset(self):
+        for writer in self.writers:
+            writer.reset()
+        self.touched.update(range(len(self.writers)))
+
+    def delete(self, chunk_ids, files):
+        by_shard = {}
+        for path, entry in files.items():
+            ids, shard_files = by_shard.setdefault(self._shard(path), ([], {}))
+            ids.extend(entry["chunk_ids"])
+            shard_files[path] = entry
+        for shard, (ids, shard_files) in by_shard.items():
+            self.writers[shard].delete(ids, shard_files)
+
+    def add(self, ids, chunks, vectors, files):
+        by_shard = {}
+        for cid, chunk, vector in zip(ids, chunks, vectors):
+            shard_ids, shard_chunks, shard_vectors = by_shard.setdefault(self._shard(chunk.metadata["source"]),
+                                                                         ([], [], []))
+            shard_ids.append(cid)
+            shard_chunks.append(chunk)
+            shard_vectors.append(vector)
+        for shard, (shard_ids, shard_chunks, shard_vectors) in by_shard.items():
+            shard_files = {path: entry for path, entry in files.items() if shard_of(path, len(self.writers)) == shard}
+            self.writers[shard].add(shard_ids, shard_chunks, shard_vectors, shard_files)
+
+    def commit(self, manifest):
+        for shard in sorted(self.touched):
+            self.writers[shard].commit(manifest)
+        self.touched.clear()
+
+def open_writer(backend, embeddings, dtype=COMPACT_STORE_DTYPE, shards=INDEX_SHARDS):
+    """Returns the index writer for a vector backend, split into `shards` stores when shards > 1."""
+    if backend not in ("chroma", "compact"):
+        raise ValueError(f"Unknown vector backend: '{backend}'")
+    writers = []
+    for path in shard_paths(index_base_path(backend), shards):
+        if backend == "compact":
+            writers.append(CompactStoreWriter(path, dtype))
+        else:
+            writers.append(ChromaWriter(embeddings, path))
+    return writers[0] if shards <= 1 else ShardedWriter(writers)
+
+class RebuildRequiredError(RuntimeError):
+    """Raised instead of wiping an index that is in use when only a full rebuild could update it."""
+
+def create_vector_store(rebuild=False, workers=INGEST_WORKERS, backend=VECTOR_BACKEND, source=INGEST_SOURCE,
+                        shards=INDEX_SHARDS, embeddings=None, batch_size=INGEST_BATCH_SIZE, allow_reset=True):
     """
     Loads PDFs, splits them into chunks, creates embeddings,
     and stores them in a persistent ChromaDB vector store.
-    This is a one-time setup process.
-    """
-    print("--- Starting Vector Store Creation ---")
-    
-    # 1. Load Documents
-    print(f"Loading PDF documents from '{CV_DIRECTORY}'...")
-    loader = DirectoryLoader(CV_DIRECTORY, glob="**/*.pdf", loader_cls=PyPDFLoader)
-    documents = loader.load()
-    if not documents:
-        print("No PDF documents found. Please run the generation script first.")
-        return
-    print(f"Loaded {len(documents)} documents.")
-
-    # 2. Split Text into Chunks
-    print("Splitting documents into smaller chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_documents(documents)
-    print(f"Split into {len(chunks)} chunks.")
-
-    # 3. Create Embeddings
-    print(f"Loading embedding model: '{EMBEDDING_MODEL_NAME}'...")
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
-
-    # 4. Create and Persist Vector Store
-    print(f"Creating and persisting vector store at '{VECTOR_STORE_PATH}'...")
-    # The Chroma class is now imported from langchain_chroma
-    vector_store = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=VECTOR_STORE_PATH
-    )
-    print("--- Vector Store Creation Complete ---")
+
+    The run is incremental: a manifest of per-file content hashes and chunk IDs
+    is kept next to the vector store, so only new or changed CVs are embedded
+    and the chunks of removed or modified CVs are deleted.
+    Each CV also gets a summary vector (the mean of its chunk vectors) in a second
+    collection, used by the hierarchical retrieval mode.
+    PDF parsing runs on `workers` processes and chunks are streamed to the
+    embedder in batches as soon as their files are ready.
+    `backend` selects where the vectors go: Chroma, or the compact memory-mapped store.
+    With `source="auto"`, CVs generated by generate_cvs.py are read from their JSON
+    profiles and chunked by section; only external CVs go through PDF parsing.
+    With `shards` > 1 the CVs are partitioned by source into that many stores.
+    Pass `embeddings` to reuse an already loaded embedding layer, e.g. the app's.
+    Runs hold an exclusive lock on the vector store, so the app's folder watcher and a
+    manual ingestion never write at the same time.
+    Returns the CVs that could not be parsed; they are retried on the next run.
+    With `allow_reset=False` (the app's folder watcher), an index that has chunks but no
+    usable manifest is never cleared; RebuildRequiredError asks for an offline --rebuild.
+    """
+    with ingest_lock(VECTOR_STORE_PATH):
+        print("--- Starting Vector Store Creation ---")
+
+        # 1. Compare the CVs on disk against the manifest of the previous run
+        print(f"Scanning PDF documents in '{CV_DIRECTORY}'...")
+        pdf_paths = sorted(glob.glob(os.path.join(CV_DIRECTORY, "**", "*.pdf"), recursive=True))
+        # The PDF is authoritative: a CV is indexed while its PDF exists, and deleting the PDF
+        # removes the candidate even if their JSON profile stays in data/. A profile only
+        # replaces the parsing of a PDF that is present.
+        profiles = {}
+        if source == "auto":
+            present = set(pdf_paths)
+            profiles = {path: entry for path, entry in discover_profiles().items() if path in present}
+        manifest = None if rebuild else load_manifest(VECTOR_STORE_PATH)
+        if manifest is not None and manifest.get("backend", "chroma") != backend:
+            # The manifest describes the other backend's content, so this one is built from scratch.
+            print(f"Switching the vector backend from '{manifest.get('backend', 'chroma')}' to '{backend}'.")
+            manifest = None
+        if manifest is not None and manifest.get("shards", 1) != shards:
+            # Changing the shard count moves most CVs to another shard, so the index is rebuilt.
+            print(f"Changing the number of index shards from {manifest.get('shards', 1)} to {shards}.")
+            manifest = None
+        # The embedding layer only loads the model once it meets text missing from its cache.
+        if embeddings is None:
+            embeddings = get_embeddings()
+        if manifest is not None and manifest.get("normalize", False) != embeddings.normalize:
+            # Normalized and raw vectors cannot be mixed in one index. Indexes from before
+            # EMBEDDING_NORMALIZE have no flag and hold raw vectors.
+            print(f"Changing EMBEDDING_NORMALIZE from {manifest.get('normalize', False)} to {embeddings.normalize}.")
+            manifest = None
+        tracked_files = manifest["files"] if manifest else {}
+
+        if not pdf_paths and not tracked_files:
+            print("No PDF documents found. Please run the generation script first.")
+            return []
+
+        # A profile-backed CV is hashed by its JSON, so switching formats re-ingests it.
+        current_hashes = {path: (f"json{PROFILE_SECTIONS_VERSION}:" + file_sha256(profiles[path][0]) if path in profiles else file_sha256(path))
+                          for path in pdf_paths}
+        added = [p for p in pdf_paths if p not in tracked_files]
+        modified = [p for p in pdf_paths if p in tracked_files and tracked_files[p]["sha256"] != current_hashes[p]]
+        removed = [p for p in tracked_files if p not in current_hashes]
+        print(f"Found {len(pdf_paths)} documents ({len(profiles)} with structured profiles): "
+              f"{len(added)} new, {len(modified)} changed, {len(removed)} removed.")
+
+        if manifest is not None and not (added or modified or removed):
+            print("Vector store is already up to date.")
+            return []
+
+        # 2. Open the vector store
+        writer = open_writer(backend, embeddings, shards=shards)
+
+        if manifest is None and not allow_reset and writer.count():
+            # Clearing the store would empty the index the app is answering from.
+            raise RebuildRequiredError(
+                f"The {backend} index has no usable ingestion manifest and can only be rebuilt from scratch. "
+                "Run `python src/ingest_data.py --rebuild` while the app is stopped.")
+
+        if manifest is None:
+            # Chunks written without a manifest cannot be tracked, so start from a clean collection.
+            print("No ingestion manifest found. Rebuilding the vector store from scratch...")
+            writer.reset()
+            manifest = new_manifest()
+            manifest["backend"] = backend
+            manifest["shards"] = shards
+            manifest["normalize"] = embeddings.normalize
+            tracked_files = manifest["files"]
+
+        # 3. Delete the chunks of removed and modified CVs
+        stale_ids = [cid for p in removed + modified for cid in tracked_files[p]["chunk_ids"]]
+        if stale_ids:
+            print(f"Deleting {len(stale_ids)} stale chunks...")
+            writer.delete(stale_ids, {p: tracked_files[p] for p in removed + modified})
+        for path in removed + modified:
+            del tracked_files[path]
+        if stale_ids or removed:
+            mark_changed(manifest)
+        if writer.checkpoint_batches:
+            save_manifest(VECTOR_STORE_PATH, manifest)
+
+        # 4. Load, split and embed the new and modified CVs
+        to_ingest = added + modified
+        print(f"Loading and splitting {len(to_ingest)} documents with {workers} worker(s)...")
+        start = time.perf_counter()
+        pending_chunks, pending_ids, pending_files = [], [], {}
+        total_chunks, failures = 0, []
+
+        def flush():
+            if pending_chunks:
+                vectors = embeddings.embed_documents([chunk.page_content for chunk in pending_chunks])
+                writer.add(pending_ids, pending_chunks, vectors, pending_files)
+            if pending_files:
+                tracked_files.update(pending_files)
+                mark_changed(manifest)
+            # Persist progress after each batch so an interrupted run can resume where it stopped.
+            if writer.checkpoint_batches:
+                save_manifest(VECTOR_STORE_PATH, manifest)
+            pending_chunks.clear()
+            pending_ids.clear()
+            pending_files.clear()
+
+        for path, chunks, error in iter_split_documents(to_ingest, workers, profiles):
+            if error:
+                print(f"  -> Failed to parse '{path}': {error}")
+                failures.append(path)
+                continue
+            ids = [chunk_id(path, current_hashes[path], i) for i in range(len(chunks))]
+            pending_chunks.extend(chunks)
+            pending_ids.extend(ids)
+            pending_files[path] = {"sha256": current_hashes[path], "chunk_ids": ids}
+            total_chunks += len(chunks)
+            if len(pending_chunks) >= batch_size:
+                flush()
+        flush()
+        writer.commit(manifest)
+        save_manifest(VECTOR_STORE_PATH, manifest)
+
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        ingested = len(to_ingest) - len(failures)
+        print(f"Embedded {total_chunks} chunks from {ingested} documents in {elapsed:.2f}s "
+              f"({ingested / elapsed:.1f} files/sec, {total_chunks / elapsed:.1f} chunks/sec).")
+        if failures:
+            print(f"{len(failures)} documents could not be parsed and will be retried on the next run.")
+        print(embeddings.report())
+        print("--- Vector Store Creation Complete ---")
+        return failures
 
 # --- Main Execution Block ---
 if __name__ == "__main__":
-    create_vector_store()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ingest the generated CVs into the vector store.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Ignore the ingestion manifest and re-embed every CV.")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                        help="Number of processes used to parse and split PDFs.")
+    parser.add_argument("--backend", choices=("chroma", "compact"), default=VECTOR_BACKEND,
+                        help="Vector backend to write to.")
+    parser.add_argument("--source", choices=("auto", "pdf"), default=INGEST_SOURCE,
+                        help="'auto' reads structured JSON profiles when available, 'pdf' always parses PDFs.")
+    parser.add_argument("--shards", type=int, default=INDEX_SHARDS,
+                        help="Number of shards to partition the index into by candidate.")
+    args = parser.parse_args()
+    create_vector_store(rebuild=args.rebuild, workers=args.workers, backend=args.backend, source=args.source,
+                        shards=max(1, args.shards))
@@ -0,0 +1,245 @@
+# src/llm_client.py
+
+import os
+import time
+import threading
+import httpx
+from langchain_core.runnables import Runnable
+from dotenv import load_dotenv
+from metrics import LLM_CIRCUIT_EVENTS
+
+# Shared HTTP plumbing for the chat model. Every ChatOpenAI instance of the process (the RAG
+# chain, screening) goes through one keep-alive connection pool with explicit limits and
+# timeouts, and through one circuit breaker that fails fast while the provider is down
+# instead of holding users for the full retry schedule of calls that will not succeed.
+
+# --- Configuration ---
+load_dotenv()
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "google/gemini-2.0-flash-exp:free")
+# Connection pool: concurrent connections to the provider, and how many idle ones are kept open.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "16"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+# Timeouts in seconds: connecting, reading (the gap between streamed chunks) and waiting for a pooled connection.
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_POOL_TIMEOUT = float(os.getenv("LLM_POOL_TIMEOUT", "10"))
+# Retries of 429/5xx responses and connection errors, with the SDK's exponential backoff.
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Consecutive failed calls that open the circuit (0 disables it), and how long it stays open.
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+def error_status(error):
+    """Extracts the HTTP status code from an API error, if it carries one."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+def is_retryable(error):
+    """Rate limits (429), server errors (5xx), timeouts and connection failures are worth retrying."""
+    status = error_status(error)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    try:
+        from openai import APIConnectionError
+        if isinstance(error, APIConnectionError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError))
+
+def retry_after(error):
+    """Returns the server's Retry-After hint in seconds, if present."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+    Closed: calls go through, and `failure_threshold` consecutive provider failures open it.
+    Open: calls fail immediately with CircuitOpenError for `reset_timeout` seconds.
+    Half-open: a single trial call goes through; success closes the circuit, failure reopens it.
+    Only provider-side failures count (see is_retryable): a rejected request proves the
+    provider is up.
+    """
+
+    def __init__(self, name, failure_threshold=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not be made."""
+        if self.failure_threshold <= 0:
+            return
+        with self.lock:
+            if self.state == "open":
+                remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    LLM_CIRCUIT_EVENTS.inc(event="rejected")
+                    raise CircuitOpenError(f"{self.name} is unavailable, not retrying for another {remaining:.0f}s.")
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self.trial_running:
+                    LLM_CIRCUIT_EVENTS.inc(event="rejected")
+                    raise CircuitOpenError(f"{self.name} is unavailable, waiting for a trial request.")
+                self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            if self.state != "closed":
+                print(f"{self.name} recovered, closing the circuit.")
+            self.state = "closed"
+            self.failures = 0
+            self.trial_running = False
+
+    def release(self):
+        """
+        Ends a call that neither succeeded nor failed, e.g. one cancelled by its client:
+        a half-open trial is released so the next call can try, and nothing is counted.
+        """
+        with self.lock:
+            self.trial_running = False
+
+    def record_failure(self, error):
+        if not is_retryable(error):
+            self.record_success()
+            return
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold > 0):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                LLM_CIRCUIT_EVENTS.inc(event="opened")
+                print(f"{self.name} failed {self.failures} time(s) in a row ({type(error).__name__}), "
+                      f"opening the circuit for {self.reset_timeout:.0f}s.")
+
+class CircuitBreakerRunnable(Runnable):
+    """Runnable wrapper that passes every call through a CircuitBreaker, streamed calls included."""
+
+    def __init__(self, runnable, breaker):
+        self.runnable = runnable
+        self.breaker = breaker
+
+    # Calls that are cancelled (CancelledError) or streams abandoned by their consumer
+    # (GeneratorExit) never completed, so they release the breaker instead of counting.
+
+    def invoke(self, input, config=None, **kwargs):
+        self.breaker.before_call()
+        try:
+            result = self.runnable.invoke(input, config, **kwargs)
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.breaker.before_call()
+        try:
+            result = await self.runnable.ainvoke(input, config, **kwargs)
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def stream(self, input, config=None, **kwargs):
+        self.breaker.before_call()
+        try:
+            yield from self.runnable.stream(input, config, **kwargs)
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        # Only a stream consumed to the end counts as a success.
+        self.breaker.record_success()
+
+    async def astream(self, input, config=None, **kwargs):
+        self.breaker.before_call()
+        try:
+            async for chunk in self.runnable.astream(input, config, **kwargs):
+                yield chunk
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+
+# --- Shared clients ---
+# Created on first use and shared by every chat model of the process.
+_shared = {}
+_shared_lock = threading.Lock()
+
+def http_limits():
+    return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=LLM_KEEPALIVE_EXPIRY)
+
+def http_timeout():
+    return httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT, pool=LLM_POOL_TIMEOUT)
+
+def _get_shared(name, factory):
+    with _shared_lock:
+        if name not in _shared:
+            _shared[name] = factory()
+    return _shared[name]
+
+def get_http_client():
+    """Returns the process-wide keep-alive HTTP client for synchronous LLM calls."""
+    return _get_shared("http", lambda: httpx.Client(limits=http_limits(), timeout=http_timeout()))
+
+def get_async_http_client():
+    """
+    Returns the process-wide keep-alive HTTP client for asynchronous LLM calls.
+    Its connections belong to the event loop that opened them, which is fine for the app's
+    single loop; scripts should make all their async calls from one loop as well.
+    """
+    return _get_shared("async_http", lambda: httpx.AsyncClient(limits=http_limits(), timeout=http_timeout()))
+
+def get_llm_breaker():
+    """Returns the circuit breaker shared by all calls to the chat model provider."""
+    return _get_shared("breaker", lambda: CircuitBreaker("The LLM provider"))
+
+def create_chat_model(model=LLM_MODEL, base_url=LLM_BASE_URL, api_key=None, **kwargs):
+    """Returns a ChatOpenAI model that uses the shared connection pools, timeouts and retry settings."""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=model,
+        base_url=base_url,
+        api_key=api_key,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        timeout=http_timeout(),
+        max_retries=LLM_MAX_RETRIES,
+        **kwargs,
+    )
+
+def guard_llm(llm, breaker=None):
+    """Wraps a chat model (or any runnable) in the shared circuit breaker."""
+    return CircuitBreakerRunnable(llm, breaker or get_llm_breaker())
@@ -0,0 +1,168 @@
+# src/load_test.py
+
+import io
+import os
+import time
+import json
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import urllib.request
+
+# Concurrent load test of the RAG chain against the local stub LLM from stub_apis.py.
+# Many simulated users ask a small set of popular questions at the same time, first with
+# the previous setup (no request coalescing, a default client per model, no circuit breaker)
+# and then with coalescing and the shared connection pool. The stub counts the chat
+# completions it serves, so the table shows how many upstream calls each setup made and
+# the latency percentiles users saw. With --outage, the stub then fails every call and the
+# same load runs with the circuit breaker off and on, to show how many calls still reach the
+# provider and how fast users get their error.
+# The answer and retrieval caches are disabled, so only coalescing can save upstream calls.
+
+# Constants
+DEFAULT_CVS = 50
+DEFAULT_USERS = 32
+DEFAULT_REQUESTS = 8
+DEFAULT_QUESTIONS = 5
+DEFAULT_SEED = 42
+
+def stub_stats(server):
+    """Returns the stub's request counters."""
+    from stub_apis import stub_base_url
+    with urllib.request.urlopen(stub_base_url(server) + "/stats") as response:
+        return json.loads(response.read())
+
+async def run_users(chain, questions, users, requests_per_user, seed):
+    """Runs `users` concurrent users that each stream `requests_per_user` answers. Returns latencies and errors."""
+    latencies, errors = [], []
+
+    async def user(number):
+        rng = random.Random(seed * 1000 + number)
+        for _ in range(requests_per_user):
+            # Popular questions are asked far more often than the rest.
+            question = questions[min(int(rng.expovariate(1.0)), len(questions) - 1)]
+            start = time.perf_counter()
+            try:
+                async for _ in chain.astream(question):
+                    pass
+            except Exception as e:
+                errors.append(type(e).__name__)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(user(number) for number in range(users)))
+    return latencies, errors
+
+async def run_phase(name, chain, server, questions, args):
+    from benchmark import percentile
+    before = stub_stats(server)
+    start = time.perf_counter()
+    latencies, errors = await run_users(chain, questions, args.users, args.requests, args.seed)
+    elapsed = time.perf_counter() - start
+    after = stub_stats(server)
+    result = {
+        "phase": name,
+        "requests": len(latencies),
+        # Failed attempts count too: the SDK's retries reach the provider as well.
+        "upstream_calls": after["chat"] + after["failures"] - before["chat"] - before["failures"],
+        "errors": len(errors),
+        "requests_per_s": len(latencies) / elapsed,
+    }
+    for pct in (50, 95, 99):
+        result[f"p{pct}_ms"] = percentile(latencies, pct)
+    print(f"  -> {name}: {result['upstream_calls']} upstream calls for {result['requests']} requests, "
+          f"p95 {result['p95_ms']:.0f} ms, {result['errors']} errors")
+    return result
+
+async def run_load_test(args):
+    # Measure the chain itself: no answer or retrieval caching, no structured fast path.
+    os.environ["ANSWER_CACHE_SIZE"] = "0"
+    os.environ["RETRIEVAL_CACHE_SIZE"] = "0"
+    os.environ["STRUCTURED_FAST_PATH"] = "false"
+
+    from benchmark import generate_corpus, build_queries
+    from ingest_data import create_vector_store
+    from stub_apis import start_stub_server, stub_base_url
+    from langchain_openai import ChatOpenAI
+    from llm_client import create_chat_model, get_llm_breaker, LLM_BREAKER_FAILURES
+    import rag_pipeline
+
+    print(f"Generating and ingesting {args.cvs} CVs...")
+    profiles = generate_corpus(args.cvs, os.cpu_count() or 1, args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_vector_store()
+    questions = build_queries(profiles, args.questions, args.seed)
+
+    server = start_stub_server(port=0, latency=args.latency, token_latency=args.token_latency, seed=args.seed)
+    base_url = stub_base_url(server)
+    breaker = get_llm_breaker()
+
+    def build_chain(coalescing, llm):
+        rag_pipeline.REQUEST_COALESCING = coalescing
+        with contextlib.redirect_stdout(io.StringIO()):
+            return rag_pipeline.get_rag_chain(llm=llm, warm_up=True)
+
+    baseline = build_chain(False, ChatOpenAI(model="stub", base_url=base_url, api_key="stub"))
+    optimized = build_chain(True, create_chat_model(model="stub", base_url=base_url, api_key="stub"))
+
+    print(f"Running {args.users} users x {args.requests} requests over {len(questions)} questions "
+          f"(stub latency {args.latency:.2f}s + {args.token_latency:.3f}s per token)...")
+    results = []
+    breaker.failure_threshold = 0
+    results.append(await run_phase("baseline", baseline, server, questions, args))
+    breaker.failure_threshold = LLM_BREAKER_FAILURES
+    results.append(await run_phase("coalescing + pool", optimized, server, questions, args))
+
+    if args.outage:
+        # Every upstream call fails from now on; each phase starts with a closed circuit.
+        server.state.fail_rate = 1.0
+        for name, threshold in (("outage, no breaker", 0), ("outage, breaker", LLM_BREAKER_FAILURES or 5)):
+            breaker.failure_threshold = threshold
+            breaker.record_success()
+            results.append(await run_phase(name, optimized, server, questions, args))
+
+    server.shutdown()
+    return results
+
+def print_table(results):
+    """Prints the load test results as a Markdown table."""
+    columns = [("phase", "phase", "{}"), ("requests", "requests", "{:d}"), ("upstream_calls", "upstream calls", "{:d}"),
+               ("errors", "errors", "{:d}"), ("requests_per_s", "req/s", "{:.1f}"), ("p50_ms", "p50 ms", "{:.0f}"),
+               ("p95_ms", "p95 ms", "{:.0f}"), ("p99_ms", "p99 ms", "{:.0f}")]
+    print("| " + " | ".join(label for _, label, _ in columns) + " |")
+    print("|" + "|".join("---" for _ in columns) + "|")
+    for result in results:
+        print("| " + " | ".join(fmt.format(result[key]) for key, _, fmt in columns) + " |")
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test of request coalescing and the LLM client.")
+    parser.add_argument("--cvs", type=int, default=DEFAULT_CVS, help="Size of the generated corpus.")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS, help="Concurrent users.")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Questions asked by each user.")
+    parser.add_argument("--questions", type=int, default=DEFAULT_QUESTIONS, help="Distinct questions in the workload.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub LLM seconds before the first token.")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Stub LLM seconds between streamed tokens.")
+    parser.add_argument("--outage", action="store_true", help="Also measure a provider outage with and without the circuit breaker.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", help="Optional path to write the results as JSON.")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated working directory.")
+    args = parser.parse_args()
+
+    # The corpus and index are generated in a scratch directory, never in the app's data folders.
+    workdir = tempfile.mkdtemp(prefix="cv_load_test_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = asyncio.run(run_load_test(args))
+    finally:
+        os.chdir(cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,292 @@
+# src/metrics.py
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from langchain_core.runnables import Runnable
+from langchain_core.callbacks import BaseCallbackHandler
+
+# --- Configuration ---
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+RAG_DEBUG_TIMINGS = os.getenv("RAG_DEBUG_TIMINGS", "false").lower() == "true"
+
+# Histogram bucket boundaries
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram with one series per label combination."""
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return "\n".join(lines)
+
+class Counter:
+    """Thread-safe Prometheus-style counter with one series per label combination."""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple((name, labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return "\n".join(lines)
+
+# --- RAG chain metrics ---
+STAGE_SECONDS = Histogram("rag_stage_seconds", "Time spent in each stage of the RAG chain.",
+                          SECONDS_BUCKETS, labelnames=("stage",))
+REQUEST_SECONDS = Histogram("rag_request_seconds", "End-to-end RAG request latency.",
+                            SECONDS_BUCKETS, labelnames=("path",))
+TIME_TO_FIRST_TOKEN_SECONDS = Histogram("rag_llm_time_to_first_token_seconds",
+                                        "Time from LLM request to the first streamed token.", SECONDS_BUCKETS)
+PROMPT_CHARS = Histogram("rag_prompt_chars", "Size of the rendered prompt in characters.", SIZE_BUCKETS)
+PROMPT_TOKENS = Histogram("rag_prompt_tokens", "Prompt tokens reported by the LLM.", SIZE_BUCKETS)
+COMPLETION_TOKENS = Histogram("rag_completion_tokens", "Completion tokens reported by the LLM.", SIZE_BUCKETS)
+REQUESTS = Counter("rag_requests_total", "RAG requests by how they were answered.", labelnames=("path",))
+LLM_CIRCUIT_EVENTS = Counter("rag_llm_circuit_events_total",
+                             "LLM circuit breaker events ('opened', 'rejected').", labelnames=("event",))
+INDEX_UPDATES = Counter("rag_index_updates_total", "Live index updates applied by the folder watcher.",
+                        labelnames=("status",))
+REGISTRY = [STAGE_SECONDS, REQUEST_SECONDS, TIME_TO_FIRST_TOKEN_SECONDS, PROMPT_CHARS,
+            PROMPT_TOKENS, COMPLETION_TOKENS, REQUESTS, LLM_CIRCUIT_EVENTS, INDEX_UPDATES]
+
+def render_metrics():
+    """Renders all registered metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+# --- Per-request traces ---
+# The trace of the request being handled; the dict is shared with the threads and tasks
+# the chain fans out to, so stages running there are recorded on the same request.
+_current_trace = contextvars.ContextVar("rag_trace", default=None)
+
+def set_path(path):
+    """Records how the current request was answered (e.g. 'rag', 'fast_path' or 'coalesced')."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["path"] = path
+
+def record_stage(stage, seconds):
+    """Records the duration of a stage in its histogram and on the current request's trace."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["stages"][stage] = trace["stages"].get(stage, 0.0) + seconds
+
+def record_value(name, value):
+    """Attaches an extra value (e.g. prompt size) to the current request's trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["values"][name] = value
+
+@contextmanager
+def span(stage):
+    """Times a block of code as one stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+def timed(stage, fn):
+    """Wraps a function so every call is recorded as `stage`."""
+    def wrapper(*args, **kwargs):
+        with span(stage):
+            return fn(*args, **kwargs)
+    wrapper.__name__ = getattr(fn, "__name__", stage)
+    return wrapper
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    Records LLM latency, time to first token and token counts.
+    Implemented as a callback so streamed generations are measured too.
+    """
+
+    # Run in the caller's context so the current request's trace is visible.
+    run_inline = True
+
+    def __init__(self):
+        self._starts = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = {"start": time.perf_counter(), "first_token": None}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = {"start": time.perf_counter(), "first_token": None}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        state = self._starts.get(run_id)
+        if state and state["first_token"] is None:
+            state["first_token"] = time.perf_counter() - state["start"]
+            TIME_TO_FIRST_TOKEN_SECONDS.observe(state["first_token"])
+            record_value("ttft_ms", round(state["first_token"] * 1000, 1))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        state = self._starts.pop(run_id, None)
+        if state:
+            record_stage("llm", time.perf_counter() - state["start"])
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if prompt_tokens is not None:
+            PROMPT_TOKENS.observe(prompt_tokens)
+            record_value("prompt_tokens", prompt_tokens)
+        if completion_tokens is not None:
+            COMPLETION_TOKENS.observe(completion_tokens)
+            record_value("completion_tokens", completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        state = self._starts.pop(run_id, None)
+        if state:
+            record_stage("llm_error", time.perf_counter() - state["start"])
+
+def _token_usage(response):
+    """Extracts (prompt, completion) token counts from an LLMResult, if the provider reported them."""
+    for generations in response.generations or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens"), usage.get("output_tokens")
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+class InstrumentedChain(Runnable):
+    """
+    Runnable wrapper that opens a trace per request, records its end-to-end latency
+    and, with RAG_DEBUG_TIMINGS enabled, logs a per-stage breakdown of where the time went.
+    """
+
+    def __init__(self, chain, debug=RAG_DEBUG_TIMINGS):
+        self.chain = chain
+        self.debug = debug
+
+    def _start(self):
+        trace = {"start": time.perf_counter(), "path": "answer_cache", "stages": {}, "values": {}}
+        return trace, _current_trace.set(trace)
+
+    def _finish(self, trace, token, question):
+        elapsed = time.perf_counter() - trace["start"]
+        REQUEST_SECONDS.observe(elapsed, path=trace["path"])
+        REQUESTS.inc(path=trace["path"])
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            pass  # Finished in a different context than it started, e.g. a cancelled stream.
+        if self.debug:
+            parts = [f"path={trace['path']}", f"total={elapsed * 1000:.1f}ms"]
+            parts += [f"{name}={seconds * 1000:.1f}ms" for name, seconds in trace["stages"].items()]
+            parts += [f"{name}={value}" for name, value in trace["values"].items()]
+            print(f"[rag timing] {' '.join(parts)} question={str(question)[:80]!r}")
+
+    def invoke(self, input, config=None, **kwargs):
+        trace, token = self._start()
+        try:
+            return self.chain.invoke(input, config, **kwargs)
+        finally:
+            self._finish(trace, token, input)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        trace, token = self._start()
+        try:
+            return await self.chain.ainvoke(input, config, **kwargs)
+        finally:
+            self._finish(trace, token, input)
+
+    def stream(self, input, config=None, **kwargs):
+        trace, token = self._start()
+        try:
+            yield from self.chain.stream(input, config, **kwargs)
+        finally:
+            self._finish(trace, token, input)
+
+    async def astream(self, input, config=None, **kwargs):
+        trace, token = self._start()
+        try:
+            async for chunk in self.chain.astream(input, config, **kwargs):
+                yield chunk
+        finally:
+            self._finish(trace, token, input)
+
+# --- Metrics endpoint ---
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_text(self, status, text, content_type="text/plain; charset=utf-8"):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            self._send_text(200, render_metrics(), "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/health":
+            self._send_text(200, "ok\n")
+        elif path == "/ready":
+            ready = self.server.readiness()
+            self._send_text(200 if ready else 503, "ready\n" if ready else "warming up\n")
+        else:
+            self._send_text(404, "not found\n")
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0", readiness=lambda: True):
+    """
+    Serves /metrics, /health and /ready on a background thread.
+    `readiness` is called on every /ready request. Returns the server, or None if the port is taken.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on port {port}: {e}")
+        return None
+    server.readiness = readiness
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,82 @@
+# src/mmr.py
+
+import numpy as np
+from langchain_core.documents import Document
+from metrics import span
+
+def normalize_rows(vectors):
+    """Scales each row to unit length; rows that already are (the default embeddings) are unchanged."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def mmr_select(query_embedding, embeddings, k, lambda_mult=0.5, score_threshold=None):
+    """
+    Maximal Marginal Relevance over a block of candidate vectors.
+    Returns the selected row indices in selection order.
+
+    All similarities are dot products of unit vectors computed as matrix operations:
+    one matrix-vector product for the query scores, then one per selected row to update
+    each candidate's highest similarity to the selection. That is O(k * fetch_k) work
+    with no Python loop over the candidates.
+    Candidates whose cosine similarity to the query is below `score_threshold` are dropped.
+    """
+    vectors = normalize_rows(embeddings)
+    if vectors.ndim != 2 or len(vectors) == 0 or k <= 0:
+        return []
+    query = normalize_rows(query_embedding).reshape(-1)
+    query_scores = vectors @ query
+
+    eligible = np.ones(len(vectors), dtype=bool)
+    if score_threshold is not None:
+        eligible &= query_scores >= score_threshold
+    k = min(k, int(eligible.sum()))
+
+    relevance = lambda_mult * query_scores
+    redundancy = None
+    selected = []
+    for _ in range(k):
+        # The first pick is the best match; after that, relevance is traded off against redundancy.
+        scores = relevance.copy() if redundancy is None else relevance - (1 - lambda_mult) * redundancy
+        scores[~eligible] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        eligible[best] = False
+        similarity = vectors @ vectors[best]
+        redundancy = similarity if redundancy is None else np.maximum(redundancy, similarity)
+    return selected
+
+class NumpyMMRRetriever:
+    """
+    Fetches the `fetch_k` nearest chunks together with their embeddings in a single
+    collection query and runs MMR on them with `mmr_select`, so `fetch_k` in the
+    hundreds costs a few milliseconds of selection time.
+    """
+
+    def __init__(self, vector_store, lambda_mult=0.5, score_threshold=None):
+        self.vector_store = vector_store
+        self.lambda_mult = lambda_mult
+        self.score_threshold = score_threshold
+
+    def fetch(self, query_embedding, fetch_k, filter=None):
+        """Returns the nearest chunks as Documents and their embeddings as one float32 matrix."""
+        results = self.vector_store._collection.query(
+            query_embeddings=[query_embedding],
+            n_results=fetch_k,
+            where=filter,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        documents = [
+            Document(page_content=text, metadata=metadata or {}, id=doc_id)
+            for doc_id, text, metadata in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+        ]
+        embeddings = results["embeddings"][0] if results.get("embeddings") is not None else []
+        return documents, np.asarray(embeddings, dtype=np.float32)
+
+    def search(self, query_embedding, k, fetch_k, filter=None):
+        """MMR search by vector; results are returned in MMR selection order."""
+        documents, embeddings = self.fetch(query_embedding, fetch_k, filter)
+        with span("mmr"):
+            selected = mmr_select(query_embedding, embeddings, k, self.lambda_mult, self.score_threshold)
+        return [documents[i] for i in selected]
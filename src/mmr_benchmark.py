@@ -0,0 +1,57 @@
+# src/mmr_benchmark.py
+
+import time
+import argparse
+import numpy as np
+from langchain_chroma.vectorstores import maximal_marginal_relevance
+from benchmark import percentile
+from mmr import mmr_select
+
+# Micro-benchmark of the MMR selection step: the vectorized mmr_select against the
+# loop-based implementation behind Chroma's max_marginal_relevance_search.
+# Both paths fetch the same `fetch_k` vectors from the collection, so only the
+# selection is timed, on random unit vectors of the embedding model's dimension.
+
+# Constants
+DEFAULT_FETCH_KS = "20,100,200,500,1000"
+DEFAULT_K = 5
+DEFAULT_DIM = 384
+DEFAULT_REPEATS = 50
+
+def random_unit_vectors(rng, count, dim):
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def time_ms(fn, repeats):
+    """Runs `fn` `repeats` times and returns the per-call latencies in milliseconds."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def run(fetch_ks, k, dim, repeats, seed=42):
+    rng = np.random.default_rng(seed)
+    print("| fetch_k | k | langchain p50 ms | numpy p50 ms | speedup | same selection |")
+    print("|---|---|---|---|---|---|")
+    for fetch_k in fetch_ks:
+        query = random_unit_vectors(rng, 1, dim)[0]
+        vectors = random_unit_vectors(rng, fetch_k, dim)
+        # Chroma hands the embeddings to MMR as a list of arrays.
+        embedding_list = list(vectors)
+        baseline = time_ms(lambda: maximal_marginal_relevance(query, embedding_list, k=k), repeats)
+        vectorized = time_ms(lambda: mmr_select(query, vectors, k), repeats)
+        same = sorted(maximal_marginal_relevance(query, embedding_list, k=k)) == sorted(mmr_select(query, vectors, k))
+        base_p50, fast_p50 = percentile(baseline, 50), percentile(vectorized, 50)
+        print(f"| {fetch_k} | {k} | {base_p50:.2f} | {fast_p50:.3f} | {base_p50 / max(fast_p50, 1e-9):.0f}x | {same} |")
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare vectorized and loop-based MMR selection.")
+    parser.add_argument("--fetch-k", default=DEFAULT_FETCH_KS, help="Comma-separated fetch_k values.")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Documents selected per query.")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="Embedding dimension.")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    args = parser.parse_args()
+    run([int(v) for v in args.fetch_k.split(",") if v.strip()], args.k, args.dim, args.repeats)
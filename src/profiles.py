@@ -0,0 +1,85 @@
+# src/profiles.py
+
+import os
+import re
+import json
+
+# Constants
+PROFILE_DIRECTORY = "data"
+CV_DIRECTORY = "cvs_generated"
+PROFILE_FILE_PATTERN = re.compile(r"^candidate_(\d+)\.json$")
+# Part of the hash ingestion keeps for a profile-backed CV; bumping it when profile_sections()
+# changes makes the next ingestion re-chunk those CVs.
+PROFILE_SECTIONS_VERSION = 2
+
+def pdf_file_name(profile_data, index):
+    """Returns the file name of the PDF CV rendered from a profile."""
+    full_name = profile_data.get('full_name', f"Candidate {index:02d}")
+    safe_name = (full_name or f"candidate_{index:02d}").replace(' ', '_')
+    return f"{safe_name}_CV.pdf"
+
+def profile_files(profile_directory=PROFILE_DIRECTORY):
+    """Returns (index, path) for every candidate_XX.json file, sorted by candidate index."""
+    if not os.path.isdir(profile_directory):
+        return []
+    files = []
+    for file_name in os.listdir(profile_directory):
+        match = PROFILE_FILE_PATTERN.match(file_name)
+        if match:
+            files.append((int(match.group(1)), os.path.join(profile_directory, file_name)))
+    return sorted(files)
+
+def load_profiles(profile_directory=PROFILE_DIRECTORY):
+    """
+    Loads the structured candidate profiles written by generate_cvs.py.
+    Returns a list of (index, profile_data) tuples sorted by candidate index.
+    """
+    profiles = []
+    for index, path in profile_files(profile_directory):
+        try:
+            with open(path, 'r') as f:
+                profiles.append((index, json.load(f)))
+        except Exception as e:
+            print(f"Warning: Could not load profile '{os.path.basename(path)}': {e}")
+    return profiles
+
+def _join(values):
+    return ", ".join(str(v) for v in values or [] if v)
+
+def profile_sections(profile_data, index):
+    """
+    Splits a profile into its semantic sections: the summary, each job, the education
+    and the skills. Returns (section, text) pairs; every text starts with the candidate's
+    name so a section retrieved on its own is still attributed to the right person.
+    """
+    name = profile_data.get('full_name') or f"Candidate {index:02d}"
+    job_title = profile_data.get('job_title', '')
+    header = f"{name} - {job_title}" if job_title else name
+    sections = []
+
+    contact = profile_data.get('contact', {}) or {}
+    summary_lines = [header]
+    if profile_data.get('summary'):
+        summary_lines.append(f"Summary: {profile_data['summary']}")
+    contact_details = _join([contact.get('email'), contact.get('phone'), contact.get('linkedin')])
+    if contact_details:
+        summary_lines.append(f"Contact: {contact_details}")
+    sections.append(("summary", "\n".join(summary_lines)))
+
+    for job in profile_data.get('work_experience', []) or []:
+        lines = [f"{name} - Work experience: {job.get('title', '')} at {job.get('company', '')} ({job.get('dates', '')})"]
+        lines += [f"- {item}" for item in job.get('description', []) or []]
+        sections.append(("experience", "\n".join(lines)))
+
+    education = profile_data.get('education', []) or []
+    if education:
+        lines = [f"{name} - Education:"]
+        lines += [f"- {entry.get('degree', '')}, {entry.get('university', '')} ({entry.get('year', '')})" for entry in education]
+        sections.append(("education", "\n".join(lines)))
+
+    # Every skill category, labelled from its key like in the PDF (see CVTemplate).
+    skills = profile_data.get('skills', {}) or {}
+    skill_lines = [f"{key.replace('_', ' ').title()}: {_join(values)}" for key, values in skills.items() if values]
+    if skill_lines:
+        sections.append(("skills", "\n".join([f"{name} - Skills:"] + skill_lines)))
+    return sections
@@ -0,0 +1,144 @@
+# src/query_cache.py
+
+import re
+import time
+import threading
+from collections import OrderedDict
+from langchain_core.runnables import Runnable
+
+# Sentinel returned on cache misses, so that falsy values can still be cached.
+MISSING = object()
+
+def normalize_question(question):
+    """Normalizes a question so trivially different phrasings share a cache entry."""
+    text = question if isinstance(question, str) else str(question)
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip("?!. ")
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with an optional time-to-live.
+    Entries older than `ttl` seconds are treated as misses and dropped on access.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is not MISSING:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class VersionedCache:
+    """
+    Wraps a cache whose entries are only valid for one version of the vector store.
+    The cache is cleared as soon as `version_fn` reports a different index version.
+    """
+
+    def __init__(self, cache, version_fn):
+        self.cache = cache
+        self.version_fn = version_fn
+        self._version = MISSING
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        version = self.version_fn()
+        with self._lock:
+            if version != self._version:
+                self.cache.clear()
+                self._version = version
+
+    def get(self, key):
+        self._check_version()
+        return self.cache.get(key)
+
+    def put(self, key, value):
+        self._check_version()
+        self.cache.put(key, value)
+
+    def clear(self):
+        self.cache.clear()
+
+class AnswerCachedChain(Runnable):
+    """
+    Runnable wrapper that serves repeated questions from an answer cache.
+    Cache hits skip retrieval and the LLM call entirely; misses run the wrapped
+    chain and store its final output, including when the answer is streamed.
+    """
+
+    def __init__(self, chain, cache):
+        self.chain = chain
+        self.cache = cache
+
+    def invoke(self, input, config=None, **kwargs):
+        key = normalize_question(input)
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            return cached
+        result = self.chain.invoke(input, config, **kwargs)
+        self.cache.put(key, result)
+        return result
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        key = normalize_question(input)
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            return cached
+        result = await self.chain.ainvoke(input, config, **kwargs)
+        self.cache.put(key, result)
+        return result
+
+    def stream(self, input, config=None, **kwargs):
+        key = normalize_question(input)
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            yield cached
+            return
+        final = None
+        for chunk in self.chain.stream(input, config, **kwargs):
+            final = chunk if final is None else final + chunk
+            yield chunk
+        if final is not None:
+            self.cache.put(key, final)
+
+    async def astream(self, input, config=None, **kwargs):
+        key = normalize_question(input)
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            yield cached
+            return
+        final = None
+        async for chunk in self.chain.astream(input, config, **kwargs):
+            final = chunk if final is None else final + chunk
+            yield chunk
+        if final is not None:
+            self.cache.put(key, final)
@@ -1,46 +1,208 @@
 # src/rag_pipeline.py
 
 import os
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough, RunnableMap
+from langchain_core.runnables import RunnablePassthrough, RunnableMap, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
+from embeddings import get_embeddings
+from index_manifest import read_index_version
+from candidate_index import CandidateIndex
+from candidate_retrieval import HierarchicalRetriever, open_summary_store
+from mmr import NumpyMMRRetriever
+from compact_store import CompactStore, COMPACT_STORE_PATH
+from sharding import ShardedRetriever, open_shards, is_sharded, index_base_path
+from embedding_service import RemoteRetriever, EMBEDDING_SERVICE_ADDRESS
+from context_builder import assemble_context
+from query_cache import LRUCache, VersionedCache, AnswerCachedChain, normalize_question, MISSING
+from single_flight import SingleFlightChain
+from llm_client import create_chat_model, guard_llm
+from metrics import InstrumentedChain, LLMMetricsCallback, span, timed, set_path, record_value, PROMPT_CHARS
 
 # --- Configuration ---
 load_dotenv()
 
 # Constants
 VECTOR_STORE_PATH = "vector_store"
-EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+CV_DIRECTORY = "cvs_generated"
 
-def get_rag_chain():
+# "chroma" or "compact" (memory-mapped float16/int8 matrix written by ingest_data.py --backend compact)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+
+# Retrieval settings
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "1"))
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+# "chunk" runs MMR over every chunk; "hierarchical" first picks the top candidates by their
+# summary vectors and then searches only those candidates' chunks.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "chunk").lower()
+RETRIEVAL_TOP_CANDIDATES = int(os.getenv("RETRIEVAL_TOP_CANDIDATES", "5"))
+RETRIEVAL_CHUNKS_PER_CANDIDATE = int(os.getenv("RETRIEVAL_CHUNKS_PER_CANDIDATE", "1"))
+# "numpy" runs MMR as batched matrix operations; "langchain" uses Chroma's built-in MMR.
+RETRIEVAL_MMR_BACKEND = os.getenv("RETRIEVAL_MMR_BACKEND", "numpy").lower()
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.5"))
+# Minimum cosine similarity to the query for a chunk to be considered; empty disables the filter.
+RETRIEVAL_SCORE_THRESHOLD = os.getenv("RETRIEVAL_SCORE_THRESHOLD", "").strip()
+RETRIEVAL_SCORE_THRESHOLD = float(RETRIEVAL_SCORE_THRESHOLD) if RETRIEVAL_SCORE_THRESHOLD else None
+
+# Structured candidate index built from data/candidate_XX.json
+STRUCTURED_FAST_PATH = os.getenv("STRUCTURED_FAST_PATH", "true").lower() == "true"
+
+# Query-side caches
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "256"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Merge concurrent identical questions into one retrieval and LLM call.
+REQUEST_COALESCING = os.getenv("REQUEST_COALESCING", "true").lower() == "true"
+
+def get_llm():
+    """Returns the OpenRouter chat model used to generate answers, on the shared connection pool."""
+    return create_chat_model(api_key=os.getenv("OPENROUTER_API_KEY"), stream_usage=True)
+
+def get_retriever(embeddings=None, candidate_index=None, warm_up=False):
     """
-    Creates and returns a RAG chain for querying the vector store.
-    This chain will be used by the frontend UI.
+    Returns `retrieve(question)`, which embeds a question and returns the chunks to answer
+    it from, using the configured backend, sharding and retrieval mode; `retrieve.count()`
+    returns the number of indexed chunks. The RAG chain calls it in-process, or the
+    retrieval service (embedding_service.py) calls it on behalf of all app workers.
     """
     # 1. Load the persisted vector store
-    vector_store = Chroma(
-        persist_directory=VECTOR_STORE_PATH,
-        embedding_function=HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
-    )
+    if embeddings is None:
+        embeddings = get_embeddings()
+    sharded = None
+    if is_sharded():
+        # Each shard holds the chunks of a subset of the candidates; every query fans out to all of them.
+        sharded = ShardedRetriever(open_shards(VECTOR_BACKEND, index_base_path(VECTOR_BACKEND), embeddings),
+                                   RETRIEVAL_MMR_LAMBDA, RETRIEVAL_SCORE_THRESHOLD)
+        vector_store = None
+        chunk_count = sharded.count
+    elif VECTOR_BACKEND == "compact":
+        # Memory-mapped, so opening it costs a few file opens and no copy of the vectors.
+        vector_store = CompactStore(COMPACT_STORE_PATH)
+        chunk_count = vector_store.count
+    else:
+        vector_store = Chroma(
+            persist_directory=VECTOR_STORE_PATH,
+            embedding_function=embeddings
+        )
+        chunk_count = vector_store._collection.count
+    if warm_up:
+        embeddings.embed_query("warm up")
+        shards = f", {len(sharded.shards)} shards" if sharded is not None else ""
+        print(f"Vector store ({VECTOR_BACKEND}{shards}) holds {chunk_count()} chunks.")
+
+    mmr_retriever = NumpyMMRRetriever(vector_store, RETRIEVAL_MMR_LAMBDA, RETRIEVAL_SCORE_THRESHOLD)
+
+    hierarchical = None
+    if RETRIEVAL_MODE == "hierarchical" and (VECTOR_BACKEND == "compact" or sharded is not None):
+        print("Hierarchical retrieval needs an unsharded Chroma backend, falling back to chunk retrieval.")
+    elif RETRIEVAL_MODE == "hierarchical":
+        hierarchical = HierarchicalRetriever(
+            vector_store, open_summary_store(embeddings, VECTOR_STORE_PATH),
+            top_candidates=RETRIEVAL_TOP_CANDIDATES, chunks_per_candidate=RETRIEVAL_CHUNKS_PER_CANDIDATE,
+            fetch_k=RETRIEVAL_FETCH_K,
+        )
+        if not hierarchical.is_available():
+            print("No candidate summary vectors found, falling back to chunk retrieval. "
+                  "Re-run the ingestion with --rebuild to create them.")
+            hierarchical = None
+
+    # Retrieval results are only valid for the index version they were computed on,
+    # so the cache is cleared automatically when ingestion changes the vector store.
+    retrieval_cache = VersionedCache(LRUCache(RETRIEVAL_CACHE_SIZE), lambda: read_index_version(VECTOR_STORE_PATH))
+
+    # The structured profiles double as a metadata pre-filter: when a question names
+    # candidates or distinctive skills, employers or universities, only the matching CVs
+    # are searched, together with the CVs without a structured profile, which are never
+    # excluded. Terms that are plain single words only move their candidates' chunks first.
+    if candidate_index is None:
+        candidate_index = CandidateIndex.from_directory()
+
+    def search_filter(question):
+        matching = candidate_index.candidate_filter(question)
+        if matching is None:
+            return None
+        sources = sorted(matching | candidate_index.external)
+        return {"source": {"$in": [os.path.join(CV_DIRECTORY, cid) for cid in sources]}}
+
+    def rank_hinted(question, docs):
+        hinted = candidate_index.candidate_hint(question)
+        if not hinted:
+            return docs
+        preferred = {os.path.join(CV_DIRECTORY, cid) for cid in hinted}
+        # A stable sort keeps the retrieval order within both groups.
+        return sorted(docs, key=lambda doc: doc.metadata.get("source") not in preferred)
 
     # Use Maximal Marginal Relevance (MMR) to find relevant and diverse documents.
     # fetch_k: The total number of documents to initially fetch.
     # k: The final number of documents to return.
-    retriever = vector_store.as_retriever(
-        search_type="mmr",
-        search_kwargs={"k": 1, "fetch_k": 20}
-    )
+    # The query is embedded separately so embedding and search time are measured apart.
+    def retrieve(question):
+        key = normalize_question(question)
+        docs = retrieval_cache.get(key)
+        if docs is MISSING:
+            with span("embed_query"):
+                query_embedding = embeddings.embed_query(question)
+            with span("vector_search"):
+                if sharded is not None:
+                    docs = sharded.search(
+                        query_embedding, k=RETRIEVAL_K, fetch_k=RETRIEVAL_FETCH_K, filter=search_filter(question)
+                    )
+                elif hierarchical is not None:
+                    docs = hierarchical.search(query_embedding, filter=search_filter(question))
+                elif VECTOR_BACKEND == "compact":
+                    docs = vector_store.max_marginal_relevance_search_by_vector(
+                        query_embedding, k=RETRIEVAL_K, fetch_k=RETRIEVAL_FETCH_K, lambda_mult=RETRIEVAL_MMR_LAMBDA,
+                        filter=search_filter(question), score_threshold=RETRIEVAL_SCORE_THRESHOLD
+                    )
+                elif RETRIEVAL_MMR_BACKEND == "numpy":
+                    docs = mmr_retriever.search(
+                        query_embedding, k=RETRIEVAL_K, fetch_k=RETRIEVAL_FETCH_K, filter=search_filter(question)
+                    )
+                else:
+                    docs = vector_store.max_marginal_relevance_search_by_vector(
+                        query_embedding, k=RETRIEVAL_K, fetch_k=RETRIEVAL_FETCH_K,
+                        lambda_mult=RETRIEVAL_MMR_LAMBDA, filter=search_filter(question)
+                    )
+            docs = rank_hinted(question, docs)
+            retrieval_cache.put(key, docs)
+        return docs
+
+    retrieve.count = chunk_count
+    return retrieve
+
+def get_rag_chain(llm=None, warm_up=False, embeddings=None):
+    """
+    Creates and returns a RAG chain for querying the vector store.
+    This chain will be used by the frontend UI.
+    Pass `llm` to use a different chat model, e.g. a local stub in benchmarks, and
+    `warm_up=True` to load the embedding model and open the store before returning.
+    Pass `embeddings` to share an already loaded embedding layer instead of loading another model.
+    With EMBEDDING_SERVICE_ADDRESS set, retrieval is delegated to the shared retrieval
+    service and this process loads neither the embedding model nor the index.
+    """
+    candidate_index = CandidateIndex.from_directory()
+    print(f"Loaded structured profiles for {len(candidate_index)} candidates.")
+
+    # 1. Open the retriever
+    if EMBEDDING_SERVICE_ADDRESS:
+        retrieve = RemoteRetriever(EMBEDDING_SERVICE_ADDRESS)
+        if warm_up:
+            print(f"Using the retrieval service at {EMBEDDING_SERVICE_ADDRESS} ({retrieve.count()} chunks).")
+    else:
+        retrieve = get_retriever(embeddings, candidate_index, warm_up)
+
+    # Answers are only valid for the index version they were computed on, like retrieval results.
+    answer_cache = VersionedCache(LRUCache(ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL),
+                                  lambda: read_index_version(VECTOR_STORE_PATH))
 
     # 2. Initialize the LLM
-    llm = ChatOpenAI(
-        model="google/gemini-2.0-flash-exp:free",
-        base_url="https://openrouter.ai/api/v1",
-        api_key=os.getenv("OPENROUTER_API_KEY"),
-    )
+    if llm is None:
+        llm = get_llm()
+    # LLM latency and token counts are recorded through callbacks so streamed answers are measured too.
+    llm = llm.with_config(callbacks=[LLMMetricsCallback()])
+    # While the provider keeps failing, answers fail fast instead of waiting out every retry.
+    llm = guard_llm(llm)
 
     # 3. Define the Prompt Template
     template = """
@@ -59,23 +221,52 @@ def get_rag_chain():
     """
     prompt = ChatPromptTemplate.from_template(template)
 
-    # 4. Helper function to format retrieved documents
+    def render_prompt(inputs):
+        with span("prompt"):
+            prompt_value = prompt.invoke(inputs)
+        prompt_chars = len(prompt_value.to_string())
+        PROMPT_CHARS.observe(prompt_chars)
+        record_value("prompt_chars", prompt_chars)
+        return prompt_value
+
+    # 4. Helper functions to assemble and format the retrieved documents
+    # Overlapping chunks of a CV are merged, near-duplicate passages dropped and the rest
+    # packed into the CONTEXT_MAX_TOKENS budget, so only the passages that are sent are cited.
+    def assemble(docs):
+        passages, stats = assemble_context(docs)
+        for name in ("context_tokens", "merged", "duplicates", "over_budget"):
+            record_value(name, stats[name])
+        return passages
+
     def format_docs(docs):
         return "\n\n".join(doc.page_content for doc in docs)
 
     # 5. Construct the RAG Chain
     rag_chain_with_sources = RunnableMap({
-        "context": retriever, 
+        "context": RunnableLambda(timed("retrieval", retrieve)),
         "question": RunnablePassthrough()
-    }) | {
+    }) | RunnablePassthrough.assign(context=lambda x: timed("context_assembly", assemble)(x["context"])) | {
         "answer": (
-            RunnablePassthrough.assign(context=lambda x: format_docs(x["context"]))
+            RunnablePassthrough.assign(context=lambda x: timed("format_docs", format_docs)(x["context"]))
 
-| prompt
+| RunnableLambda(render_prompt)
 | llm
 | StrOutputParser()
         ),
         "sources": lambda x: [os.path.basename(doc.metadata.get('source', 'Unknown')) for doc in x["context"]]
     }
 
-    return rag_chain_with_sources
\ No newline at end of file
+    # 6. Answer enumeration questions straight from the structured index when possible
+    def route(question):
+        if STRUCTURED_FAST_PATH:
+            direct_answer = candidate_index.answer(question)
+            if direct_answer is not None:
+                set_path("fast_path")
+                return direct_answer
+        set_path("rag")
+        return rag_chain_with_sources
+
+    chain = AnswerCachedChain(RunnableLambda(route), answer_cache)
+    if REQUEST_COALESCING:
+        chain = SingleFlightChain(chain)
+    return InstrumentedChain(chain)
\ No newline at end of file
@@ -0,0 +1,83 @@
+# src/render_cvs.py
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from generate_cvs import OUTPUT_IMAGE_DIR, OUTPUT_PDF_DIR, get_cv_template, pdf_headshot
+from profiles import PROFILE_DIRECTORY, pdf_file_name, profile_files
+
+# Bulk PDF rendering: re-renders the CVs of existing JSON profiles and headshots without
+# calling any API. Rendering is CPU-bound, so CVs are spread over a pool of worker
+# processes, each of which builds the CV template once and reuses it for all its CVs.
+# Headshots are embedded through the downscaled JPEG cache of generate_cvs.pdf_headshot.
+
+# --- Configuration ---
+load_dotenv()
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or os.cpu_count() or 1
+
+def render_job(index, profile_path, image_dir=OUTPUT_IMAGE_DIR, output_dir=OUTPUT_PDF_DIR):
+    """
+    Renders one CV. Returns (index, PDF path, PDF size in bytes), with a None path
+    when the candidate has no headshot yet.
+    """
+    image_path = os.path.join(image_dir, f"candidate_{index:02d}.png")
+    if not os.path.exists(image_path):
+        return index, None, 0
+    with open(profile_path, 'r') as f:
+        profile = json.load(f)
+    pdf_path = os.path.join(output_dir, pdf_file_name(profile, index))
+    get_cv_template().render(profile, pdf_headshot(image_path), pdf_path, index)
+    return index, pdf_path, os.path.getsize(pdf_path)
+
+def render_all(workers=RENDER_WORKERS, profile_directory=PROFILE_DIRECTORY, image_dir=OUTPUT_IMAGE_DIR,
+               output_dir=OUTPUT_PDF_DIR, limit=None):
+    """
+    Renders the CV of every profile in `profile_directory` and prints the throughput.
+    Returns a dict with the number of rendered and skipped CVs, PDFs/sec and the average PDF size.
+    """
+    jobs = profile_files(profile_directory)
+    if limit is not None:
+        jobs = jobs[:limit]
+    os.makedirs(output_dir, exist_ok=True)
+    indices = [index for index, _ in jobs]
+    paths = [path for _, path in jobs]
+    count = len(jobs)
+
+    start = time.perf_counter()
+    if workers <= 1 or count <= 1:
+        results = list(map(render_job, indices, paths, [image_dir] * count, [output_dir] * count))
+    else:
+        # Large chunks keep the per-task IPC small next to the rendering work.
+        chunksize = max(1, count // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(render_job, indices, paths, [image_dir] * count, [output_dir] * count,
+                                        chunksize=chunksize))
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    sizes = [size for _, pdf_path, size in results if pdf_path]
+    skipped = [index for index, pdf_path, _ in results if not pdf_path]
+    stats = {
+        "rendered": len(sizes), "skipped": len(skipped), "seconds": elapsed,
+        "pdfs_per_s": len(sizes) / elapsed, "avg_kb": sum(sizes) / len(sizes) / 1024 if sizes else 0.0,
+    }
+    print(f"Rendered {stats['rendered']} PDFs in {elapsed:.1f}s on {workers} worker(s): "
+          f"{stats['pdfs_per_s']:.1f} PDFs/s, average size {stats['avg_kb']:.1f} KB.")
+    if skipped:
+        print(f"Skipped {len(skipped)} candidate(s) without a headshot: {skipped[:10]}{' ...' if len(skipped) > 10 else ''}")
+    return stats
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-render PDF CVs from existing JSON profiles and headshots.")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS, help="Rendering processes (default: all cores).")
+    parser.add_argument("--profiles", default=PROFILE_DIRECTORY, help="Directory with candidate_XX.json profiles.")
+    parser.add_argument("--images", default=OUTPUT_IMAGE_DIR, help="Directory with candidate_XX.png headshots.")
+    parser.add_argument("--output", default=OUTPUT_PDF_DIR, help="Directory to write the PDFs to.")
+    parser.add_argument("--limit", type=int, help="Render only the first N profiles.")
+    args = parser.parse_args()
+
+    render_all(args.workers, args.profiles, args.images, args.output, args.limit)
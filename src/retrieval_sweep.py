@@ -0,0 +1,293 @@
+# src/retrieval_sweep.py
+
+import os
+import io
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+from benchmark import percentile, directory_size
+
+# Retrieval quality vs. latency sweep. The structured profiles in data/ say exactly which
+# candidate has which skill, employer and university, so a labeled question set can be
+# generated from them: every question comes with the CVs that answer it. Each chunking
+# is indexed once per backend, and every search configuration is scored on the same
+# questions:
+#   recall@k          relevant CVs among the retrieved sources, divided by min(k, #relevant),
+#                     so 1.0 means the results could not have held more relevant CVs
+#   source precision  fraction of the retrieved sources that are relevant
+# next to the search latency (query embedding excluded, it is the same for every
+# configuration) and the index size on disk. The Pareto frontier (no other configuration
+# is both at least as accurate and at least as fast) is printed as a Markdown table,
+# together with the configuration the app is currently set to.
+# The structured metadata pre-filter of the app is not applied, so the numbers describe
+# the vector search on its own.
+
+# Constants
+DEFAULT_CHUNKINGS = "section,pdf:1000:200,pdf:500:100,pdf:2000:400"
+DEFAULT_BACKENDS = "chroma,int8,float16"
+DEFAULT_SEARCH_TYPES = "similarity,mmr,hierarchical"
+DEFAULT_K = "1,3,5"
+DEFAULT_FETCH_K = "10,20,50"
+DEFAULT_QUESTIONS = 200
+DEFAULT_SEED = 42
+WRITE_BATCH_SIZE = 1000
+
+QUESTION_TEMPLATES = {
+    "skill": "Who has experience with {}?",
+    "employer": "Who has worked at {}?",
+    "university": "Which candidates studied at {}?",
+    "name": "Summarize the profile of {}.",
+}
+
+def profile_facts(profile_data):
+    """Returns the (kind, value) facts of a profile that questions are generated from."""
+    skills = profile_data.get('skills', {}) or {}
+    facts = [("skill", value) for key in ("programming_languages", "tools_and_technologies")
+             for value in skills.get(key, []) or []]
+    facts += [("employer", job.get('company')) for job in profile_data.get('work_experience', []) or []]
+    facts += [("university", entry.get('university')) for entry in profile_data.get('education', []) or []]
+    facts.append(("name", profile_data.get('full_name')))
+    return [(kind, value.strip()) for kind, value in facts if isinstance(value, str) and value.strip()]
+
+def build_labeled_questions(profiles, count, seed=DEFAULT_SEED):
+    """
+    Generates up to `count` questions with their ground truth from (source, profile) pairs.
+    Kinds are sampled round-robin so skills, which every profile has many of, do not dominate.
+    """
+    relevant = {}
+    for source, profile_data in profiles:
+        for kind, value in profile_facts(profile_data):
+            relevant.setdefault((kind, value.lower()), (value, set()))[1].add(source)
+    by_kind = {}
+    for (kind, _), (value, sources) in sorted(relevant.items()):
+        by_kind.setdefault(kind, []).append({"kind": kind, "question": QUESTION_TEMPLATES[kind].format(value),
+                                             "relevant": sorted(sources)})
+    rng = random.Random(seed)
+    for questions in by_kind.values():
+        rng.shuffle(questions)
+    labeled = []
+    while len(labeled) < count and any(by_kind.values()):
+        for kind in sorted(by_kind):
+            if by_kind[kind] and len(labeled) < count:
+                labeled.append(by_kind[kind].pop())
+    return labeled
+
+def parse_chunking(spec):
+    """'section' chunks profiles by section; 'pdf:SIZE:OVERLAP' splits the rendered PDFs."""
+    if spec == "section":
+        return None
+    _, size, overlap = spec.split(":")
+    return int(size), int(overlap)
+
+def split_corpus(chunking, profiles_by_source):
+    """Returns the chunks of every CV for one chunking, skipping CVs that cannot be read."""
+    from ingest_data import load_profile_sections, load_and_split
+    params = parse_chunking(chunking)
+    chunks = []
+    for source, (profile_path, index) in sorted(profiles_by_source.items()):
+        if params is None:
+            _, documents, error = load_profile_sections(source, profile_path, index)
+        elif os.path.exists(source):
+            _, documents, error = load_and_split(source, *params)
+        else:
+            documents, error = [], "PDF not rendered"
+        if error:
+            print(f"  -> Skipping '{source}' for {chunking}: {error}")
+        chunks.extend(documents)
+    return chunks
+
+def build_index(backend, path, chunks, vectors, embeddings):
+    """Writes one chunking into a fresh store of the given backend."""
+    from index_manifest import chunk_id
+    from ingest_data import ChromaWriter
+    from compact_store import CompactStoreWriter
+    ids, positions = [], {}
+    for chunk in chunks:
+        source = chunk.metadata["source"]
+        positions[source] = positions.get(source, -1) + 1
+        ids.append(chunk_id(source, "sweep", positions[source]))
+    if backend == "chroma":
+        writer = ChromaWriter(embeddings, path)
+    else:
+        writer = CompactStoreWriter(path, backend)
+    # Batches end on CV boundaries: the summary vector of a CV is built from the chunks of one batch.
+    start = 0
+    while start < len(chunks):
+        end = min(start + WRITE_BATCH_SIZE, len(chunks))
+        while end < len(chunks) and chunks[end].metadata["source"] == chunks[end - 1].metadata["source"]:
+            end += 1
+        files = {chunk.metadata["source"]: {"sha256": "sweep"} for chunk in chunks[start:end]}
+        writer.add(ids[start:end], chunks[start:end], vectors[start:end], files)
+        start = end
+    writer.commit(None)
+
+def open_searches(backend, path, embeddings, search_types):
+    """Returns {search type: fn(query_embedding, k, fetch_k) -> documents} for one index."""
+    searches = {}
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+        from mmr import NumpyMMRRetriever
+        from candidate_retrieval import HierarchicalRetriever, open_summary_store
+        store = Chroma(persist_directory=path, embedding_function=embeddings)
+        summary_store = open_summary_store(embeddings, path)
+        mmr = NumpyMMRRetriever(store)
+
+        def hierarchical(query_embedding, k, fetch_k):
+            return HierarchicalRetriever(store, summary_store, top_candidates=k, chunks_per_candidate=1,
+                                         fetch_k=fetch_k).search(query_embedding)
+
+        searches = {"similarity": lambda q, k, fetch_k: store.similarity_search_by_vector(q, k=k),
+                    "mmr": lambda q, k, fetch_k: mmr.search(q, k=k, fetch_k=fetch_k),
+                    "hierarchical": hierarchical}
+    else:
+        from compact_store import CompactStore
+        store = CompactStore(path)
+        searches = {"similarity": lambda q, k, fetch_k: store.similarity_search_by_vector(q, k=k),
+                    "mmr": lambda q, k, fetch_k: store.max_marginal_relevance_search_by_vector(q, k=k, fetch_k=fetch_k)}
+    return {name: fn for name, fn in searches.items() if name in search_types}
+
+def score(questions, query_vectors, search, k, fetch_k):
+    """Runs every question through one search configuration and averages its metrics."""
+    search(query_vectors[0], k, fetch_k)  # Warm-up
+    latencies, recalls, precisions = [], [], []
+    for labeled, query_embedding in zip(questions, query_vectors):
+        start = time.perf_counter()
+        documents = search(query_embedding, k, fetch_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        sources = list(dict.fromkeys(doc.metadata.get("source") for doc in documents))
+        hits = len(set(sources) & set(labeled["relevant"]))
+        recalls.append(hits / min(k, len(labeled["relevant"])))
+        precisions.append(hits / len(sources) if sources else 0.0)
+    return {"recall": sum(recalls) / len(recalls), "precision": sum(precisions) / len(precisions),
+            "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95)}
+
+def pareto_front(results):
+    """Marks the results that no other result beats on recall and p95 latency at once."""
+    for result in results:
+        result["pareto"] = not any(
+            other["recall"] >= result["recall"] and other["p95_ms"] <= result["p95_ms"]
+            and (other["recall"] > result["recall"] or other["p95_ms"] < result["p95_ms"])
+            for other in results
+        )
+    return results
+
+def current_config():
+    """The configuration the app and the ingestion are set to through the environment."""
+    from ingest_data import INGEST_SOURCE, CHUNK_SIZE, CHUNK_OVERLAP
+    from rag_pipeline import VECTOR_BACKEND, RETRIEVAL_MODE, RETRIEVAL_K, RETRIEVAL_FETCH_K, RETRIEVAL_TOP_CANDIDATES
+    from compact_store import COMPACT_STORE_DTYPE
+    hierarchical = RETRIEVAL_MODE == "hierarchical" and VECTOR_BACKEND == "chroma"
+    return {
+        "chunking": "section" if INGEST_SOURCE == "auto" else f"pdf:{CHUNK_SIZE}:{CHUNK_OVERLAP}",
+        "backend": COMPACT_STORE_DTYPE if VECTOR_BACKEND == "compact" else "chroma",
+        "search": "hierarchical" if hierarchical else "mmr",
+        "k": RETRIEVAL_TOP_CANDIDATES if hierarchical else RETRIEVAL_K,
+        "fetch_k": RETRIEVAL_FETCH_K,
+    }
+
+def run_sweep(args, index_dir):
+    """Builds every index and scores every search configuration. Returns one result per configuration."""
+    from embeddings import get_embeddings
+    from ingest_data import discover_profiles
+    from profiles import load_profiles
+    profiles_by_source = discover_profiles()
+    if not profiles_by_source:
+        raise SystemExit("No structured profiles found in 'data/'. Generate CVs first or pass --generate N.")
+    profiles = {index: profile_data for index, profile_data in load_profiles()}
+    questions = build_labeled_questions(
+        [(source, profiles[index]) for source, (_, index) in profiles_by_source.items() if index in profiles],
+        args.questions, args.seed)
+    print(f"Generated {len(questions)} labeled questions from {len(profiles_by_source)} profiles.")
+
+    embeddings = get_embeddings()
+    query_vectors = [embeddings.embed_query(labeled["question"]) for labeled in questions]
+    ks = [int(k) for k in args.k.split(",")]
+    fetch_ks = [int(fetch_k) for fetch_k in args.fetch_k.split(",")]
+    search_types = args.search_types.split(",")
+
+    results = []
+    for chunking in args.chunkings.split(","):
+        chunks = split_corpus(chunking, profiles_by_source)
+        if not chunks:
+            print(f"No chunks for {chunking}, skipping it.")
+            continue
+        vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+        for backend in args.backends.split(","):
+            path = os.path.join(index_dir, f"{chunking.replace(':', '-')}_{backend}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_index(backend, path, chunks, vectors, embeddings)
+            index_mb = directory_size(path) / 1e6
+            print(f"Indexed {chunking} ({len(chunks)} chunks) in {backend}: {index_mb:.1f} MB")
+            for search_type, search in open_searches(backend, path, embeddings, search_types).items():
+                for k in ks:
+                    # Plain similarity search does not use fetch_k.
+                    for fetch_k in (fetch_ks if search_type != "similarity" else [None]):
+                        if fetch_k is not None and fetch_k < k:
+                            continue
+                        result = {"chunking": chunking, "backend": backend, "search": search_type, "k": k,
+                                  "fetch_k": fetch_k, "chunks": len(chunks), "index_mb": index_mb}
+                        result.update(score(questions, query_vectors, search, k, fetch_k or k))
+                        results.append(result)
+    return pareto_front(results)
+
+def print_table(results, show_all=False):
+    """Prints the Pareto frontier (or every result) as a Markdown table, best recall first."""
+    current = current_config()
+
+    def is_current(result):
+        return all(result[key] == value for key, value in current.items()
+                   if not (key == "fetch_k" and result["search"] == "similarity"))
+
+    rows = [r for r in results if show_all or r["pareto"] or is_current(r)]
+    rows.sort(key=lambda r: (-r["recall"], r["p95_ms"]))
+    print("| chunking | backend | search | k | fetch_k | recall@k | source precision | p50 ms | p95 ms | index MB | |")
+    print("|---|---|---|---|---|---|---|---|---|---|---|")
+    for r in rows:
+        marks = [mark for mark, on in (("pareto", r["pareto"]), ("current", is_current(r))) if on]
+        print(f"| {r['chunking']} | {r['backend']} | {r['search']} | {r['k']} | {r['fetch_k'] or '-'} | "
+              f"{r['recall']:.3f} | {r['precision']:.3f} | {r['p50_ms']:.2f} | {r['p95_ms']:.2f} | "
+              f"{r['index_mb']:.1f} | {', '.join(marks)} |")
+    if not any(is_current(r) for r in results):
+        print(f"The current configuration ({current}) was not part of the sweep.")
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep retrieval settings for recall and latency on labeled questions.")
+    parser.add_argument("--chunkings", default=DEFAULT_CHUNKINGS,
+                        help="Comma-separated chunkings: 'section' or 'pdf:SIZE:OVERLAP'.")
+    parser.add_argument("--backends", default=DEFAULT_BACKENDS, help="Comma-separated backends: chroma, int8, float16.")
+    parser.add_argument("--search-types", default=DEFAULT_SEARCH_TYPES,
+                        help="Comma-separated search types: similarity, mmr, hierarchical (Chroma only).")
+    parser.add_argument("--k", default=DEFAULT_K, help="Comma-separated values of k.")
+    parser.add_argument("--fetch-k", default=DEFAULT_FETCH_K, help="Comma-separated values of fetch_k.")
+    parser.add_argument("--questions", type=int, default=DEFAULT_QUESTIONS)
+    parser.add_argument("--generate", type=int, metavar="N",
+                        help="Evaluate on N generated fake CVs in a scratch directory instead of data/ and cvs_generated/.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--all", action="store_true", help="Print every configuration, not only the Pareto frontier.")
+    parser.add_argument("--output", help="Optional path to write all results as JSON.")
+    args = parser.parse_args()
+
+    # The sweep's indexes live in a scratch directory and never touch the app's vector store.
+    workdir = tempfile.mkdtemp(prefix="cv_retrieval_sweep_")
+    output = os.path.abspath(args.output) if args.output else None
+    cwd = os.getcwd()
+    try:
+        if args.generate:
+            from benchmark import generate_corpus
+            os.chdir(workdir)
+            print(f"Generating {args.generate} CVs...")
+            generate_corpus(args.generate, os.cpu_count() or 1, args.seed)
+        results = run_sweep(args, os.path.join(workdir, "indexes"))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(results, args.all)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,238 @@
+# src/rpc.py
+
+import os
+import stat
+import queue
+import secrets
+import ipaddress
+import threading
+from multiprocessing.connection import Listener, Client
+from dotenv import load_dotenv
+
+# Minimal request/response RPC over multiprocessing.connection. It is the local stand-in for
+# services that could run on other hosts, such as index shard servers: the same code path
+# works over TCP ("host:port") and over a Unix socket (a file path) on one machine.
+# Requests are (method, args, kwargs) tuples and results are pickled, so numpy arrays and
+# LangChain Documents travel as-is. Unpickling a message can run arbitrary code, so every
+# connection must first pass the authkey handshake: servers on other interfaces require an
+# explicit RPC_AUTHKEY, and local servers otherwise share a random key generated on first
+# use and readable only by the current user. Messages are not encrypted; only expose
+# servers on trusted networks.
+
+# --- Configuration ---
+load_dotenv()
+
+# Shared secret of servers and clients; required to listen on anything but loopback or a Unix socket.
+RPC_AUTHKEY = os.getenv("RPC_AUTHKEY", "").encode("utf-8")
+# Generated key used by local servers and clients when RPC_AUTHKEY is not set.
+RPC_AUTHKEY_FILE = os.path.expanduser(os.getenv("RPC_AUTHKEY_FILE", "~/.cv-screener/rpc_authkey"))
+# Seconds to wait for a response before the call fails.
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "30"))
+
+class RPCError(Exception):
+    """Raised on the client when the remote handler failed or the server could not be reached."""
+
+def parse_address(address):
+    """Turns "host:port" into a TCP address tuple; anything else is a Unix socket path."""
+    if isinstance(address, tuple):
+        return address
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+def format_address(address):
+    """Inverse of parse_address."""
+    if isinstance(address, tuple):
+        return f"{address[0]}:{address[1]}"
+    return address
+
+def is_local_address(address):
+    """True for Unix sockets and loopback TCP addresses, which other hosts cannot reach."""
+    address = parse_address(address)
+    if not isinstance(address, tuple):
+        return True
+    host = address[0]
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def local_authkey(create=False):
+    """
+    Returns the generated key of local servers, creating it if `create` is set.
+    The file is written atomically with owner-only permissions, so concurrently started
+    servers agree on one key; a key file other users can read is refused.
+    """
+    path = RPC_AUTHKEY_FILE
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(temp_path, path)
+        except FileExistsError:
+            pass  # Another server created it first
+        finally:
+            os.unlink(temp_path)
+    try:
+        status = os.stat(path)
+    except FileNotFoundError:
+        raise RPCError(f"RPC_AUTHKEY is not set and no local key exists at '{path}'. "
+                       "Start the server first or set RPC_AUTHKEY.") from None
+    if status.st_mode & 0o077 or status.st_uid != os.getuid():
+        raise RPCError(f"Refusing to use '{path}': the RPC key must be owned by this user and private (chmod 600).")
+    with open(path) as f:
+        return f.read().strip().encode("utf-8")
+
+def server_authkey(address):
+    """
+    Returns the key a server on `address` authenticates clients with. Without an explicit
+    RPC_AUTHKEY, only local addresses are allowed and they use the generated local key.
+    """
+    if RPC_AUTHKEY:
+        return RPC_AUTHKEY
+    if not is_local_address(address):
+        raise RPCError(f"Refusing to listen on {format_address(parse_address(address))} without RPC_AUTHKEY: "
+                       "anyone who can reach the port could run code in this process. "
+                       "Set a shared secret in RPC_AUTHKEY or listen on 127.0.0.1 or a Unix socket.")
+    return local_authkey(create=True)
+
+def client_authkey():
+    """Returns the key clients authenticate with: RPC_AUTHKEY, or the generated local key."""
+    return RPC_AUTHKEY or local_authkey()
+
+class RPCServer:
+    """
+    Serves the callables in `handlers` by name. Each client connection gets its own thread,
+    so a slow request never blocks the other clients; handlers must be thread-safe.
+    Pass port 0 to bind a free port and read the bound address from `address`.
+    """
+
+    def __init__(self, address, handlers, authkey=None):
+        if authkey is None:
+            authkey = server_authkey(address)
+        address = parse_address(address)
+        if isinstance(address, str) and os.path.lexists(address):
+            # Only a socket left behind by a previous server is replaced; anything else at the
+            # address is more likely a mistyped path than something that is safe to delete.
+            if not stat.S_ISSOCK(os.lstat(address).st_mode):
+                raise RPCError(f"Refusing to listen on '{address}': it exists and is not a socket.")
+            os.unlink(address)
+        self.listener = Listener(address, authkey=authkey)
+        self.handlers = dict(handlers)
+        self.closed = False
+
+    @property
+    def address(self):
+        return format_address(self.listener.address)
+
+    def serve_forever(self):
+        """Accepts connections until close() is called."""
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except Exception:
+                if self.closed:
+                    break
+                continue  # Failed handshake, e.g. a client with the wrong authkey
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def start(self):
+        """Serves in a background thread and returns the server."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def _serve(self, connection):
+        with connection:
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    handler = self.handlers.get(method)
+                    if handler is None:
+                        raise RPCError(f"Unknown method '{method}'")
+                    response = ("ok", handler(*args, **kwargs))
+                except Exception as e:
+                    response = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    connection.send(response)
+                except (EOFError, OSError):
+                    return
+
+    def close(self):
+        self.closed = True
+        self.listener.close()
+
+class RPCClient:
+    """
+    Thread-safe client. Connections are pooled and each call borrows one, so concurrent
+    callers never interleave messages and keep-alive connections are reused between calls.
+    All served methods are read-only, so a call that fails on a pooled connection (e.g. after
+    a server restart) is retried once on a fresh one.
+    """
+
+    def __init__(self, address, authkey=None, timeout=RPC_TIMEOUT):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.timeout = timeout
+        self.pool = queue.LifoQueue()
+
+    def _connect(self):
+        try:
+            # The local key is read on first connect, so clients can be created before the server starts.
+            if self.authkey is None:
+                self.authkey = client_authkey()
+            return Client(self.address, authkey=self.authkey)
+        except (OSError, EOFError) as e:
+            raise RPCError(f"Cannot connect to {format_address(self.address)}: {e}") from e
+
+    def _roundtrip(self, connection, request):
+        connection.send(request)
+        if not connection.poll(self.timeout):
+            raise TimeoutError(f"No response from {format_address(self.address)} within {self.timeout:.0f}s")
+        return connection.recv()
+
+    def call(self, method, *args, **kwargs):
+        """Calls `method` on the server and returns its result."""
+        request = (method, args, kwargs)
+        try:
+            connection, pooled = self.pool.get_nowait(), True
+        except queue.Empty:
+            connection, pooled = self._connect(), False
+        try:
+            status, result = self._roundtrip(connection, request)
+        except TimeoutError:
+            # The late response would be read by the next call, so the connection is dropped.
+            connection.close()
+            raise
+        except (EOFError, OSError) as e:
+            connection.close()
+            if not pooled:
+                raise RPCError(f"Connection to {format_address(self.address)} failed: {e}") from e
+            connection = self._connect()
+            try:
+                status, result = self._roundtrip(connection, request)
+            except TimeoutError:
+                connection.close()
+                raise
+            except (EOFError, OSError) as retry_error:
+                connection.close()
+                raise RPCError(f"Connection to {format_address(self.address)} failed: {retry_error}") from retry_error
+        self.pool.put(connection)
+        if status == "error":
+            raise RPCError(result)
+        return result
+
+    def close(self):
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                return
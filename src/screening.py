@@ -0,0 +1,307 @@
+# src/screening.py
+
+import os
+import re
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from dotenv import load_dotenv
+from embeddings import get_embeddings
+from candidate_index import CandidateIndex
+from compact_store import CompactStore
+from context_builder import assemble_context
+from metrics import LLMMetricsCallback
+from mmr import normalize_rows
+from rag_pipeline import get_llm, VECTOR_BACKEND
+from sharding import INDEX_SHARDS, shard_paths, index_base_path
+
+# --- Configuration ---
+load_dotenv()
+
+# Batch screening: rank every candidate against a job description at once.
+SCREENING_SHORTLIST = int(os.getenv("SCREENING_SHORTLIST", "10"))
+SCREENING_CONCURRENCY = int(os.getenv("SCREENING_CONCURRENCY", "4"))
+# A requirement counts as covered when some chunk of the CV is at least this similar to it.
+SCREENING_MATCH_THRESHOLD = float(os.getenv("SCREENING_MATCH_THRESHOLD", "0.5"))
+SCREENING_BLOCK_ROWS = int(os.getenv("SCREENING_BLOCK_ROWS", "8192"))
+SCREENING_CONTEXT_TOKENS = int(os.getenv("SCREENING_CONTEXT_TOKENS", "1500"))
+
+SCREENING_TEMPLATE = """
+You are an expert HR assistant screening candidates for a job opening.
+Use only the CV excerpts below to assess the candidate. Do not use any of your own knowledge.
+
+Job description:
+{job_description}
+
+CV excerpts of {candidate}:
+{evidence}
+
+Start with one line in the form "Fit: N/10". Then justify the score in two or three sentences
+that refer to the excerpts, and list the requirements the excerpts do not show.
+"""
+
+def split_requirements(job_description):
+    """
+    Splits a job description into requirements: one per bullet or line, or one per
+    sentence for a single paragraph. Very short fragments such as headings are skipped.
+    """
+    lines = [re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip() for line in job_description.splitlines()]
+    lines = [line for line in lines if line]
+    if len(lines) <= 1:
+        lines = [s.strip() for s in re.split(r"(?<=[.;!?])\s+", job_description) if s.strip()]
+    requirements = [line for line in lines if len(line.split()) >= 3 and not line.endswith(":")]
+    return requirements or [job_description.strip()]
+
+class ChromaChunks:
+    """Reads every chunk vector of the Chroma collection block by block."""
+
+    key_type = str  # Chunk IDs
+
+    def __init__(self, vector_store, block_rows=SCREENING_BLOCK_ROWS):
+        self.collection = vector_store._collection
+        self.block_rows = block_rows
+
+    def blocks(self):
+        """Yields (chunk keys, float32 vectors, sources) per block."""
+        for offset in range(0, self.collection.count(), self.block_rows):
+            batch = self.collection.get(limit=self.block_rows, offset=offset, include=["embeddings", "metadatas"])
+            yield (batch["ids"], np.asarray(batch["embeddings"], dtype=np.float32),
+                   [(metadata or {}).get("source", "") for metadata in batch["metadatas"]])
+
+    def texts(self, keys):
+        batch = self.collection.get(ids=list(keys), include=["documents"])
+        return dict(zip(batch["ids"], batch["documents"]))
+
+class CompactChunks:
+    """Reads every chunk vector of the compact store straight from the memory-mapped matrix."""
+
+    key_type = int  # Row numbers
+
+    def __init__(self, store, block_rows=SCREENING_BLOCK_ROWS):
+        self.generation = store.refresh()
+        self.block_rows = block_rows
+
+    def blocks(self):
+        if self.generation is not None:
+            yield from self.generation.blocks(self.block_rows)
+
+    def texts(self, keys):
+        keys = list(keys)
+        return {key: text for key, (_, text, _) in zip(keys, self.generation.records(keys))}
+
+class ShardedChunks:
+    """Reads the chunks of every shard in turn; keys are prefixed with the shard number."""
+
+    def __init__(self, shards):
+        self.shards = shards
+
+    def blocks(self):
+        for shard, chunks in enumerate(self.shards):
+            for keys, vectors, sources in chunks.blocks():
+                yield [f"{shard}:{key}" for key in keys], vectors, sources
+
+    def texts(self, keys):
+        by_shard = {}
+        for key in keys:
+            shard, _, shard_key = key.partition(":")
+            shard = int(shard)
+            by_shard.setdefault(shard, {})[self.shards[shard].key_type(shard_key)] = key
+        texts = {}
+        for shard, shard_keys in by_shard.items():
+            for shard_key, text in self.shards[shard].texts(shard_keys).items():
+                texts[shard_keys[shard_key]] = text
+        return texts
+
+def open_chunks(backend=VECTOR_BACKEND, embeddings=None, num_shards=INDEX_SHARDS):
+    """Opens the chunk reader of a backend; a sharded index is read from its local shard directories."""
+    shards = []
+    for path in shard_paths(index_base_path(backend), num_shards):
+        if backend == "compact":
+            shards.append(CompactChunks(CompactStore(path)))
+        else:
+            shards.append(ChromaChunks(Chroma(persist_directory=path, embedding_function=embeddings)))
+    return shards[0] if num_shards <= 1 else ShardedChunks(shards)
+
+def score_candidates(chunks, requirement_vectors):
+    """
+    Builds the candidate x requirement similarity matrix: for every CV and requirement,
+    the highest cosine similarity of any of the CV's chunks, and the key of that chunk.
+    Each block of chunks is scored with one matrix product, and the per-candidate maxima
+    are taken with a sort per requirement, with no Python loop over chunks or candidates.
+    Returns (sources, scores, evidence keys).
+    """
+    requirements = normalize_rows(requirement_vectors)
+    candidate_rows = {}
+    best = np.full((0, len(requirements)), -np.inf, dtype=np.float32)
+    best_keys = np.empty((0, len(requirements)), dtype=object)
+    for keys, vectors, sources in chunks.blocks():
+        codes = np.array([candidate_rows.setdefault(source, len(candidate_rows)) for source in sources])
+        if len(candidate_rows) > len(best):
+            grow = len(candidate_rows) - len(best)
+            best = np.vstack([best, np.full((grow, len(requirements)), -np.inf, dtype=np.float32)])
+            best_keys = np.vstack([best_keys, np.empty((grow, len(requirements)), dtype=object)])
+        keys = np.array(keys, dtype=object)
+        similarities = normalize_rows(vectors) @ requirements.T
+        for r in range(len(requirements)):
+            # Sort by candidate, then by descending similarity: the first row of each candidate is its best chunk.
+            order = np.lexsort((-similarities[:, r], codes))
+            sorted_codes = codes[order]
+            first = order[np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]]
+            improved = similarities[first, r] > best[codes[first], r]
+            rows = codes[first][improved]
+            best[rows, r] = similarities[first, r][improved]
+            best_keys[rows, r] = keys[first][improved]
+    sources = [None] * len(candidate_rows)
+    for source, row in candidate_rows.items():
+        sources[row] = source
+    return sources, best, best_keys
+
+def rank_candidates(job_description, shortlist=SCREENING_SHORTLIST, backend=VECTOR_BACKEND, embeddings=None):
+    """
+    Scores every candidate against the requirements of a job description and returns the
+    report for the `shortlist` best ones, with per-requirement evidence, ranked by the mean
+    of their best per-requirement similarities.
+    """
+    embeddings = embeddings or get_embeddings()
+    requirements = split_requirements(job_description)
+    start = time.perf_counter()
+    # All requirements are embedded together, once per screening run.
+    requirement_vectors = embeddings.embed_documents(requirements)
+    chunks = open_chunks(backend, embeddings)
+    sources, scores, evidence_keys = score_candidates(chunks, requirement_vectors)
+    scoring_seconds = time.perf_counter() - start
+
+    profiles = CandidateIndex.from_directory().candidates
+    fit = scores.mean(axis=1) if len(sources) else np.empty(0)
+    coverage = (scores >= SCREENING_MATCH_THRESHOLD).sum(axis=1) if len(sources) else np.empty(0)
+    top = np.argsort(-fit)[:shortlist]
+    texts = chunks.texts({key for row in top for key in evidence_keys[row] if key is not None})
+
+    candidates = []
+    for rank, row in enumerate(top, start=1):
+        profile = profiles.get(os.path.basename(sources[row]), {})
+        candidates.append({
+            "rank": rank,
+            "source": os.path.basename(sources[row]),
+            "name": profile.get("name") or os.path.basename(sources[row]),
+            "job_title": profile.get("job_title", ""),
+            "score": round(float(fit[row]), 4),
+            "coverage": f"{int(coverage[row])}/{len(requirements)}",
+            "requirements": [
+                {"requirement": requirement, "score": round(float(scores[row, r]), 4),
+                 "evidence": texts.get(evidence_keys[row, r], "")}
+                for r, requirement in enumerate(requirements)
+            ],
+            "assessment": None,
+        })
+    return {
+        "job_description": job_description,
+        "requirements": requirements,
+        "candidates": candidates,
+        "stats": {"candidates_scored": len(sources), "scoring_seconds": round(scoring_seconds, 3),
+                  "candidates_per_second": round(len(sources) / max(scoring_seconds, 1e-9), 1)},
+    }
+
+def get_screening_chain(llm=None):
+    """Returns the chain that writes the LLM assessment of one shortlisted candidate."""
+    if llm is None:
+        llm = get_llm()
+    prompt = ChatPromptTemplate.from_template(SCREENING_TEMPLATE)
+    return prompt | llm.with_config(callbacks=[LLMMetricsCallback()]) | StrOutputParser()
+
+def assessment_input(report, candidate):
+    """Packs a candidate's strongest evidence, deduplicated, into the screening prompt budget."""
+    ranked = sorted(candidate["requirements"], key=lambda item: -item["score"])
+    docs = [Document(page_content=item["evidence"], metadata={"source": candidate["source"]})
+            for item in ranked if item["evidence"]]
+    passages, _ = assemble_context(docs, max_tokens=SCREENING_CONTEXT_TOKENS)
+    return {
+        "job_description": report["job_description"],
+        "candidate": candidate["name"],
+        "evidence": "\n\n".join(doc.page_content for doc in passages) or "(no matching excerpts)",
+    }
+
+def _attach_assessments(report, results, seconds):
+    for candidate, result in zip(report["candidates"], results):
+        candidate["assessment"] = f"Assessment failed: {result}" if isinstance(result, Exception) else result
+    report["stats"]["assessment_seconds"] = round(seconds, 3)
+    report["stats"]["assessments_per_second"] = round(len(results) / max(seconds, 1e-9), 2)
+    return report
+
+def screen_candidates(job_description, shortlist=SCREENING_SHORTLIST, llm=None, assess=True,
+                      concurrency=SCREENING_CONCURRENCY, backend=VECTOR_BACKEND):
+    """
+    Ranks the whole CV pool against a job description and, unless `assess` is False,
+    assesses the shortlist with the LLM, `concurrency` candidates at a time.
+    """
+    report = rank_candidates(job_description, shortlist, backend)
+    if not assess or not report["candidates"]:
+        return report
+    chain = get_screening_chain(llm)
+    inputs = [assessment_input(report, candidate) for candidate in report["candidates"]]
+    start = time.perf_counter()
+    results = chain.batch(inputs, config={"max_concurrency": concurrency}, return_exceptions=True)
+    return _attach_assessments(report, results, time.perf_counter() - start)
+
+async def ascreen_candidates(job_description, shortlist=SCREENING_SHORTLIST, llm=None, assess=True,
+                             concurrency=SCREENING_CONCURRENCY, backend=VECTOR_BACKEND):
+    """Async variant of screen_candidates; the vector scoring runs on a worker thread."""
+    report = await asyncio.to_thread(rank_candidates, job_description, shortlist, backend)
+    if not assess or not report["candidates"]:
+        return report
+    chain = get_screening_chain(llm)
+    inputs = [assessment_input(report, candidate) for candidate in report["candidates"]]
+    start = time.perf_counter()
+    results = await chain.abatch(inputs, config={"max_concurrency": concurrency}, return_exceptions=True)
+    return _attach_assessments(report, results, time.perf_counter() - start)
+
+def format_report(report):
+    """Formats a screening report as Markdown."""
+    lines = ["# Screening report", "", "## Requirements"]
+    lines += [f"{i}. {requirement}" for i, requirement in enumerate(report["requirements"], start=1)]
+    lines += ["", "## Ranking", "", "| Rank | Candidate | Title | Score | Coverage |", "|---|---|---|---|---|"]
+    lines += [f"| {c['rank']} | {c['name']} | {c['job_title']} | {c['score']:.3f} | {c['coverage']} |"
+              for c in report["candidates"]]
+    for c in report["candidates"]:
+        lines += ["", f"### {c['rank']}. {c['name']} ({c['source']})"]
+        if c["assessment"]:
+            lines += ["", c["assessment"].strip()]
+        lines += ["", "| Requirement | Similarity | Evidence |", "|---|---|---|"]
+        for item in c["requirements"]:
+            evidence = " ".join(item["evidence"].split())[:160].replace("|", "/")
+            lines.append(f"| {item['requirement']} | {item['score']:.3f} | {evidence} |")
+    stats = report["stats"]
+    lines += ["", f"Scored {stats['candidates_scored']} candidates in {stats['scoring_seconds']:.2f}s "
+                  f"({stats['candidates_per_second']:.1f} candidates/sec)."]
+    if "assessment_seconds" in stats:
+        lines.append(f"Assessed {len(report['candidates'])} candidates in {stats['assessment_seconds']:.2f}s "
+                     f"({stats['assessments_per_second']:.2f} candidates/sec).")
+    return "\n".join(lines) + "\n"
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank all candidates against a job description.")
+    parser.add_argument("--job", required=True, help="Path to a text file with the job description.")
+    parser.add_argument("--shortlist", type=int, default=SCREENING_SHORTLIST, help="Candidates to report and assess.")
+    parser.add_argument("--concurrency", type=int, default=SCREENING_CONCURRENCY, help="Concurrent LLM assessments.")
+    parser.add_argument("--no-llm", action="store_true", help="Only rank by similarity, without LLM assessments.")
+    parser.add_argument("--output", help="Write the report to this path (.json for JSON, otherwise Markdown).")
+    args = parser.parse_args()
+
+    with open(args.job, 'r') as f:
+        job_description = f.read()
+    report = screen_candidates(job_description, args.shortlist, assess=not args.no_llm, concurrency=args.concurrency)
+    text = format_report(report)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            if args.output.endswith(".json"):
+                json.dump(report, f, indent=2)
+            else:
+                f.write(text)
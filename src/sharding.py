@@ -0,0 +1,193 @@
+# src/sharding.py
+
+import os
+import sys
+import time
+import signal
+import hashlib
+import argparse
+import subprocess
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from langchain_chroma import Chroma
+from dotenv import load_dotenv
+from compact_store import CompactStore, COMPACT_STORE_PATH
+from mmr import NumpyMMRRetriever, mmr_select
+from metrics import span
+from rpc import RPCServer, RPCClient, server_authkey
+
+# Sharded vector index: the corpus is partitioned by candidate into INDEX_SHARDS stores,
+# each a complete Chroma or compact store in its own directory (vector_store/shard-00, ...).
+# A query fans out to every shard in parallel, each shard returns its own top `fetch_k`
+# chunks with their vectors, and the merged candidates go through one global MMR selection.
+# Since every shard contributes its own top `fetch_k`, the merged set always contains the
+# global top `fetch_k`, so the answers match those of a single index.
+# Shards are opened in-process, or served by shard server processes (possibly on other
+# hosts) listed in SHARD_ADDRESSES and reached over rpc.py.
+
+# --- Configuration ---
+load_dotenv()
+
+VECTOR_STORE_PATH = "vector_store"
+
+INDEX_SHARDS = max(1, int(os.getenv("INDEX_SHARDS", "1")))
+# Comma-separated shard server addresses ("host:port" or a Unix socket path), one per shard.
+# Empty opens the shard directories in this process instead.
+SHARD_ADDRESSES = [address.strip() for address in os.getenv("SHARD_ADDRESSES", "").split(",") if address.strip()]
+# Threads used to query the shards in parallel (0 = one per shard).
+SHARD_QUERY_THREADS = int(os.getenv("SHARD_QUERY_THREADS", "0"))
+SHARD_BASE_PORT = int(os.getenv("SHARD_BASE_PORT", "7100"))
+
+def shard_of(source, num_shards=INDEX_SHARDS):
+    """
+    Returns the shard of a CV. All chunks of a candidate live in one shard; the hash is
+    stable across processes and runs, unlike Python's built-in hash().
+    """
+    if num_shards <= 1:
+        return 0
+    return int(hashlib.sha1(source.encode("utf-8")).hexdigest()[:8], 16) % num_shards
+
+def shard_paths(base_path, num_shards=INDEX_SHARDS):
+    """Returns the store directory of every shard; an unsharded index lives in `base_path` itself."""
+    if num_shards <= 1:
+        return [base_path]
+    return [os.path.join(base_path, f"shard-{i:02d}") for i in range(num_shards)]
+
+def index_base_path(backend):
+    """Returns the directory that holds the index (or its shards) of a vector backend."""
+    return COMPACT_STORE_PATH if backend == "compact" else VECTOR_STORE_PATH
+
+def is_sharded(num_shards=INDEX_SHARDS, addresses=SHARD_ADDRESSES):
+    return num_shards > 1 or bool(addresses)
+
+class LocalShard:
+    """One shard opened in this process."""
+
+    def __init__(self, backend, path, embeddings=None):
+        self.backend = backend
+        if backend == "compact":
+            self.store = CompactStore(path)
+        else:
+            self.store = Chroma(persist_directory=path, embedding_function=embeddings)
+            self.fetcher = NumpyMMRRetriever(self.store)
+
+    def count(self):
+        if self.backend == "compact":
+            return self.store.count()
+        return self.store._collection.count()
+
+    def fetch(self, query_embedding, fetch_k, filter=None):
+        """Returns the shard's `fetch_k` nearest chunks as Documents and their float32 vectors."""
+        if self.backend == "compact":
+            generation = self.store.refresh()
+            if generation is None:
+                return [], np.empty((0, 0), dtype=np.float32)
+            indices, _ = generation.top_k(query_embedding, fetch_k, generation.filter_mask(filter))
+            return generation.documents(indices), generation.rows(indices)
+        return self.fetcher.fetch(query_embedding, fetch_k, filter)
+
+class RemoteShard:
+    """A shard served by a shard server process, see serve_shard()."""
+
+    def __init__(self, address):
+        self.address = address
+        self.client = RPCClient(address)
+
+    def count(self):
+        return self.client.call("count")
+
+    def fetch(self, query_embedding, fetch_k, filter=None):
+        return self.client.call("fetch", list(query_embedding), fetch_k, filter)
+
+def open_shards(backend, base_path, embeddings=None, num_shards=INDEX_SHARDS, addresses=SHARD_ADDRESSES):
+    """Returns the shards of the index: remote ones when addresses are configured, local ones otherwise."""
+    if addresses:
+        return [RemoteShard(address) for address in addresses]
+    return [LocalShard(backend, path, embeddings) for path in shard_paths(base_path, num_shards)]
+
+class ShardedRetriever:
+    """
+    Fans a query out to all shards on a thread pool and merges their candidates with one
+    global MMR selection. Chroma, the numpy scoring of the compact store and the RPC
+    round trips all release the GIL, so the shards are searched concurrently.
+    A shard that fails is reported and skipped, so one unavailable shard degrades recall
+    instead of failing every query; the query only fails when no shard answers.
+    """
+
+    def __init__(self, shards, lambda_mult=0.5, score_threshold=None, threads=SHARD_QUERY_THREADS):
+        self.shards = shards
+        self.lambda_mult = lambda_mult
+        self.score_threshold = score_threshold
+        self.executor = ThreadPoolExecutor(max_workers=threads or len(shards), thread_name_prefix="shard")
+
+    def count(self):
+        return sum(self.executor.map(lambda shard: shard.count(), self.shards))
+
+    def _fetch(self, shard, query_embedding, fetch_k, filter):
+        try:
+            return shard.fetch(query_embedding, fetch_k, filter)
+        except Exception as e:
+            print(f"Shard {getattr(shard, 'address', '')} failed: {type(e).__name__}: {e}")
+            return None
+
+    def search(self, query_embedding, k, fetch_k, filter=None):
+        """MMR search by vector over all shards; results are returned in MMR selection order."""
+        with span("shard_fanout"):
+            results = list(self.executor.map(lambda shard: self._fetch(shard, query_embedding, fetch_k, filter),
+                                             self.shards))
+        answered = [result for result in results if result is not None]
+        if not answered:
+            raise RuntimeError("No index shard could be searched.")
+        documents = [doc for docs, _ in answered for doc in docs]
+        blocks = [vectors for _, vectors in answered if len(vectors)]
+        if not documents or not blocks:
+            return []
+        with span("mmr"):
+            vectors = np.concatenate(blocks)
+            # Keep the global top fetch_k by the same dot product the shards ranked by.
+            top = np.argsort(-(vectors @ np.asarray(query_embedding, dtype=np.float32)), kind="stable")[:fetch_k]
+            selected = mmr_select(query_embedding, vectors[top], k, self.lambda_mult, self.score_threshold)
+        return [documents[top[i]] for i in selected]
+
+def serve_shard(backend, path, address):
+    """Serves one shard directory over RPC until the process is stopped."""
+    shard = LocalShard(backend, path)
+    server = RPCServer(address, {"count": shard.count, "fetch": shard.fetch})
+    print(f"Serving shard '{path}' ({backend}, {shard.count()} chunks) on {server.address}", flush=True)
+    server.serve_forever()
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve index shards over RPC.")
+    parser.add_argument("--backend", choices=("chroma", "compact"), default=os.getenv("VECTOR_BACKEND", "chroma").lower())
+    parser.add_argument("--shards", type=int, default=INDEX_SHARDS, help="Number of shards in the index.")
+    parser.add_argument("--shard", type=int, help="Serve only this shard (default: start one server process per shard).")
+    parser.add_argument("--address", help="Address to serve --shard on (default: 127.0.0.1:SHARD_BASE_PORT+shard).")
+    parser.add_argument("--base-port", type=int, default=SHARD_BASE_PORT)
+    args = parser.parse_args()
+
+    paths = shard_paths(index_base_path(args.backend), args.shards)
+    if args.shard is not None:
+        serve_shard(args.backend, paths[args.shard], args.address or f"127.0.0.1:{args.base_port + args.shard}")
+        sys.exit(0)
+
+    # Local stand-in for a multi-host deployment: one server process per shard.
+    # SIGTERM (e.g. docker stop) exits through the finally block so the servers are stopped too.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    # Creates the local RPC key once, before the servers start, unless RPC_AUTHKEY is set.
+    server_authkey(f"127.0.0.1:{args.base_port}")
+    processes = []
+    for i in range(len(paths)):
+        processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "--backend", args.backend,
+                                           "--shards", str(args.shards), "--shard", str(i),
+                                           "--base-port", str(args.base_port)]))
+    addresses = ",".join(f"127.0.0.1:{args.base_port + i}" for i in range(len(paths)))
+    print(f"Started {len(processes)} shard servers. Point the app at them with SHARD_ADDRESSES={addresses}", flush=True)
+    try:
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
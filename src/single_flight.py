@@ -0,0 +1,182 @@
+# src/single_flight.py
+
+import asyncio
+import threading
+import contextvars
+from langchain_core.runnables import Runnable
+from query_cache import normalize_question
+from metrics import set_path
+
+# Request coalescing ("single flight"): while a question is being answered, identical
+# questions join the running request instead of starting their own retrieval and LLM call.
+# The answer cache only helps once the first answer is complete; a burst of the same
+# question (a demo, a shared link, a retrying client) otherwise costs one upstream call each.
+
+class _Flight:
+    """The chunks of one running request, shared by the threads waiting for them."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def publish(self, chunk):
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    def subscribe(self):
+        """Yields every chunk from the first one, then re-raises the request's error, if any."""
+        position = 0
+        while True:
+            with self.condition:
+                while position == len(self.chunks) and not self.done:
+                    self.condition.wait()
+                pending = self.chunks[position:]
+                position = len(self.chunks)
+                done, error = self.done, self.error
+            yield from pending
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+class _AsyncFlight:
+    """The chunks of one running request, shared by the tasks of one event loop waiting for them."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+        self.task = None  # Keeps the producer task referenced until it finishes
+
+    def _notify(self):
+        # Waiters hold the old event; a fresh one is used for the next change.
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, chunk):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def subscribe(self):
+        position = 0
+        while True:
+            if position < len(self.chunks):
+                position += 1
+                yield self.chunks[position - 1]
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self.changed.wait()
+
+class SingleFlightChain(Runnable):
+    """
+    Runnable wrapper that merges concurrent identical requests into one call of the wrapped chain.
+    The first request starts the call in the background; it and every request for the same
+    normalized question that arrives before the call completes receive the same chunks from
+    the start, or the same error. Requests arriving later start a new call (and usually hit
+    the answer cache behind this wrapper). Running the call in the background means a
+    client that disconnects does not cancel the answer the others are waiting for.
+    Synchronous and asynchronous calls are coalesced separately.
+    """
+
+    def __init__(self, chain, key_fn=normalize_question):
+        self.chain = chain
+        self.key_fn = key_fn
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+
+    def _join(self, input, config, kwargs, streaming):
+        """Returns the flight for `input`, starting the call in a background thread if there is none."""
+        key = self.key_fn(input)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                set_path("coalesced")
+                return flight
+            flight = self._flights[key] = _Flight()
+
+        def produce():
+            error = None
+            try:
+                if streaming:
+                    for chunk in self.chain.stream(input, config, **kwargs):
+                        flight.publish(chunk)
+                else:
+                    flight.publish(self.chain.invoke(input, config, **kwargs))
+            except Exception as e:
+                error = e
+            finally:
+                # Unregister before finishing, so no request joins a flight that has completed.
+                with self._lock:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+                flight.finish(error)
+
+        # The copied context carries the first request's trace, so the stages are recorded on it.
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(produce,), name="single-flight", daemon=True).start()
+        return flight
+
+    def _join_async(self, input, config, kwargs, streaming):
+        key = (asyncio.get_running_loop(), self.key_fn(input))
+        flight = self._async_flights.get(key)
+        if flight is not None:
+            set_path("coalesced")
+            return flight
+        flight = self._async_flights[key] = _AsyncFlight()
+
+        async def produce():
+            error = None
+            try:
+                if streaming:
+                    async for chunk in self.chain.astream(input, config, **kwargs):
+                        flight.publish(chunk)
+                else:
+                    flight.publish(await self.chain.ainvoke(input, config, **kwargs))
+            except Exception as e:
+                error = e
+            finally:
+                if self._async_flights.get(key) is flight:
+                    del self._async_flights[key]
+                flight.finish(error)
+
+        # Tasks copy the current context, including the first request's trace.
+        flight.task = asyncio.ensure_future(produce())
+        return flight
+
+    def invoke(self, input, config=None, **kwargs):
+        result = None
+        for chunk in self._join(input, config, kwargs, streaming=False).subscribe():
+            result = chunk if result is None else result + chunk
+        return result
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        result = None
+        async for chunk in self._join_async(input, config, kwargs, streaming=False).subscribe():
+            result = chunk if result is None else result + chunk
+        return result
+
+    def stream(self, input, config=None, **kwargs):
+        yield from self._join(input, config, kwargs, streaming=True).subscribe()
+
+    async def astream(self, input, config=None, **kwargs):
+        async for chunk in self._join_async(input, config, kwargs, streaming=True).subscribe():
+            yield chunk
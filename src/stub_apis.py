@@ -0,0 +1,239 @@
+# src/stub_apis.py
+
+import re
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import threading
+from io import BytesIO
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Local stand-ins for the OpenRouter chat completions API and the OpenAI Images API.
+# They speak just enough of the OpenAI wire format for langchain_openai and the openai SDK,
+# so generation, benchmarks and load tests can run offline and without API costs.
+
+# Constants
+STUB_HOST = "127.0.0.1"
+STUB_PORT = 8001
+
+FIRST_NAMES = ["Jane", "John", "Maria", "Liam", "Aisha", "Kenji", "Sofia", "Noah", "Elena", "Omar",
+               "Chloe", "Mateo", "Priya", "Lucas", "Hana", "David", "Nora", "Ivan", "Lea", "Samuel"]
+LAST_NAMES = ["Doe", "Garcia", "Smith", "Chen", "Rossi", "Kowalski", "Silva", "Novak", "Martin", "Sato",
+              "Dubois", "Khan", "Fischer", "Lopez", "Jensen", "Costa", "Moreau", "Petrov", "Ali", "Brown"]
+UNIVERSITIES = ["Universitat Politècnica de Catalunya", "Universitat Pompeu Fabra", "Universidad Autónoma de Madrid",
+                "Technical University of Munich", "University of Amsterdam", "Politecnico di Milano",
+                "ETH Zurich", "University of Edinburgh", "KTH Royal Institute of Technology", "Sorbonne University"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Analytics", "Stark Industries", "Wayne Enterprises",
+             "Hooli", "Vandelay Industries", "Soylent Systems", "Cyberdyne", "Wonka Labs", "Tyrell Data"]
+LANGUAGES = ["Python", "Java", "JavaScript", "TypeScript", "Go", "SQL", "C++", "R", "Scala", "Kotlin", "Rust", "C#"]
+TOOLS = ["Docker", "Kubernetes", "AWS", "GCP", "Azure", "Terraform", "Spark", "Airflow", "PostgreSQL", "Figma",
+         "Tableau", "Git", "Jira", "TensorFlow", "PyTorch", "React", "Salesforce", "Excel"]
+SOFT_SKILLS = ["Communication", "Leadership", "Teamwork", "Problem Solving", "Mentoring", "Negotiation",
+               "Time Management", "Stakeholder Management"]
+ROLES = ["Software Engineer", "Data Scientist", "Product Manager", "UX Designer", "Marketing Manager",
+         "Financial Analyst", "Project Manager", "IT Manager", "Data Engineer", "DevOps Engineer"]
+
+def fake_profile(seed, persona=None):
+    """Builds a deterministic, schema-compatible candidate profile from a seed."""
+    rng = random.Random(seed)
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    full_name = f"{first} {last} {seed}"
+    role = persona or rng.choice(ROLES)
+    companies = rng.sample(COMPANIES, 2)
+    start_year = rng.randint(2005, 2016)
+    return {
+        "full_name": full_name,
+        "job_title": role,
+        "contact": {
+            "email": f"{first.lower()}.{last.lower()}{seed}@example.com",
+            "phone": f"+34 6{rng.randint(10000000, 99999999)}",
+            "linkedin": f"linkedin.com/in/{first.lower()}{last.lower()}{seed}",
+        },
+        "summary": (f"{role} with {2024 - start_year} years of experience at {companies[0]} and {companies[1]}. "
+                    f"Focused on {rng.choice(TOOLS)} and {rng.choice(LANGUAGES)} delivery for cross-functional teams."),
+        "work_experience": [
+            {
+                "title": f"Senior {role}",
+                "company": companies[0],
+                "dates": f"Jan {start_year + 4} - Present",
+                "description": [f"Led {rng.choice(TOOLS)} adoption across {rng.randint(2, 9)} teams.",
+                                f"Built {rng.choice(LANGUAGES)} services used by {rng.randint(1, 50)}k users.",
+                                f"Mentored {rng.randint(2, 8)} junior colleagues."],
+            },
+            {
+                "title": role,
+                "company": companies[1],
+                "dates": f"Mar {start_year} - Dec {start_year + 3}",
+                "description": [f"Delivered {rng.randint(3, 12)} projects with {rng.choice(TOOLS)}.",
+                                f"Improved reporting latency by {rng.randint(10, 70)}%."],
+            },
+        ],
+        "education": [
+            {
+                "degree": rng.choice(["BSc Computer Science", "MSc Data Science", "BA Economics", "MSc Engineering"]),
+                "university": rng.choice(UNIVERSITIES),
+                "year": f"{start_year - 4} - {start_year}",
+            }
+        ],
+        "skills": {
+            "programming_languages": rng.sample(LANGUAGES, 3),
+            "tools_and_technologies": rng.sample(TOOLS, 4),
+            "soft_skills": rng.sample(SOFT_SKILLS, 3),
+        },
+    }
+
+def placeholder_png(size=64, seed=0):
+    """Returns the bytes of a small solid-colour PNG used in place of generated headshots."""
+    from PIL import Image
+    rng = random.Random(seed)
+    image = Image.new("RGB", (size, size), (rng.randint(80, 200), rng.randint(80, 200), rng.randint(80, 200)))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+class StubState:
+    """Configuration and request counters shared by all handler threads."""
+
+    def __init__(self, latency=0.0, token_latency=0.0, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"chat": 0, "images": 0, "failures": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+            return self.counts[key]
+
+    def failure_status(self):
+        """Returns an HTTP error status to inject for this request, or None."""
+        with self.lock:
+            if self.fail_rate > 0 and self.rng.random() < self.fail_rate:
+                return self.rng.choice([429, 500, 503])
+            return None
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.server.state.lock:
+                self._send_json(200, dict(self.server.state.counts))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if state.latency:
+            time.sleep(state.latency)
+        status = state.failure_status()
+        if status:
+            state.count("failures")
+            self._send_json(status, {"error": {"message": f"stub failure {status}", "code": status}},
+                            headers={"Retry-After": "0"} if status == 429 else None)
+            return
+        if self.path.endswith("/chat/completions"):
+            self._chat_completion(request, state.count("chat"))
+        elif self.path.endswith("/images/generations"):
+            number = state.count("images")
+            image = base64.b64encode(placeholder_png(seed=number)).decode("ascii")
+            self._send_json(200, {"created": int(time.time()), "data": [{"b64_json": image}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def _chat_completion(self, request, number):
+        prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+        if "JSON schema" in prompt:
+            persona = re.search(r"for the role of: (.+?)\.", prompt)
+            content = json.dumps(fake_profile(number, persona.group(1) if persona else None))
+        else:
+            question = re.search(r"Question:\s*(.+?)\s*Answer:", prompt, re.S)
+            content = ("Based on the provided CVs, the candidates matching "
+                       f"'{question.group(1).strip() if question else 'the request'}' are listed in the sources.")
+        usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                 "total_tokens": len(prompt.split()) + len(content.split())}
+        model = request.get("model", "stub")
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": f"stub-{number}", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        # Server-sent events, one chunk per word, as the streaming API does.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(payload):
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        base = {"id": f"stub-{number}", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        for i, word in enumerate(content.split(" ")):
+            if self.server.state.token_latency:
+                time.sleep(self.server.state.token_latency)
+            token = word if i == 0 else " " + word
+            send({**base, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+        send({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send({**base, "choices": [], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+def start_stub_server(host=STUB_HOST, port=STUB_PORT, latency=0.0, token_latency=0.0, fail_rate=0.0, seed=0):
+    """
+    Starts the stub API server on a background thread and returns it.
+    Use port 0 to pick a free port; the base URL is f"http://{host}:{server.server_port}/v1".
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(latency=latency, token_latency=token_latency, fail_rate=fail_rate, seed=seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def stub_base_url(server):
+    """Returns the OpenAI-compatible base URL of a running stub server."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for the OpenRouter and OpenAI Images APIs.")
+    parser.add_argument("--host", default=STUB_HOST)
+    parser.add_argument("--port", type=int, default=STUB_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering each request.")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed tokens.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 429/5xx.")
+    args = parser.parse_args()
+    server = start_stub_server(args.host, args.port, args.latency, args.token_latency, args.fail_rate)
+    print(f"Stub APIs listening on {stub_base_url(server)} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
@@ -0,0 +1,56 @@
+# tests/test_candidate_index.py
+
+import os
+import json
+from candidate_index import CandidateIndex
+from profiles import pdf_file_name
+
+# The structured-profile index that pre-filters the vector search, over a handful of
+# hand-written profiles.
+
+PROFILES = [
+    {"full_name": "Ana Ruiz", "job_title": "Backend Engineer",
+     "skills": {"programming_languages": ["Go", "C++"], "tools_and_technologies": ["Docker"]},
+     "work_experience": [{"company": "Acme Robotics", "title": "Engineer"}],
+     "education": [{"university": "Universitat Politècnica de Catalunya", "degree": "Computer Science"}]},
+    {"full_name": "Ben Osei", "job_title": "Data Analyst",
+     "skills": {"programming_languages": ["Python"], "tools_and_technologies": ["Excel"]},
+     "work_experience": [{"company": "Globex", "title": "Analyst"}],
+     "education": [{"university": "University of Ghana", "degree": "Statistics"}]},
+    {"full_name": "Chen Li", "job_title": "Team Lead",
+     "skills": {"programming_languages": ["Java"], "soft_skills": ["Machine Learning"]},
+     "work_experience": [{"company": "Initech", "title": "Team Lead"}],
+     "education": [{"university": "Tsinghua University", "degree": "Mathematics"}]},
+]
+
+def make_index():
+    return CandidateIndex(list(enumerate(PROFILES)))
+
+def test_plain_words_only_hint_and_never_restrict_the_search():
+    index = make_index()
+    for question in ("Who would go furthest as a backend engineer?", "Who would excel as a team lead?"):
+        assert index.candidate_filter(question) is None
+    assert index.candidate_hint("Who would go furthest as a backend engineer?") == {"Ana_Ruiz_CV.pdf"}
+    assert index.candidate_hint("Who would excel as a team lead?") == {"Ben_Osei_CV.pdf"}
+
+def test_names_and_distinctive_terms_restrict_the_search():
+    index = make_index()
+    assert index.candidate_filter("What did Chen Li study?") == {"Chen_Li_CV.pdf"}
+    assert index.candidate_filter("Who knows machine learning?") == {"Chen_Li_CV.pdf"}
+    assert index.candidate_filter("Who writes C++?") == {"Ana_Ruiz_CV.pdf"}
+    assert index.candidate_filter("Who worked at Acme Robotics?") == {"Ana_Ruiz_CV.pdf"}
+
+def test_pdfs_in_subfolders_without_a_profile_are_external(tmp_path):
+    profile_directory, cv_directory = tmp_path / "data", tmp_path / "cvs"
+    os.makedirs(profile_directory)
+    os.makedirs(cv_directory / "imported")
+    for i, profile in enumerate(PROFILES[:2]):
+        (profile_directory / f"candidate_{i:02d}.json").write_text(json.dumps(profile))
+        (cv_directory / pdf_file_name(profile, i)).write_bytes(b"%PDF")
+    (cv_directory / "imported" / "Dana_CV.pdf").write_bytes(b"%PDF")
+
+    index = CandidateIndex.from_directory(str(profile_directory), str(cv_directory))
+    assert set(index.candidates) == {"Ana_Ruiz_CV.pdf", "Ben_Osei_CV.pdf"}
+    assert index.external == {os.path.join("imported", "Dana_CV.pdf")}
+    # The external CV could hold the answer, so enumeration questions go to the RAG chain.
+    assert index.answer("Who has experience with Python?") is None
@@ -0,0 +1,161 @@
+# tests/test_compact_store.py
+
+import os
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+import compact_store
+from compact_store import CompactGeneration, CompactStore, CompactStoreWriter, write_segment
+
+# Incremental commits of the compact store (delta segments and deleted rows) compared
+# against a store rebuilt from scratch with the same content.
+
+DIM = 16
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+def chunk(number, rng, source=None):
+    return f"c{number}", rng.normal(size=DIM).astype(np.float32), source or f"cv{number % 5}.pdf", f"text {number}"
+
+def add(writer, chunks):
+    writer.add([cid for cid, _, _, _ in chunks],
+               [Document(page_content=text, metadata={"source": source}) for _, _, source, text in chunks],
+               np.stack([vector for _, vector, _, _ in chunks]))
+
+def rebuild(path, content):
+    writer = CompactStoreWriter(str(path), "int8")
+    writer.reset()
+    add(writer, [(cid, *values) for cid, values in content.items()])
+    writer.commit()
+    return CompactStore(str(path))
+
+def segments(path):
+    """Segments of the current generation."""
+    return [segment.name for segment in CompactStore(str(path)).refresh().segments]
+
+def segments_on_disk(path):
+    return [name for name in os.listdir(path) if name.startswith("seg-")]
+
+def assert_same_results(store, reference, rng):
+    for _ in range(5):
+        query = rng.normal(size=DIM)
+        for search_filter in (None, {"source": {"$in": ["cv1.pdf", "cv3.pdf"]}}, {"source": {"$nin": ["cv2.pdf"]}}):
+            found = store.max_marginal_relevance_search_by_vector(query, k=5, fetch_k=20, filter=search_filter)
+            expected = reference.max_marginal_relevance_search_by_vector(query, k=5, fetch_k=20, filter=search_filter)
+            assert [(d.id, d.page_content) for d in found] == [(d.id, d.page_content) for d in expected]
+
+def test_incremental_commits_only_write_the_changed_rows(tmp_path, rng):
+    path = tmp_path / "store"
+    content = {}
+    for step in range(4):
+        writer = CompactStoreWriter(str(path), "int8")
+        new = [chunk(step * 20 + i, rng) for i in range(20)]
+        replaced = [(cid, rng.normal(size=DIM).astype(np.float32), source, text + " v2")
+                    for cid, (_, source, text) in list(content.items())[:2]]
+        deleted = list(content)[2:3]
+        writer.delete(deleted)
+        add(writer, new + replaced)
+        for cid in deleted:
+            del content[cid]
+        content.update({cid: (vector, source, text) for cid, vector, source, text in new + replaced})
+
+        written = writer.commit()
+        assert written == len(new) + len(replaced)
+        assert len(segments(path)) == step + 1
+        store = CompactStore(str(path))
+        assert store.count() == len(content)
+        assert_same_results(store, rebuild(tmp_path / f"reference-{step}", content), rng)
+
+    # Screening reads every remaining row exactly once.
+    generation = CompactStore(str(path)).refresh()
+    rows = [row for keys, _, _ in generation.blocks(7) for row in keys]
+    assert sorted(record[0] for record in generation.records(rows)) == sorted(content)
+
+def test_commits_compact_past_the_segment_and_deleted_row_limits(tmp_path, rng, monkeypatch):
+    path = tmp_path / "store"
+    monkeypatch.setattr(compact_store, "COMPACT_MAX_SEGMENTS", 3)
+    content = {}
+    for step in range(3):
+        writer = CompactStoreWriter(str(path), "int8")
+        new = [chunk(step * 10 + i, rng) for i in range(10)]
+        add(writer, new)
+        content.update({cid: (vector, source, text) for cid, vector, source, text in new})
+        writer.commit()
+    assert len(segments(path)) == 3
+
+    # A fourth segment is one too many: everything is rewritten into one.
+    writer = CompactStoreWriter(str(path), "int8")
+    extra = chunk(99, rng)
+    add(writer, [extra])
+    content["c99"] = extra[1:]
+    assert writer.commit() == len(content)
+    assert len(segments(path)) == 1
+
+    # Deleting more than COMPACT_MAX_DELETED_FRACTION of the rows compacts as well.
+    writer = CompactStoreWriter(str(path), "int8")
+    extra = chunk(100, rng)
+    add(writer, [extra])
+    content["c100"] = extra[1:]
+    writer.commit()
+    assert len(segments(path)) == 2
+    doomed = list(content)[:int(len(content) * compact_store.COMPACT_MAX_DELETED_FRACTION) + 1]
+    writer = CompactStoreWriter(str(path), "int8")
+    writer.delete(doomed)
+    for cid in doomed:
+        del content[cid]
+    assert writer.commit() == len(content)
+    assert len(segments(path)) == 1
+    assert_same_results(CompactStore(str(path)), rebuild(tmp_path / "reference", content), rng)
+
+def test_a_segment_whose_rows_are_all_deleted_is_dropped(tmp_path, rng):
+    path = tmp_path / "store"
+    writer = CompactStoreWriter(str(path), "int8")
+    add(writer, [chunk(i, rng) for i in range(20)])
+    writer.commit()
+    writer = CompactStoreWriter(str(path), "int8")
+    add(writer, [chunk(20, rng)])
+    writer.commit()
+    assert len(segments(path)) == 2
+
+    writer = CompactStoreWriter(str(path), "int8")
+    writer.delete(["c20"])
+    writer.commit()
+    assert len(segments(path)) == 1
+    # The dropped segment stays on disk for readers of the previous generation until the next publish.
+    assert len(segments_on_disk(path)) == 2
+    CompactStoreWriter(str(path), "int8").commit()
+    assert len(segments_on_disk(path)) == 1
+    assert CompactStore(str(path)).count() == 20
+
+def test_the_previous_generation_stays_readable_until_the_next_publish(tmp_path, rng):
+    path = str(tmp_path / "store")
+    writer = CompactStoreWriter(path, "int8")
+    add(writer, [chunk(i, rng) for i in range(10)])
+    writer.commit()
+    first = compact_store._current_generation(path)
+
+    # A reader that read CURRENT just before the next commit can still open what it named.
+    CompactStoreWriter(path, "int8").commit(compact=True)
+    assert CompactGeneration(path, first).count() == 10
+
+    CompactStoreWriter(path, "int8").commit(compact=True)
+    with pytest.raises(FileNotFoundError):
+        CompactGeneration(path, first)
+    assert CompactStore(path).count() == 10
+
+def test_stores_written_as_a_single_generation_directory_are_still_read(tmp_path, rng):
+    path = tmp_path / "store"
+    write_segment(str(path / "gen-1"), "int8", 2, DIM,
+                  iter([(["a", "b"], ["text a", "text b"], [{"source": "a.pdf"}, {"source": "b.pdf"}],
+                         rng.normal(size=(2, DIM)), None, None)]))
+    (path / "CURRENT").write_text("gen-1")
+    assert CompactStore(str(path)).count() == 2
+
+    writer = CompactStoreWriter(str(path), "int8")
+    add(writer, [chunk(i, rng) for i in range(10)])
+    writer.commit()
+    store = CompactStore(str(path))
+    assert store.count() == 12
+    assert "gen-1" in segments(path)
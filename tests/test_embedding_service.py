@@ -0,0 +1,68 @@
+# tests/test_embedding_service.py
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from embedding_service import MicroBatcher
+
+# Micro-batching of the retrieval service: items submitted from many threads are processed
+# in batches on one worker thread.
+
+class GatedFn:
+    """Batch function whose first batch blocks until released, so the next submits queue up."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self.batches = []
+
+    def __call__(self, items):
+        if not self.batches:
+            self.started.set()
+            self.gate.wait(5)
+        self.batches.append(list(items))
+        if "bad" in items:
+            raise ValueError("cannot encode 'bad'")
+        return [item.upper() for item in items]
+
+def submit_while_busy(batcher, fn, items):
+    """
+    Submits the first item, then queues the others one by one while its batch runs.
+    Returns each submit's result or error.
+    """
+    def submit(item):
+        try:
+            return batcher.submit(item)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(len(items)) as pool:
+        futures = [pool.submit(submit, items[0])]
+        assert fn.started.wait(5)
+        for queued, item in enumerate(items[1:], start=1):
+            futures.append(pool.submit(submit, item))
+            while batcher.queue.qsize() < queued:
+                time.sleep(0.001)
+        fn.gate.set()
+        return [future.result(5) for future in futures]
+
+def test_items_queued_while_a_batch_runs_form_batches_of_at_most_max_batch():
+    fn = GatedFn()
+    batcher = MicroBatcher(fn, max_batch=4, window_ms=0)
+    items = [f"q{i}" for i in range(11)]
+    assert submit_while_busy(batcher, fn, items) == [item.upper() for item in items]
+    assert [len(batch) for batch in fn.batches] == [1, 4, 4, 2]
+    assert batcher.stats() == {"requests": 11, "batches": 4, "mean_batch_size": 2.75, "largest_batch": 4}
+
+def test_an_error_fails_only_the_items_of_its_batch():
+    fn = GatedFn()
+    batcher = MicroBatcher(fn, max_batch=2, window_ms=0)
+    # Batches: [a], [b, c], [bad, d], [e]
+    results = submit_while_busy(batcher, fn, ["a", "b", "c", "bad", "d", "e"])
+    assert results[:3] == ["A", "B", "C"]
+    assert all(isinstance(result, ValueError) for result in results[3:5])
+    assert results[5] == "E"
+    with pytest.raises(ValueError):
+        batcher.submit("bad")
+    assert batcher.submit("f") == "F"
@@ -0,0 +1,20 @@
+# tests/test_embeddings.py
+
+import os
+import pytest
+from embeddings import CachedEmbeddings
+
+# Cache keys of the embedding layer; none of these tests loads a model.
+
+def test_rebuilding_a_snapshot_at_the_same_path_changes_the_cache_key(tmp_path):
+    snapshot = tmp_path / "model.pt"
+    snapshot.write_bytes(b"int8 weights")
+    before = CachedEmbeddings(cache_path="", snapshot_path=str(snapshot)).cache_key
+    snapshot.write_bytes(b"float32 weights, rebuilt with --no-quantize")
+    after = CachedEmbeddings(cache_path="", snapshot_path=str(snapshot)).cache_key
+    assert before != after
+    assert CachedEmbeddings(cache_path="", snapshot_path=str(snapshot)).cache_key == after
+
+def test_a_missing_snapshot_fails_instead_of_falling_back_to_the_full_model(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CachedEmbeddings(cache_path="", snapshot_path=os.path.join(tmp_path, "missing.pt"))
@@ -0,0 +1,181 @@
+# tests/test_generation_pipeline.py
+
+import os
+import json
+import time
+import pytest
+from types import SimpleNamespace
+import generate_cvs
+import generation_pipeline
+from generation_pipeline import GenerationPipeline, ApiLimiter, JobJournal, JOURNAL_FILE_NAME
+from stub_apis import start_stub_server, stub_base_url
+
+# The generation pipeline against the local stand-ins of the OpenRouter and OpenAI Images
+# APIs in stub_apis.py, in a scratch working directory. Backoff delays are scaled down so
+# retries take milliseconds.
+
+BACKOFF_BASE = 0.01
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    """Starts a stub server and points the generator's API clients and output folders at it."""
+    server = start_stub_server(port=0, seed=7)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(generate_cvs, "OPENROUTER_API_KEY", "stub")
+    monkeypatch.setattr(generate_cvs, "OPENAI_API_KEY", "stub")
+    monkeypatch.setattr(generate_cvs, "OPENROUTER_BASE_URL", stub_base_url(server))
+    monkeypatch.setattr(generate_cvs, "OPENAI_BASE_URL", stub_base_url(server))
+    monkeypatch.setattr(generate_cvs, "_clients", {})
+    yield server
+    server.shutdown()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records the backoff delays the limiters sleep for."""
+    delays = []
+    real_sleep = time.sleep
+
+    def sleep(seconds):
+        delays.append(seconds)
+        real_sleep(seconds)
+
+    monkeypatch.setattr(generation_pipeline.time, "sleep", sleep)
+    return delays
+
+def make_pipeline(num_cvs, llm_rate=0, image_rate=0, max_retries=8):
+    pipeline = GenerationPipeline(num_cvs=num_cvs, llm_concurrency=2, image_concurrency=2,
+                                  llm_rate_per_min=llm_rate, image_rate_per_min=image_rate, max_retries=max_retries)
+    for limiter in (pipeline.llm, pipeline.images):
+        limiter.backoff_base = BACKOFF_BASE
+    return pipeline
+
+def test_failed_calls_are_retried_with_backoff(stub, sleeps):
+    stub.state.fail_rate = 0.4
+    pipeline = make_pipeline(6)
+
+    assert pipeline.run() == 6
+    failures = stub.state.counts["failures"]
+    assert failures > 0
+    # Every injected 429/5xx was retried, and each retry waited before the next attempt.
+    assert pipeline.llm.retries + pipeline.images.retries == failures
+    assert len(sleeps) == failures
+    assert all(BACKOFF_BASE * 0.5 <= delay for delay in sleeps)
+    assert len(os.listdir(generate_cvs.OUTPUT_PDF_DIR)) == 6
+
+def test_backoff_grows_exponentially_until_retries_run_out(stub, sleeps):
+    stub.state.fail_rate = 1.0
+    limiter = ApiLimiter("LLM", 1, 0, max_retries=4, backoff_base=BACKOFF_BASE)
+
+    with pytest.raises(Exception) as error:
+        generate_cvs.request_profile("Data Scientist", limiter.call)
+    assert generation_pipeline.is_retryable(error.value)
+    assert limiter.calls == 5
+    assert stub.state.counts["failures"] == 5
+    # Attempt n waits between half and all of base * 2^n (jitter); Retry-After is 0 on the stub.
+    assert len(sleeps) == 4
+    for attempt, delay in enumerate(sleeps):
+        assert BACKOFF_BASE * 2 ** attempt * 0.5 <= delay <= BACKOFF_BASE * 2 ** attempt
+
+def test_json_repair_is_a_separate_rate_limited_call(monkeypatch, sleeps):
+    requests = {"profile": 0, "repair": 0}
+
+    def profile_text(persona):
+        requests["profile"] += 1
+        return '{"full_name": "Ana Ruiz"'  # Truncated JSON
+
+    def repair(text):
+        requests["repair"] += 1
+        if requests["repair"] == 1:
+            raise ConnectionError("connection dropped")
+        return json.loads(text + "}")
+
+    monkeypatch.setattr(generate_cvs, "_request_profile_text", profile_text)
+    monkeypatch.setattr(generate_cvs, "_repair_profile", repair)
+    limiter = ApiLimiter("LLM", 1, 0, backoff_base=BACKOFF_BASE)
+    tokens = []
+    monkeypatch.setattr(limiter.bucket, "acquire", lambda: tokens.append(time.monotonic()))
+
+    assert generate_cvs.request_profile("Data Scientist", limiter.call) == {"full_name": "Ana Ruiz"}
+    # One token per request; retrying the failed repair does not generate the profile again.
+    assert requests == {"profile": 1, "repair": 2}
+    assert len(tokens) == limiter.calls == 3
+    assert limiter.retries == len(sleeps) == 1
+
+def test_retry_after_is_capped_at_backoff_max(sleeps):
+    class Throttled(Exception):
+        status_code = 429
+        response = SimpleNamespace(status_code=429, headers={"retry-after": "3600"})
+
+    attempts = []
+
+    def throttled_once():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise Throttled()
+        return "ok"
+
+    limiter = ApiLimiter("LLM", 1, 0, backoff_base=BACKOFF_BASE, backoff_max=0.05)
+    assert limiter.call(throttled_once) == "ok"
+    assert sleeps == [0.05]
+
+def test_token_buckets_hold_the_configured_rate(stub, monkeypatch):
+    llm_rate, image_rate = 1200, 900  # Calls per minute
+    pipeline = make_pipeline(30, llm_rate=llm_rate, image_rate=image_rate)
+    grants = {"llm": [], "images": []}
+    for name in grants:
+        bucket = getattr(pipeline, name).bucket
+        acquire = bucket.acquire
+
+        def recorded(acquire=acquire, times=grants[name]):
+            acquire()
+            times.append(time.monotonic())
+
+        monkeypatch.setattr(bucket, "acquire", recorded)
+
+    start = time.monotonic()
+    assert pipeline.run() == 30
+    elapsed = time.monotonic() - start
+
+    for name, rate_per_min in (("llm", llm_rate), ("images", image_rate)):
+        times = sorted(grants[name])
+        rate = rate_per_min / 60
+        capacity = getattr(pipeline, name).bucket.capacity
+        assert len(times) == 30
+        # No interval ever sees more calls than the burst capacity plus the refill over its length.
+        for i in range(len(times)):
+            for j in range(i + 1, len(times)):
+                assert j - i + 1 <= capacity + (times[j] - times[i]) * rate + 1e-6
+    # After the initial burst of the image bucket, the remaining calls are paced at its rate.
+    assert elapsed >= (30 - pipeline.images.bucket.capacity) / (image_rate / 60) * 0.9
+
+def test_interrupted_run_resumes_without_regenerating_completed_jobs(stub, monkeypatch):
+    num_cvs = 5
+    # The first run is stopped after two headshots: the other jobs fail in the headshot stage.
+    request_headshot = generate_cvs.request_headshot
+    served = []
+
+    def interrupted(profile):
+        if len(served) >= 2:
+            raise RuntimeError("run stopped")
+        served.append(profile["full_name"])
+        return request_headshot(profile)
+
+    monkeypatch.setattr(generate_cvs, "request_headshot", interrupted)
+    assert make_pipeline(num_cvs).run() == 2
+    assert stub.state.counts == {"chat": num_cvs, "images": 2, "failures": 0}
+    journal = JobJournal(os.path.join(generate_cvs.OUTPUT_JSON_DIR, JOURNAL_FILE_NAME))
+    completed = [i for i in range(num_cvs) if journal.is_done(i, "pdf")]
+    assert len(completed) == 2
+    pdfs = {name: os.path.getmtime(os.path.join(generate_cvs.OUTPUT_PDF_DIR, name))
+            for name in os.listdir(generate_cvs.OUTPUT_PDF_DIR)}
+
+    monkeypatch.setattr(generate_cvs, "request_headshot", request_headshot)
+    resumed = make_pipeline(num_cvs)
+    assert resumed.run() == num_cvs
+    # Profiles and finished jobs are reused: only the three missing headshots are requested.
+    assert resumed.llm.calls == 0
+    assert resumed.images.calls == num_cvs - 2
+    assert stub.state.counts == {"chat": num_cvs, "images": num_cvs, "failures": 0}
+    for name, mtime in pdfs.items():
+        assert os.path.getmtime(os.path.join(generate_cvs.OUTPUT_PDF_DIR, name)) == mtime
+    assert len(os.listdir(generate_cvs.OUTPUT_PDF_DIR)) == num_cvs
@@ -0,0 +1,52 @@
+# tests/test_index_watcher.py
+
+import index_watcher
+from index_watcher import IndexWatcher
+
+# The polling loop of the live-ingestion watcher, run on a fake clock with a scripted sync().
+
+class FakeClock:
+    """Stands in for time.monotonic() and for the stop event: every wait advances the clock."""
+
+    def __init__(self, until, at=None):
+        self.now = 0.0
+        self.until = until
+        self.at = at or {}  # Callbacks run when the clock reaches a time, e.g. to add a CV
+
+    def monotonic(self):
+        return self.now
+
+    def wait(self, timeout):
+        self.now += timeout
+        if self.now in self.at:
+            self.at.pop(self.now)()
+        return self.now >= self.until
+
+def watch(tmp_path, monkeypatch, results, until, at=None):
+    """Runs the watcher over tmp_path and returns the clock times sync() was called at."""
+    clock = FakeClock(until, at)
+    monkeypatch.setattr(index_watcher.time, "monotonic", clock.monotonic)
+    watcher = IndexWatcher(on_update=None, interval=1, patterns=[str(tmp_path / "*.pdf")])
+    watcher.stopped = clock
+    calls = []
+
+    def sync():
+        calls.append(clock.now)
+        return results.pop(0) if results else True
+
+    watcher.sync = sync
+    watcher.run()
+    return calls
+
+def test_a_failing_sync_is_retried_with_capped_exponential_backoff(tmp_path, monkeypatch):
+    (tmp_path / "cv1.pdf").write_bytes(b"%PDF")
+    monkeypatch.setattr(index_watcher, "INDEX_WATCH_RETRY_MAX", 4)
+    calls = watch(tmp_path, monkeypatch, [False] * 10, until=16)
+    assert calls == [0, 1, 3, 7, 11, 15]
+
+def test_new_files_skip_the_backoff_and_a_successful_sync_is_not_repeated(tmp_path, monkeypatch):
+    (tmp_path / "cv1.pdf").write_bytes(b"%PDF")
+    add_cv = lambda: (tmp_path / "cv2.pdf").write_bytes(b"%PDF")
+    calls = watch(tmp_path, monkeypatch, [False, False, False], until=20, at={4: add_cv})
+    # Without the new CV the next retry would be at 7; it is synced once two scans agree on it.
+    assert calls == [0, 1, 3, 5]
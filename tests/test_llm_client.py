@@ -0,0 +1,60 @@
+# tests/test_llm_client.py
+
+import asyncio
+import pytest
+from llm_client import CircuitBreaker, CircuitBreakerRunnable, CircuitOpenError
+
+# The circuit breaker around streamed LLM calls, with a stand-in model that yields tokens.
+
+class TokenModel:
+    def __init__(self, tokens=("a", "b", "c"), delay=0.0):
+        self.tokens = tokens
+        self.delay = delay
+
+    def stream(self, input, config=None, **kwargs):
+        yield from self.tokens
+
+    async def astream(self, input, config=None, **kwargs):
+        for token in self.tokens:
+            await asyncio.sleep(self.delay)
+            yield token
+
+def half_open_breaker():
+    breaker = CircuitBreaker("LLM", failure_threshold=1, reset_timeout=0)
+    breaker.state, breaker.failures = "open", 1
+    return breaker
+
+def test_an_abandoned_stream_releases_the_trial_without_closing_the_circuit():
+    breaker = half_open_breaker()
+    model = CircuitBreakerRunnable(TokenModel(), breaker)
+
+    stream = model.stream("question")
+    assert next(stream) == "a"
+    # While the trial runs, other calls are rejected.
+    with pytest.raises(CircuitOpenError):
+        next(model.stream("question"))
+    stream.close()  # The client disconnected
+    assert breaker.state == "half_open" and not breaker.trial_running
+
+    # The next call is the new trial; consuming it to the end closes the circuit.
+    assert list(model.stream("question")) == ["a", "b", "c"]
+    assert breaker.state == "closed" and breaker.failures == 0
+
+def test_a_cancelled_async_stream_releases_the_trial_without_closing_the_circuit():
+    breaker = half_open_breaker()
+    model = CircuitBreakerRunnable(TokenModel(delay=0.05), breaker)
+
+    async def consume():
+        return [token async for token in model.astream("question")]
+
+    async def cancel_after_first_token():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.075)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_after_first_token())
+    assert breaker.state == "half_open" and not breaker.trial_running
+    assert asyncio.run(consume()) == ["a", "b", "c"]
+    assert breaker.state == "closed"
@@ -0,0 +1,40 @@
+# tests/test_profiles.py
+
+from profiles import profile_sections
+
+# Section-aware chunking of the structured profiles that ingestion reads instead of the PDFs.
+
+PROFILE = {
+    "full_name": "Ana Ruiz",
+    "job_title": "Backend Engineer",
+    "summary": "Builds distributed systems.",
+    "contact": {"email": "ana@example.com"},
+    "work_experience": [
+        {"title": "Engineer", "company": "Acme", "dates": "2019-2024", "description": ["Ran the API team."]},
+        {"title": "Intern", "company": "Globex", "dates": "2018", "description": []},
+    ],
+    "education": [{"degree": "Computer Science", "university": "UPC", "year": "2018"}],
+    "skills": {
+        "programming_languages": ["Go", "Python"],
+        "soft_skills": ["Mentoring"],
+        "spoken_languages": ["Catalan", "English"],
+        "certifications": ["CKA"],
+        "hobbies": [],
+    },
+}
+
+def test_one_section_per_job_and_every_section_names_the_candidate():
+    sections = profile_sections(PROFILE, 0)
+    assert [section for section, _ in sections] == ["summary", "experience", "experience", "education", "skills"]
+    assert all(text.startswith("Ana Ruiz") for _, text in sections)
+    assert "Ran the API team." in sections[1][1]
+
+def test_every_skill_category_is_embedded():
+    skills = dict(profile_sections(PROFILE, 0))["skills"]
+    assert skills.splitlines() == [
+        "Ana Ruiz - Skills:",
+        "Programming Languages: Go, Python",
+        "Soft Skills: Mentoring",
+        "Spoken Languages: Catalan, English",
+        "Certifications: CKA",
+    ]
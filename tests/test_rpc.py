@@ -0,0 +1,28 @@
+# tests/test_rpc.py
+
+import socket
+import pytest
+from rpc import RPCServer, RPCClient, RPCError
+
+# Unix-socket servers of rpc.py; every test passes its own authkey, so no key file is written.
+
+AUTHKEY = b"test-key"
+
+def test_a_stale_socket_is_replaced(tmp_path):
+    address = str(tmp_path / "service.sock")
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(address)
+    stale.close()  # The file stays behind, like after a crashed server
+
+    server = RPCServer(address, {"add": lambda a, b: a + b}, authkey=AUTHKEY).start()
+    try:
+        assert RPCClient(address, authkey=AUTHKEY).call("add", 2, 3) == 5
+    finally:
+        server.close()
+
+def test_a_file_at_the_address_is_never_deleted(tmp_path):
+    address = tmp_path / "notes.txt"
+    address.write_text("not a socket")
+    with pytest.raises(RPCError, match="not a socket"):
+        RPCServer(str(address), {}, authkey=AUTHKEY)
+    assert address.read_text() == "not a socket"
@@ -0,0 +1,47 @@
+# tests/test_screening.py
+
+import numpy as np
+from screening import split_requirements, score_candidates
+
+# Requirement splitting and the vectorized candidate x requirement scoring of batch screening.
+
+class BlockChunks:
+    """Chunk reader over in-memory arrays, served in blocks like the Chroma and compact readers."""
+
+    def __init__(self, vectors, sources, block_rows):
+        self.vectors, self.sources, self.block_rows = vectors, sources, block_rows
+
+    def blocks(self):
+        for offset in range(0, len(self.vectors), self.block_rows):
+            end = offset + self.block_rows
+            yield list(range(offset, min(end, len(self.vectors)))), self.vectors[offset:end], self.sources[offset:end]
+
+def test_bullets_become_requirements_and_headings_are_skipped():
+    job = "Requirements:\n- 5+ years of Python\n* Experience with Kubernetes clusters\n2) Fluent English speaker\nNice"
+    assert split_requirements(job) == ["5+ years of Python", "Experience with Kubernetes clusters",
+                                       "Fluent English speaker"]
+
+def test_a_single_paragraph_is_split_into_sentences():
+    job = "We need a senior data engineer. You know Spark and Airflow well; you mentor junior engineers."
+    assert split_requirements(job) == ["We need a senior data engineer.", "You know Spark and Airflow well;",
+                                       "you mentor junior engineers."]
+    assert split_requirements("Go") == ["Go"]
+
+def test_scores_are_the_best_chunk_per_candidate_and_requirement():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8)).astype(np.float32)
+    # Candidates' chunks are interleaved and span several blocks.
+    sources = [f"cv{i % 7}.pdf" for i in range(50)]
+    requirements = rng.normal(size=(3, 8))
+
+    found, scores, keys = score_candidates(BlockChunks(vectors, sources, block_rows=16), requirements)
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    similarities = unit @ (requirements / np.linalg.norm(requirements, axis=1, keepdims=True)).T
+    assert found == [f"cv{i}.pdf" for i in range(7)]
+    for row, source in enumerate(found):
+        rows = [i for i, s in enumerate(sources) if s == source]
+        for r in range(len(requirements)):
+            best = max(rows, key=lambda i: similarities[i, r])
+            assert keys[row, r] == best
+            assert np.isclose(scores[row, r], similarities[best, r], atol=1e-5)
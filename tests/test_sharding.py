@@ -0,0 +1,57 @@
+# tests/test_sharding.py
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from compact_store import CompactStore, CompactStoreWriter
+from sharding import LocalShard, ShardedRetriever, shard_of, shard_paths
+
+# The fan-out and global MMR merge of a sharded index, checked against one unsharded compact store.
+
+DIM = 16
+SHARDS = 3
+
+def write_store(path, chunks):
+    writer = CompactStoreWriter(str(path), "int8")
+    writer.reset()
+    writer.add([cid for cid, _, _ in chunks],
+               [Document(page_content=f"text {cid}", metadata={"source": source}) for cid, _, source in chunks],
+               np.stack([vector for _, vector, _ in chunks]))
+    writer.commit()
+
+class BrokenShard:
+    address = "127.0.0.1:1"
+
+    def fetch(self, query_embedding, fetch_k, filter=None):
+        raise ConnectionRefusedError("shard server is down")
+
+@pytest.fixture
+def index(tmp_path):
+    rng = np.random.default_rng(0)
+    chunks = [(f"c{i}", rng.normal(size=DIM).astype(np.float32), f"cv{i % 20}.pdf") for i in range(200)]
+    write_store(tmp_path / "single", chunks)
+    for shard, path in enumerate(shard_paths(str(tmp_path / "sharded"), SHARDS)):
+        write_store(path, [chunk for chunk in chunks if shard_of(chunk[2], SHARDS) == shard])
+    shards = [LocalShard("compact", path) for path in shard_paths(str(tmp_path / "sharded"), SHARDS)]
+    return CompactStore(str(tmp_path / "single")), shards, rng
+
+def test_the_merged_shards_answer_like_a_single_index(index):
+    single, shards, rng = index
+    assert all(shard.count() for shard in shards)
+    retriever = ShardedRetriever(shards)
+    assert retriever.count() == single.count()
+    for _ in range(5):
+        query = rng.normal(size=DIM)
+        for search_filter in (None, {"source": {"$in": ["cv1.pdf", "cv2.pdf", "cv3.pdf"]}}):
+            found = retriever.search(query, k=5, fetch_k=20, filter=search_filter)
+            expected = single.max_marginal_relevance_search_by_vector(query, k=5, fetch_k=20, filter=search_filter)
+            assert [doc.page_content for doc in found] == [doc.page_content for doc in expected]
+
+def test_a_failed_shard_is_skipped_and_only_all_failing_shards_fail_the_query(index):
+    _, shards, rng = index
+    query = rng.normal(size=DIM)
+    found = ShardedRetriever(shards[:1] + [BrokenShard()]).search(query, k=5, fetch_k=20)
+    assert [doc.page_content for doc in found] == \
+        [doc.page_content for doc in ShardedRetriever(shards[:1]).search(query, k=5, fetch_k=20)]
+    with pytest.raises(RuntimeError):
+        ShardedRetriever([BrokenShard(), BrokenShard()]).search(query, k=5, fetch_k=20)